@@ -0,0 +1,198 @@
+# MIT License
+#
+# Copyright (c) 2017 Matthias Rost, Alexander Elvers
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+__author__ = "Matthias Rost, Alexander Elvers (mrost / aelvers <AT> inet.tu-berlin.de)"
+
+import heapq
+import time
+
+from algorithms import abstract_algorithm as aa_pkg
+from algorithms import incremental_greedy_matching as inc_greedy_pkg
+from datamodel import matching_graph as mg_pkg
+
+
+def shortest_paths_costs_after_link_failures(substrate, distance_matrix, edge_cost, failed_links):
+    """ removes the failed links (in both directions) from edge_cost and returns the distances in the remaining
+        substrate; only the sources that used a failed link on a shortest path are recomputed (Dijkstra), the rows of
+        all other sources are taken from distance_matrix
+    """
+    failed_edges = set()
+    for (tail, head) in failed_links:
+        for edge in [(tail, head), (head, tail)]:
+            if edge in edge_cost:
+                failed_edges.add((edge, edge_cost.pop(edge)))
+
+    result = dict(distance_matrix)
+    out_neighbors = None
+    for source in substrate.nodes:
+        row = distance_matrix[source]
+        affected = False
+        for ((tail, head), cost) in failed_edges:
+            # the tolerance covers the rounding of the summed costs
+            if row[tail] is not None and row[head] is not None and row[tail] + cost <= row[head] * (1 + 1e-9):
+                affected = True
+                break
+        if not affected:
+            continue
+
+        if out_neighbors is None:
+            out_neighbors = {node: [] for node in substrate.nodes}
+            for ((tail, head), cost) in edge_cost.items():
+                out_neighbors[tail].append((head, cost))
+        new_row = {node: None for node in substrate.nodes}
+        new_row[source] = 0
+        heap = [(0, 0, source)]
+        counter = 0
+        while len(heap) > 0:
+            (distance, _, node) = heapq.heappop(heap)
+            if distance > new_row[node]:
+                continue
+            for (head, cost) in out_neighbors[node]:
+                if new_row[head] is None or distance + cost < new_row[head]:
+                    new_row[head] = distance + cost
+                    counter += 1
+                    heapq.heappush(heap, (distance + cost, counter, head))
+        result[source] = new_row
+    return result
+
+
+class FailureRepair(inc_greedy_pkg.IncrementalGreedyMatching):
+    """ repairs a deployment after middlebox or link failures without recomputing it.
+
+        The pairs of a failed middlebox are unassigned and the middlebox is never opened again. A link failure
+        updates the distances and drops the edges that exceed the maximal deviation; pairs losing their middlebox
+        this way are unassigned. The unassigned pairs are then re-homed by augmenting paths of at most
+        max_path_length edges through the open middleboxes (a path of length 2k+1 reassigns k other pairs). Only
+        pairs remaining unassigned open their nearest inactive middlebox or, as a last resort, the middlebox chosen
+        by the greedy step. Pairs that cannot be served anymore are reported as unmatched.
+    """
+    alg_name = "FailureRepair"
+
+    def __init__(self, scenario, matching_edges, failed_mbs=(), failed_links=(), max_path_length=5):
+        # the set-up of IncrementalGreedyMatching expects a new pair and is replaced
+        aa_pkg.AbstractAlgorithm.__init__(self, scenario)
+
+        for req in self.scenario.requests:
+            if req.capacity != 1:
+                raise Exception("Requests must have a capacity of 1.")
+        self.max_path_length = max_path_length
+        self.pending_failed_mbs = list(failed_mbs)
+        self.pending_failed_links = list(failed_links)
+
+        self.matching_graph = mg_pkg.StatefulMatchingGraph(scenario)
+        self.matching_graph.reinitialize_from_edges(set(matching_edges))
+        self._initialize_search()
+
+        self.failed_mbs = set()
+        self.failed_links = []
+        self.edge_cost = dict(self.scenario.substrate.edge_cost)
+        self.distance_matrix = self.scenario.substrate.get_shortest_paths_cost_dict()
+        self.reports = []
+
+    def fail_middleboxes(self, mbs):
+        """ fails the middleboxes and repairs the deployment; returns the report of the repair """
+        start = time.perf_counter()
+        previous_edges = set(self.matching_graph.edge_in_matching)
+        active_mbs_before = set(self.matching_graph.active_mbs)
+        for mb in mbs:
+            if mb in self.failed_mbs:
+                continue
+            self.matching_graph.close_middlebox(mb)
+            # a failed middlebox is neither active nor available for opening
+            self.matching_graph.inactive_mbs.discard(mb)
+            self.failed_mbs.add(mb)
+        return self._repair(start, previous_edges, active_mbs_before, {"failed_mbs": sorted(mbs, key=str)})
+
+    def fail_links(self, links):
+        """ fails the links (in both directions) and repairs the deployment; returns the report of the repair """
+        start = time.perf_counter()
+        previous_edges = set(self.matching_graph.edge_in_matching)
+        active_mbs_before = set(self.matching_graph.active_mbs)
+        self.distance_matrix = shortest_paths_costs_after_link_failures(self.scenario.substrate, self.distance_matrix,
+                                                                        self.edge_cost, links)
+        self.failed_links.extend(links)
+        removed_edges = self.matching_graph.drop_infeasible_edges(self.distance_matrix)
+        # the temporary matchings have to see the dropped edges
+        self.temp_matching_1.share_adjacency(self.matching_graph)
+        self.temp_matching_2.share_adjacency(self.matching_graph)
+        return self._repair(start, previous_edges, active_mbs_before,
+                            {"failed_links": list(links), "number_of_dropped_edges": len(removed_edges)})
+
+    def _repair(self, start, previous_edges, active_mbs_before, report):
+        mg = self.matching_graph
+        # pairs whose edges all lead to failed middleboxes cannot be served and are not searched for
+        number_of_cps = sum(1 for cp in mg.communication_pairs
+                            if any(mb not in self.failed_mbs for (mb, cp) in mg.edges_at_node[cp]))
+        self.current_optimum = None
+
+        if mg.get_size_of_matching() < number_of_cps:
+            matching = self._extend_maximal_matching(self.max_path_length)
+            if matching.get_size_of_matching() > mg.get_size_of_matching():
+                mg.reinitialize(matching)
+
+        for cp in mg.communication_pairs:
+            if not mg.is_free_cp[cp]:
+                continue
+            for (mb, cp) in mg.edges_at_node[cp]:
+                if mb in mg.inactive_mbs:
+                    matching = self._compute_maximal_matching(mb, self.max_path_length)
+                    if matching.get_size_of_matching() > mg.get_size_of_matching():
+                        mg.reinitialize(matching)
+                    break
+
+        while mg.get_size_of_matching() < number_of_cps:
+            size = mg.get_size_of_matching()
+            matching = self._greedy_step()
+            if matching is None or matching.get_size_of_matching() <= size:
+                break
+            mg.reinitialize(matching)
+
+        # middleboxes that lost all of their pairs are closed
+        for mb in list(mg.active_mbs):
+            if mg.available_capacity[mb] == self.scenario.middleboxes[mb]:
+                mg.close_middlebox(mb)
+
+        unmatched_cps = [cp for cp in mg.communication_pairs if mg.is_free_cp[cp]]
+        reassigned_cps = set(cp for (mb, cp) in previous_edges - mg.edge_in_matching) - set(unmatched_cps)
+        report.update({"latency": time.perf_counter() - start,
+                       "reassigned_cps": sorted(reassigned_cps),
+                       "unmatched_cps": unmatched_cps,
+                       "opened_mbs": sorted(mg.active_mbs - active_mbs_before, key=str),
+                       "closed_mbs": sorted(active_mbs_before - mg.active_mbs, key=str),
+                       "active_mbs": len(mg.active_mbs)})
+        self.reports.append(report)
+        print("[{}]: repaired in {:.3f} ms, {} reassigned and {} unmatched pairs, {} many middleboxes".format(
+            self.alg_name, 1000 * report["latency"], len(reassigned_cps), len(unmatched_cps), len(mg.active_mbs)))
+        return report
+
+    def _run(self):
+        if len(self.pending_failed_mbs) > 0:
+            self.fail_middleboxes(self.pending_failed_mbs)
+        if len(self.pending_failed_links) > 0:
+            self.fail_links(self.pending_failed_links)
+        self.pending_failed_mbs = []
+        self.pending_failed_links = []
+        self.matching_graph.check_validity(all_cps_must_be_assigned=False)
+        return self.matching_graph
+
+    def _get_extra_information(self):
+        return {"repairs": self.reports}
@@ -0,0 +1,292 @@
+# MIT License
+#
+# Copyright (c) 2017 Matthias Rost, Alexander Elvers
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+__author__ = "Matthias Rost, Alexander Elvers (mrost / aelvers <AT> inet.tu-berlin.de)"
+
+from collections import deque
+
+from datamodel import matching_graph as mg_pkg
+
+EPSILON = 1e-9
+
+
+class FractionalCoverageFlow:
+    """ computes the value of the lp of Greedy_diff_weights for a set of open middleboxes without an lp solver.
+
+        For fixed middleboxes the lp is a bipartite flow problem: communication pair cp can send up to
+        requests[cp].capacity units to the open middleboxes it is connected to, middlebox mb can receive up to
+        scenario.middleboxes[mb] units, and each unit sent by cp is worth 1 / requests[cp].capacity (the fraction of
+        cp that is served). As only the source arcs carry values, the flow is optimal iff no communication pair that
+        is not fully served can reach a middlebox with free capacity, or a communication pair of lower value that
+        sends flow, in the residual network. Processing the communication pairs in the order of decreasing value and
+        augmenting along such paths restores optimality after a middlebox is opened, so the flow is maintained
+        incrementally. Only communication pairs that can reach the opened middlebox need to be processed, and the
+        nodes explored by an unsuccessful search cannot lead to an augmenting path for any later communication pair.
+    """
+
+    def __init__(self, scenario, matching_graph):
+        self.scenario = scenario
+
+        arrays = matching_graph.get_array_form()
+        self.middleboxes = arrays.middleboxes
+        self.middlebox_index = arrays.middlebox_index
+        self.edges = arrays.edges
+        self.edge_mb = arrays.edge_mb
+        self.edge_cp = arrays.edge_cp
+
+        number_of_cps = arrays.number_of_communication_pairs
+
+        self.demand = [float(scenario.requests[cp].capacity) for cp in range(number_of_cps)]
+        self.mb_capacity = [float(scenario.middleboxes[mb]) for mb in self.middleboxes]
+
+        self.edges_of_cp = [[] for _ in range(number_of_cps)]
+        self.edges_of_mb = [[] for _ in self.middleboxes]
+        for edge_index, (mb_index, cp) in enumerate(zip(self.edge_mb, self.edge_cp)):
+            # a communication pair cannot be served by a middlebox offering less capacity than it needs
+            if self.mb_capacity[mb_index] >= self.demand[cp]:
+                self.edges_of_cp[cp].append(edge_index)
+                self.edges_of_mb[mb_index].append(edge_index)
+
+        # the communication pairs ordered by decreasing value of their flow, i.e. by increasing demand
+        self.cp_order = sorted(range(number_of_cps), key=lambda cp: self.demand[cp])
+
+        self.is_open = [False] * len(self.middleboxes)
+        self.flow = [0.0] * len(self.edges)
+        self.supply = [0.0] * number_of_cps
+        self.load = [0.0] * len(self.middleboxes)
+
+        self.value = 0.0
+        self.number_of_augmentations = 0
+
+        # while evaluating a middlebox all changes are logged, such that they can be undone
+        self.undo_log = None
+
+    def get_value(self):
+        return self.value
+
+    def open_middlebox(self, mb):
+        """ opens the middlebox and returns the new value """
+        mb_index = self.middlebox_index[mb]
+        if self.is_open[mb_index]:
+            return self.value
+        self._set_open(mb_index, True)
+
+        cps_reaching_mb = self._get_cps_reaching(mb_index)
+        dead_mbs = set()
+        dead_cps = set()
+        for cp in self.cp_order:
+            if cp not in cps_reaching_mb:
+                continue
+            while self.supply[cp] < self.demand[cp] - EPSILON and self._augment(cp, dead_mbs, dead_cps):
+                pass
+        return self.value
+
+    def open_middleboxes(self, mbs):
+        """ opens all given middleboxes at once, processing every communication pair a single time, and returns the
+            new value
+        """
+        for mb in mbs:
+            mb_index = self.middlebox_index[mb]
+            if not self.is_open[mb_index]:
+                self._set_open(mb_index, True)
+
+        dead_mbs = set()
+        dead_cps = set()
+        for cp in self.cp_order:
+            while self.supply[cp] < self.demand[cp] - EPSILON and self._augment(cp, dead_mbs, dead_cps):
+                pass
+        return self.value
+
+    def is_fully_served(self, cp):
+        return self.supply[cp] >= self.demand[cp] - EPSILON
+
+    def evaluate_opening(self, mb):
+        """ returns the value after opening the middlebox without changing the current flow """
+        self.undo_log = []
+        self.open_middlebox(mb)
+        value = self.value
+        for (values, index, old_value) in reversed(self.undo_log):
+            values[index] = old_value
+        self.undo_log = None
+        self._recompute_value()
+        return value
+
+    def get_assignment_values(self):
+        """ returns the lp assignment y of each edge, i.e. the served fraction of the communication pair """
+        return {edge: self.flow[edge_index] / self.demand[edge[1]] for edge_index, edge in enumerate(self.edges)}
+
+    def _set(self, values, index, value):
+        if self.undo_log is not None:
+            self.undo_log.append((values, index, values[index]))
+        values[index] = value
+
+    def _set_open(self, mb_index, is_open):
+        self._set(self.is_open, mb_index, is_open)
+
+    def _recompute_value(self):
+        self.value = sum(supply / demand for supply, demand in zip(self.supply, self.demand))
+
+    def _get_cps_reaching(self, target_mb_index):
+        """ returns the communication pairs having a residual path to the given middlebox """
+        reaching_cps = set()
+        reached_mbs = {target_mb_index}
+        queue = deque([target_mb_index])
+        while len(queue) > 0:
+            mb_index = queue.popleft()
+            for edge_index in self.edges_of_mb[mb_index]:
+                cp = self.edge_cp[edge_index]
+                if cp in reaching_cps:
+                    continue
+                reaching_cps.add(cp)
+                # cp is reached from the middleboxes it sends flow to
+                for other_edge_index in self.edges_of_cp[cp]:
+                    other_mb_index = self.edge_mb[other_edge_index]
+                    if self.flow[other_edge_index] > EPSILON and other_mb_index not in reached_mbs:
+                        reached_mbs.add(other_mb_index)
+                        queue.append(other_mb_index)
+        return reaching_cps
+
+    def _augment(self, source_cp, dead_mbs, dead_cps):
+        """ searches a shortest residual path from source_cp to a middlebox with free capacity or to a communication
+            pair of lower value that sends flow and augments along it; returns False if there is none, in which case
+            all explored nodes are added to dead_mbs and dead_cps
+        """
+        source_demand = self.demand[source_cp]
+
+        predecessor_of_mb = {}
+        predecessor_of_cp = {source_cp: None}
+
+        queue = deque([source_cp])
+
+        target = None
+        while len(queue) > 0 and target is None:
+            cp = queue.popleft()
+            for edge_index in self.edges_of_cp[cp]:
+                mb_index = self.edge_mb[edge_index]
+                if not self.is_open[mb_index] or mb_index in predecessor_of_mb or mb_index in dead_mbs:
+                    continue
+                predecessor_of_mb[mb_index] = edge_index
+                if self.load[mb_index] < self.mb_capacity[mb_index] - EPSILON:
+                    target = (mb_index, None)
+                    break
+                for reverse_edge_index in self.edges_of_mb[mb_index]:
+                    if self.flow[reverse_edge_index] <= EPSILON:
+                        continue
+                    other_cp = self.edge_cp[reverse_edge_index]
+                    if other_cp in predecessor_of_cp or other_cp in dead_cps:
+                        continue
+                    predecessor_of_cp[other_cp] = reverse_edge_index
+                    if self.demand[other_cp] > source_demand and self.supply[other_cp] > EPSILON:
+                        target = (None, other_cp)
+                        break
+                    queue.append(other_cp)
+                if target is not None:
+                    break
+
+        if target is None:
+            dead_mbs.update(predecessor_of_mb.keys())
+            dead_cps.update(predecessor_of_cp.keys())
+            return False
+
+        # collect the path from the target back to source_cp: forward edges cp -> mb and reverse edges mb -> cp
+        forward_edges = []
+        reverse_edges = []
+        target_mb, target_cp = target
+        if target_mb is not None:
+            bottleneck = self.mb_capacity[target_mb] - self.load[target_mb]
+            mb_index = target_mb
+        else:
+            bottleneck = self.supply[target_cp]
+            reverse_edge_index = predecessor_of_cp[target_cp]
+            reverse_edges.append(reverse_edge_index)
+            bottleneck = min(bottleneck, self.flow[reverse_edge_index])
+            mb_index = self.edge_mb[reverse_edge_index]
+        while True:
+            forward_edge_index = predecessor_of_mb[mb_index]
+            forward_edges.append(forward_edge_index)
+            cp = self.edge_cp[forward_edge_index]
+            reverse_edge_index = predecessor_of_cp[cp]
+            if reverse_edge_index is None:
+                break
+            reverse_edges.append(reverse_edge_index)
+            bottleneck = min(bottleneck, self.flow[reverse_edge_index])
+            mb_index = self.edge_mb[reverse_edge_index]
+        bottleneck = min(bottleneck, source_demand - self.supply[source_cp])
+
+        for edge_index in forward_edges:
+            self._set(self.flow, edge_index, self.flow[edge_index] + bottleneck)
+        for edge_index in reverse_edges:
+            self._set(self.flow, edge_index, self.flow[edge_index] - bottleneck)
+
+        self._set(self.supply, source_cp, self.supply[source_cp] + bottleneck)
+        self.value += bottleneck / source_demand
+        if target_mb is not None:
+            self._set(self.load, target_mb, self.load[target_mb] + bottleneck)
+        else:
+            self._set(self.supply, target_cp, self.supply[target_cp] - bottleneck)
+            self.value -= bottleneck / self.demand[target_cp]
+
+        self.number_of_augmentations += 1
+        return True
+
+
+def is_coverable(scenario, matching_graph=None):
+    """ feasibility oracle of the deployment problem: checks whether all communication pairs can be served when all
+        middleboxes are open.
+
+        For requests of capacity 1 the flow is integral, so the check is exact. Otherwise a fully serving flow only
+        shows that the fractional assignment exists; an integral assignment is then derived from the flow (the pairs
+        split over several middleboxes are reassigned by decreasing demand, each to the connected middlebox with the
+        most remaining capacity), so a scenario may be rejected although a solver could still find an integral
+        assignment.
+    """
+    if matching_graph is None:
+        matching_graph = mg_pkg.MatchingGraph(scenario)
+    flow = FractionalCoverageFlow(scenario, matching_graph)
+    flow.open_middleboxes(flow.middleboxes)
+    number_of_cps = len(flow.demand)
+    if not all(flow.is_fully_served(cp) for cp in range(number_of_cps)):
+        return False
+    if all(demand == 1.0 for demand in flow.demand):
+        return True
+
+    # pairs served by a single middlebox keep it, the split ones are assigned greedily to the remaining capacity
+    remaining_capacity = list(flow.mb_capacity)
+    split_cps = []
+    for cp in range(number_of_cps):
+        serving_edges = [edge_index for edge_index in flow.edges_of_cp[cp] if flow.flow[edge_index] > EPSILON]
+        if len(serving_edges) == 1:
+            remaining_capacity[flow.edge_mb[serving_edges[0]]] -= flow.demand[cp]
+        else:
+            split_cps.append(cp)
+
+    for cp in sorted(split_cps, key=lambda cp: -flow.demand[cp]):
+        best_mb_index = None
+        for edge_index in flow.edges_of_cp[cp]:
+            mb_index = flow.edge_mb[edge_index]
+            if remaining_capacity[mb_index] >= flow.demand[cp] - EPSILON and \
+                    (best_mb_index is None or remaining_capacity[mb_index] > remaining_capacity[best_mb_index]):
+                best_mb_index = mb_index
+        if best_mb_index is None:
+            return False
+        remaining_capacity[best_mb_index] -= flow.demand[cp]
+    return True
@@ -24,21 +24,24 @@ __author__ = "Matthias Rost, Alexander Elvers (mrost / aelvers <AT> inet.tu-berl
 
 from collections import deque
 
-import gurobipy
-from gurobipy import GRB
+import numpy as np
+import scipy.sparse as sp
 
 from algorithms import abstract_algorithm as aa_pkg
+from algorithms import fractional_coverage_flow as flow_pkg
+from algorithms import mip_model_builder as builder_pkg
+from algorithms import solver_backends as backends_pkg
 from algorithms.gurobi_status import GurobiStatus
 from datamodel import matching_graph as mg_pkg
 
 
 class Special_StatefulMatchingGraph:
 
-    def __init__(self, scenario, active_mbs, mb_assignment_vars, classic_mg):
+    def __init__(self, scenario, active_mbs, mb_assignment_values, classic_mg):
 
         self.scenario = scenario
         self.active_mbs = active_mbs
-        self.mb_assignment_vars = mb_assignment_vars
+        self.mb_assignment_values = mb_assignment_values
         self.classic_mg = classic_mg
 
         self.communication_pairs = range(len(self.scenario.requests))
@@ -84,12 +87,12 @@ class Special_StatefulMatchingGraph:
         # for cp in self.communication_pairs:
         #     print "cp {}".format(cp)
         #     for (mb, _) in self.classic_mg.edges_at_node[cp]:
-        #         if self.mb_assignment_vars[(mb,cp)].X > 0:
-        #             print "\t mb\t{} \t --> {}".format(mb, self.mb_assignment_vars[(mb,cp)].X)
+        #         if self.mb_assignment_values[(mb,cp)] > 0:
+        #             print "\t mb\t{} \t --> {}".format(mb, self.mb_assignment_values[(mb,cp)])
 
 
         for mb in self.active_mbs:
-            attached_cps = [(cp,self.mb_assignment_vars[(mb,cp)].X, self.scenario.requests[cp].capacity)  for (_,cp) in self.classic_mg.edges_at_node[mb] if self.mb_assignment_vars[(mb,cp)].X > 0]
+            attached_cps = [(cp,self.mb_assignment_values[(mb,cp)], self.scenario.requests[cp].capacity)  for (_,cp) in self.classic_mg.edges_at_node[mb] if self.mb_assignment_values[(mb,cp)] > 0]
             attached_cps_sorted =sorted(attached_cps, key=lambda x_y_z: -x_y_z[2])
 
             #print "\n\nMB: {}\n\t{}\n".format(mb, attached_cps_sorted)
@@ -304,171 +307,283 @@ class Special_StatefulMatchingGraph:
     #         if mb in self.active_mbs and counter > self.scenario.middleboxes[mb]:
     #             raise Exception("Capacity is violated!")
 
+EVALUATOR_LP = "lp"
+EVALUATOR_FLOW = "flow"
+
+
 class Greedy_diff_weights(aa_pkg.AbstractAlgorithm_Diff_Weights):
+    """ opens in each round the middlebox that maximizes the value of the lp relaxation for the opened middleboxes.
+
+        With evaluator EVALUATOR_FLOW the lp values are computed by FractionalCoverageFlow instead of an lp solver;
+        validate_flow additionally solves the lp of each round and records the differences.
+
+        With restricted set, the lp only contains the assignment variables of the installed middleboxes (see
+        RestrictedDeploymentModel); the columns of a candidate are added for its evaluation and removed afterwards.
+    """
     alg_name = "GreedyDiffWeights  "
 
-    def __init__(self, scenario):
+    def __init__(self, scenario, with_names=False, backend=None, warm_start=True, evaluator=EVALUATOR_LP, validate_flow=False,
+                 restricted=False):
         super().__init__(scenario)
 
-        self.mb_vars = {}
-        self.mb_assignment_vars = {}
-        self.model = None
+        if evaluator not in [EVALUATOR_LP, EVALUATOR_FLOW]:
+            raise Exception("Unknown evaluator {}".format(evaluator))
+
+        self.deployment_model = None
+        self.solver = None
+        self.backend = backend
+        self.mb_indices = None
         self.mg = mg_pkg.StatefulMatchingGraph(scenario)
+        self.with_names = with_names
+        self.evaluator = evaluator
+        self.warm_start = warm_start and evaluator == EVALUATOR_LP
+        self.validate_flow = validate_flow and evaluator == EVALUATOR_FLOW
+        self.restricted = restricted and evaluator == EVALUATOR_LP
 
+        self.flow = None
+        self.flow_lp_differences = []
 
-    def construct_lp(self):
+        self.installed_mbs = set()
+        self.uninstalled_mbs = set()
 
-        self.model = gurobipy.Model("mb-deployment")
+        self.incumbent_basis = None
+        self.best_basis = None
 
-        for mb in self.mg.middleboxes:
-            variableId = "mb_decision_{}".format(mb)
-            self.mb_vars[mb] = self.model.addVar(lb=0.0, ub=1.0, obj=0.0, vtype=GRB.CONTINUOUS, name=variableId)
-        for (mb, cp) in self.mg.edges:
-            variableId = "mb_cp_assignment_{}_{}_{}".format(mb, self.scenario.requests[cp].tail, self.scenario.requests[cp].head)
-            self.mb_assignment_vars[(mb,cp)] = self.model.addVar(lb=0.0, ub=1.0, obj=1.0, vtype=GRB.CONTINUOUS, name=variableId)
+        self.simplex_iterations_per_round = []
+        self.current_round_iterations = 0
 
 
-        self.model.update()
+    def construct_lp(self):
 
-        for (mb, cp) in self.mg.edges:
-            if self.scenario.middleboxes[mb] < self.scenario.requests[cp].capacity:
-                self.mb_assignment_vars[(mb,cp)].ub = 0.0
+        if self.restricted:
+            self.construct_restricted_lp()
+            return
+
+        builder = builder_pkg.DeploymentModelBuilder(self.scenario, self.mg, with_names=self.with_names)
+        self.deployment_model = builder.build(objective=builder_pkg.MAX_ASSIGNMENTS, covering_sense=builder_pkg.LESS_EQUAL, integral=False,
+                                              respect_edge_capacities=True)
+        self.solver = backends_pkg.create_backend(self.backend, "mb-deployment")
+        self.solver.load_model(self.deployment_model)
+        self.mb_indices = np.arange(self.deployment_model.number_of_mb_variables)
+
+        self.solver.set_parameter(backends_pkg.THREADS, 1)
+        if self.warm_start:
+            # opening a middlebox only changes bounds, so the basis of the incumbent stays dual feasible
+            self.solver.set_parameter(backends_pkg.METHOD, backends_pkg.DUAL_SIMPLEX)
+
+    def construct_restricted_lp(self):
+
+        builder = builder_pkg.DeploymentModelBuilder(self.scenario, self.mg)
+        self.deployment_model = builder.build_restricted(covering_sense=builder_pkg.LESS_EQUAL, respect_edge_capacities=True)
+        self.solver = backends_pkg.create_backend(self.backend, "mb-deployment-restricted")
+        self.solver.load_model(self.deployment_model)
+
+        self.solver.set_parameter(backends_pkg.THREADS, 1)
+        if self.warm_start:
+            # adding the columns of a middlebox keeps the basis of the incumbent primal feasible
+            self.solver.set_parameter(backends_pkg.METHOD, backends_pkg.PRIMAL_SIMPLEX)
+
+    def add_middlebox_columns(self, mb):
+        edges, covering, capacities = self.deployment_model.get_middlebox_columns(mb)
+        number_of_columns = len(edges)
+
+        indices = self.solver.add_variables(np.ones(number_of_columns), np.zeros(number_of_columns), np.ones(number_of_columns),
+                                            {"covering": covering})
+        capacity = sp.csr_matrix((capacities, (np.zeros(number_of_columns, dtype=np.int64), indices)), shape=(1, self.solver.number_of_variables))
+        self.solver.add_constraints("upper_bound", capacity, builder_pkg.LESS_EQUAL, [self.deployment_model.get_middlebox_capacity(mb)])
+
+        self.deployment_model.column_edges = np.concatenate((self.deployment_model.column_edges, edges))
+        return indices
+
+    def remove_middlebox_columns(self, indices):
+        # the columns and the capacity constraint of the middlebox were added last
+        self.solver.remove_variables(indices)
+        self.solver.remove_constraints("upper_bound", [len(self.installed_mbs)])
+        self.deployment_model.column_edges = self.deployment_model.column_edges[:self.solver.number_of_variables]
+
+    def install_middlebox_columns(self, mb):
+        """ adds the columns of the newly installed middlebox permanently and computes the basis of the new incumbent """
+        self.add_middlebox_columns(mb)
+        if self.warm_start:
+            self.solver.set_parameter(backends_pkg.CUTOFF, None)
+            self.solver.optimize()
+            self.current_round_iterations += self.solver.get_iteration_count()
+            self.incumbent_basis = self.get_current_basis()
 
-        self.model.setObjective(self.model.getObjective(), GRB.MAXIMIZE)
+    def adapt_lp(self, allowed_mbs):
 
-        for cp in self.mg.communication_pairs:
-            constr = gurobipy.LinExpr()
-            for (mb,cp) in self.mg.edges_at_node[cp]:
-                constr.addTerms(1.0, self.mb_assignment_vars[(mb,cp)])
+        bounds = np.zeros(self.deployment_model.number_of_mb_variables)
+        for mb in allowed_mbs:
+            bounds[self.deployment_model.get_mb_variable_index(mb)] = 1.0
 
-            self.model.addConstr(constr, GRB.LESS_EQUAL, 1.0, name="covering_{}_{}".format(self.scenario.requests[cp].tail, self.scenario.requests[cp].head))
+        self.solver.set_variable_bounds(self.mb_indices, bounds, bounds)
 
-        for mb in self.mg.middleboxes:
-            constr = gurobipy.LinExpr()
-            for (mb,cp) in self.mg.edges_at_node[mb]:
-                constr.addTerms(self.scenario.requests[cp].capacity, self.mb_assignment_vars[(mb,cp)])
-            constr.addTerms(-1.0 * self.scenario.middleboxes[mb], self.mb_vars[mb])
-            self.model.addConstr(constr, GRB.LESS_EQUAL, 0.0, name="upper_bound_{}".format(mb))
+    def get_current_basis(self):
+        return self.solver.get_basis()
 
-        for (mb,cp) in self.mg.edges:
-            constr = gurobipy.LinExpr()
-            constr.addTerms(1.0, self.mb_assignment_vars[(mb,cp)])
-            constr.addTerms(-1.0, self.mb_vars[mb])
-            self.model.addConstr(constr, GRB.LESS_EQUAL, 0.0, name="lower_bound_{}_{}_{}".format(mb, self.scenario.requests[cp].tail, self.scenario.requests[cp].head))
+    def set_basis(self, basis):
+        self.solver.set_basis(basis)
 
-        #self.model.setParam("Method", 1)
-        #self.model.setParam("Presolve", 0)
-        self.model.setParam("Threads", 1)
+    def reloads_incumbent_basis(self):
+        """ whether each candidate starts from the incumbent's basis. A backend keeping its basis continues from the
+            previously evaluated candidate instead, which is cheaper than reloading the incumbent's basis.
+        """
+        return self.warm_start and not self.solver.keeps_basis
 
-        self.model.update()
 
-        self.vars = self.model.getVars()
-        self.constrs = self.model.getConstrs()
 
-    def adapt_lp(self, allowed_mbs):
 
-        for mb in self.scenario.middleboxes.keys():
 
-            if mb in allowed_mbs:
-                self.mb_vars[mb].lb = 1.0
-                self.mb_vars[mb].ub = 1.0
-            else:
-                self.mb_vars[mb].lb = 0.0
-                self.mb_vars[mb].ub = 0.0
+    def evaluate_candidate(self, mb, cutoff):
+        """ solves the lp for the installed middleboxes together with mb; returns None if the lp was cut off """
 
-        self.model.update()
+        if self.evaluator == EVALUATOR_FLOW:
+            objval = self.flow.evaluate_opening(mb)
+            if cutoff is not None and objval <= cutoff:
+                return None
+            return objval
 
-    def get_current_basis(self):
-        print("reading basis")
-        pstart = [var.VBasis for var in self.vars]
-        dstart = [cons.CBasis for cons in self.constrs]
-        return pstart, dstart
+        if self.restricted:
+            candidate_columns = self.add_middlebox_columns(mb)
+        else:
+            copy_of_installed_mbs = self.installed_mbs.copy()
+            copy_of_installed_mbs.add(mb)
 
-    def set_basis(self, pstart, dstart):
-        #print pstart, dstart
-        print("setting basis")
-        for index, var in enumerate(self.vars):
-            var.VBasis = pstart[index]
-        for index, cons in enumerate(self.constrs):
-            cons.CBasis = dstart[index]
+            self.adapt_lp(copy_of_installed_mbs)
 
+        if self.incumbent_basis is not None and not self.restricted and self.reloads_incumbent_basis():
+            # start from the incumbent instead of the previously evaluated candidate
+            self.set_basis(self.incumbent_basis)
 
+        self.solver.set_parameter(backends_pkg.CUTOFF, cutoff)
 
+        self.solver.optimize()
 
+        self.current_round_iterations += self.solver.get_iteration_count()
 
-    def _run(self):
+        #we just assume feasibility
 
-        self.construct_lp()
+        objval = None
+        if self.solver.get_status().status != GurobiStatus.CUTOFF:
+            objval = self.solver.get_objective_value()
 
-        self.installed_mbs = set()
-        self.uninstalled_mbs = set(mb for mb in self.scenario.middleboxes.keys())
+        if self.restricted:
+            self.remove_middlebox_columns(candidate_columns)
+            if self.incumbent_basis is not None:
+                # the added columns are nonbasic for the incumbent, so the next candidate starts from it
+                self.set_basis(self.incumbent_basis)
+        return objval
 
-        #self.adapt_lp(self.installed_mbs)
+    def select_middlebox(self, currently_connected_cps):
+        """ evaluates all uninstalled middleboxes and returns the one with the largest improvement together with the
+            objective of its lp
+        """
 
-        currently_connected_cps = 0.0
+        best_mb_to_open = None
+        best_improvement = 0
+        best_objval = None
 
-        pstart, dstart = None, None
+        for uninstalled_mb in self.uninstalled_mbs:
 
+            objval = self.evaluate_candidate(uninstalled_mb, best_objval)
 
-        while len(self.scenario.requests) - currently_connected_cps > 0.99:
+            if objval is not None and objval - currently_connected_cps > best_improvement:
+                best_improvement = objval - currently_connected_cps
+                best_mb_to_open = uninstalled_mb
+                best_objval = objval
+                if self.reloads_incumbent_basis() and not self.restricted:
+                    self.best_basis = self.get_current_basis()
 
-            print("\n\n\n HAVING INSTALLED \t {} \t many MBs serving \t {} \t of \t {} \t many connection pairs.\n\n\n".format(len(self.installed_mbs), currently_connected_cps, len(self.scenario.requests)))
+        return best_mb_to_open, best_objval
 
-            best_mb_to_open = None
-            best_improvement = 0
-            best_objval = None
+    def validate_flow_value(self):
+        self.solver.set_parameter(backends_pkg.CUTOFF, None)
+        self.adapt_lp(self.installed_mbs)
+        self.solver.optimize()
 
-            for uninstalled_mb in self.uninstalled_mbs:
+        difference = self.solver.get_objective_value() - self.flow.get_value()
+        self.flow_lp_differences.append(difference)
+        if abs(difference) > 1e-6:
+            print("WARNING: the flow value {} differs from the lp value by {}".format(self.flow.get_value(), difference))
 
-                copy_of_installed_mbs = self.installed_mbs.copy()
-                copy_of_installed_mbs.add(uninstalled_mb)
+    def _run(self):
 
-                self.adapt_lp(copy_of_installed_mbs)
+        if self.evaluator == EVALUATOR_LP or self.validate_flow:
+            self.construct_lp()
+        if self.evaluator == EVALUATOR_FLOW:
+            self.flow = flow_pkg.FractionalCoverageFlow(self.scenario, self.mg)
 
-                if pstart is not None:
-                    pass
-                    #self.set_basis(pstart, dstart)
+        self.installed_mbs = set()
+        self.uninstalled_mbs = set(mb for mb in self.scenario.middleboxes.keys())
 
-                if not best_objval is None:
-                    self.model.setParam("Cutoff", best_objval)
+        currently_connected_cps = 0.0
 
-                self.model.optimize()
+        if self.warm_start:
+            # the lp without any middleboxes provides the basis for the first round
+            if not self.restricted:
+                self.adapt_lp(self.installed_mbs)
+            self.solver.optimize()
+            self.incumbent_basis = self.get_current_basis()
 
-                #we just assume feasibility
 
-                if self.model.getAttr("Status") != GurobiStatus.CUTOFF:
+        while len(self.scenario.requests) - currently_connected_cps > 0.99:
 
-                    objval = self.model.getAttr("ObjVal")
+            print("\n\n\n HAVING INSTALLED \t {} \t many MBs serving \t {} \t of \t {} \t many connection pairs.\n\n\n".format(len(self.installed_mbs), currently_connected_cps, len(self.scenario.requests)))
 
-                    if objval - currently_connected_cps > best_improvement:
-                        best_improvement = objval - currently_connected_cps
-                        best_mb_to_open = uninstalled_mb
-                        best_objval = objval
+            self.best_basis = None
+            self.current_round_iterations = 0
 
+            best_mb_to_open, best_objval = self.select_middlebox(currently_connected_cps)
 
             if not best_mb_to_open is None:
                 self.installed_mbs.add(best_mb_to_open)
                 self.uninstalled_mbs.remove(best_mb_to_open)
+                self.incumbent_basis = self.best_basis
+                if self.restricted:
+                    self.install_middlebox_columns(best_mb_to_open)
+                if self.evaluator == EVALUATOR_FLOW:
+                    self.flow.open_middlebox(best_mb_to_open)
+                    if self.validate_flow:
+                        self.validate_flow_value()
 
-            #pstart, dstart = self.get_current_basis()
+            if self.evaluator == EVALUATOR_LP:
+                self.simplex_iterations_per_round.append(self.current_round_iterations)
+                print("round {} needed {} simplex iterations".format(len(self.simplex_iterations_per_round), self.current_round_iterations))
 
 
             currently_connected_cps = best_objval
 
-        #recompute the optimal solution
-        self.model.setParam("Cutoff", GRB.INFINITY)
-        self.adapt_lp(self.installed_mbs)
-        self.model.update()
-
+        print("\n\n\n HAVING INSTALLED \t {} \t many MBs serving \t {} \t of \t {} \t many connection pairs.\n\n\n".format(len(self.installed_mbs), currently_connected_cps, len(self.scenario.requests)))
 
-        self.model.optimize()
+        if self.evaluator == EVALUATOR_FLOW:
+            mb_assignment_values = self.flow.get_assignment_values()
+        else:
+            #recompute the optimal solution
+            self.solver.set_parameter(backends_pkg.CUTOFF, None)
+            if not self.restricted:
+                self.adapt_lp(self.installed_mbs)
 
-        print("\n\n\n HAVING INSTALLED \t {} \t many MBs serving \t {} \t of \t {} \t many connection pairs.\n\n\n".format(len(self.installed_mbs), currently_connected_cps, len(self.scenario.requests)))
+            self.solver.optimize()
 
-        extended_matching = Special_StatefulMatchingGraph(scenario=self.scenario, active_mbs=self.installed_mbs, mb_assignment_vars=self.mb_assignment_vars, classic_mg=self.mg)
+            mb_assignment_values = self.deployment_model.get_assignment_values(self.solver.get_solution())
+        extended_matching = Special_StatefulMatchingGraph(scenario=self.scenario, active_mbs=self.installed_mbs, mb_assignment_values=mb_assignment_values, classic_mg=self.mg)
         extended_matching.run()
         self.mg = extended_matching.convert_to_classic_matching_graph()
         return self.mg
 
     def _get_extra_information(self):
-        return None
+        extra_information = {"evaluator": self.evaluator}
+        if self.solver is not None:
+            extra_information["model_build"] = self.deployment_model.build_statistics
+            extra_information["solver"] = self.solver.backend_name
+            extra_information["time_environment_setup"] = self.solver.get_environment_setup_time()
+        if self.evaluator == EVALUATOR_LP:
+            extra_information["simplex_iterations_per_round"] = self.simplex_iterations_per_round
+            extra_information["restricted"] = self.restricted
+            if self.restricted:
+                extra_information["restricted_lp_variables"] = self.solver.number_of_variables
+        else:
+            extra_information["flow_augmentations"] = self.flow.number_of_augmentations
+            if self.validate_flow:
+                extra_information["flow_lp_differences"] = self.flow_lp_differences
+        return extra_information
@@ -0,0 +1,176 @@
+# MIT License
+#
+# Copyright (c) 2017 Matthias Rost, Alexander Elvers
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+__author__ = "Matthias Rost, Alexander Elvers (mrost / aelvers <AT> inet.tu-berlin.de)"
+
+from multiprocessing import Process, Queue, Value
+
+from algorithms import greedy_diff_weights as greedy_dw_pkg
+from algorithms import solver_backends as backends_pkg
+from datamodel import scenario_registry as registry_pkg
+
+
+def _read_cutoff(shared_cutoff, local_objval):
+    with shared_cutoff.get_lock():
+        cutoff = shared_cutoff.value
+    if local_objval is not None and local_objval > cutoff:
+        return local_objval
+    return cutoff
+
+
+def _publish_cutoff(shared_cutoff, objval):
+    with shared_cutoff.get_lock():
+        if objval > shared_cutoff.value:
+            shared_cutoff.value = objval
+
+
+def slave_execution(scenario_handle, backend, warm_start, shared_cutoff, task_queue, input_queue, result_queue):
+
+    # every worker holds its own replica of the lp and only (mb, objval) pairs are sent back
+    greedy_worker = greedy_dw_pkg.Greedy_diff_weights(registry_pkg.attach_scenario(scenario_handle),
+                                                      backend=backend,
+                                                      warm_start=warm_start)
+    greedy_worker.construct_lp()
+
+    while True:
+
+        installed_mbs = input_queue.get()
+        if installed_mbs is None:
+            break
+
+        greedy_worker.installed_mbs = set(installed_mbs)
+        greedy_worker.current_round_iterations = 0
+        if greedy_worker.reloads_incumbent_basis():
+            greedy_worker.solver.set_parameter(backends_pkg.CUTOFF, None)
+            greedy_worker.adapt_lp(greedy_worker.installed_mbs)
+            greedy_worker.solver.optimize()
+            greedy_worker.incumbent_basis = greedy_worker.get_current_basis()
+
+        best_mb_to_open = None
+        best_objval = None
+        number_of_evaluations = 0
+
+        while True:
+            mb = task_queue.get()
+            # the tasks of a round are followed by one None per worker
+            if mb is None:
+                break
+
+            objval = greedy_worker.evaluate_candidate(mb, _read_cutoff(shared_cutoff, best_objval))
+            number_of_evaluations += 1
+
+            if objval is not None and (best_objval is None or objval > best_objval):
+                best_mb_to_open = mb
+                best_objval = objval
+                _publish_cutoff(shared_cutoff, objval)
+
+        result_queue.put((best_mb_to_open, best_objval, greedy_worker.current_round_iterations, number_of_evaluations))
+
+
+class WorkerMetaData:
+
+    def __init__(self, process, input_queue, result_queue):
+        self.process = process
+        self.input_queue = input_queue
+        self.result_queue = result_queue
+
+
+class Greedy_diff_weights_parallel(greedy_dw_pkg.Greedy_diff_weights):
+    """ variant of Greedy_diff_weights that evaluates the candidates of a round in number_of_processes many worker
+        processes. Each worker builds its own copy of the lp; the candidates are distributed via a shared task queue
+        and the best objective found so far is shared as cutoff between the workers.
+    """
+    alg_name = "GreedyDiffWeightsParallel  "
+
+    def __init__(self, scenario, number_of_processes, with_names=False, backend=None, warm_start=True):
+        super().__init__(scenario, with_names=with_names, backend=backend, warm_start=warm_start)
+
+        self.number_of_processes = number_of_processes
+
+        self.owns_scenario_handle = not registry_pkg.is_published(scenario)
+        self.scenario_handle = registry_pkg.publish_scenario(scenario)
+
+        self.shared_cutoff = Value("d", 0.0)
+        self.task_queue = Queue()
+        self.workers = []
+
+        self.evaluations_per_worker = [0] * self.number_of_processes
+
+        for i in range(self.number_of_processes):
+            meta_data = WorkerMetaData(process=None, input_queue=Queue(), result_queue=Queue())
+            process = Process(target=slave_execution, args=(self.scenario_handle,
+                                                            self.backend,
+                                                            self.warm_start,
+                                                            self.shared_cutoff,
+                                                            self.task_queue,
+                                                            meta_data.input_queue,
+                                                            meta_data.result_queue))
+            meta_data.process = process
+            self.workers.append(meta_data)
+            process.start()
+
+    def select_middlebox(self, currently_connected_cps):
+
+        with self.shared_cutoff.get_lock():
+            # only candidates improving on the current solution are of interest
+            self.shared_cutoff.value = currently_connected_cps
+
+        for mb in self.uninstalled_mbs:
+            self.task_queue.put(obj=mb)
+        for i in range(self.number_of_processes):
+            self.task_queue.put(obj=None)
+
+        installed_mbs = list(self.installed_mbs)
+        for i in range(self.number_of_processes):
+            self.workers[i].input_queue.put(installed_mbs)
+
+        best_mb_to_open = None
+        best_objval = None
+        for i in range(self.number_of_processes):
+            mb, objval, iterations, number_of_evaluations = self.workers[i].result_queue.get()
+            self.current_round_iterations += iterations
+            self.evaluations_per_worker[i] += number_of_evaluations
+            if mb is not None and objval - currently_connected_cps > 0 and (best_objval is None or objval > best_objval):
+                best_mb_to_open = mb
+                best_objval = objval
+
+        return best_mb_to_open, best_objval
+
+    def _run(self):
+        try:
+            return super()._run()
+        finally:
+            for i in range(self.number_of_processes):
+                self.workers[i].input_queue.put(obj=None)
+
+            for i in range(self.number_of_processes):
+                self.workers[i].process.join()
+
+            if self.owns_scenario_handle:
+                registry_pkg.release_scenario(self.scenario_handle)
+
+    def _get_extra_information(self):
+        extra_information = super()._get_extra_information()
+        extra_information["number_of_processes"] = self.number_of_processes
+        extra_information["evaluations_per_worker"] = self.evaluations_per_worker
+        return extra_information
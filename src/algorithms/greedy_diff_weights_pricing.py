@@ -0,0 +1,145 @@
+# MIT License
+#
+# Copyright (c) 2017 Matthias Rost, Alexander Elvers
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+__author__ = "Matthias Rost, Alexander Elvers (mrost / aelvers <AT> inet.tu-berlin.de)"
+
+import numpy as np
+
+from algorithms import greedy_diff_weights as greedy_dw_pkg
+from algorithms import solver_backends as backends_pkg
+
+
+class Greedy_diff_weights_pricing(greedy_dw_pkg.Greedy_diff_weights):
+    """ variant of Greedy_diff_weights that only evaluates the most promising middleboxes of each round.
+
+        The lp of the installed middleboxes is solved once per round. Keeping the duals of its covering constraints
+        fixed, the improvement of opening a middlebox is bounded by a fractional knapsack: each communication pair
+        yields a profit of 1 - dual per unit and consumes its capacity. The middleboxes are evaluated in the order
+        of these bounds until a bound cannot beat the best improvement found (which does not change the result) or
+        number_of_candidates many lps were solved and one of them improved the solution (which may change it).
+    """
+    alg_name = "GreedyDiffWeightsPricing  "
+
+    def __init__(self, scenario, number_of_candidates=3, with_names=False, backend=None, warm_start=True):
+        super().__init__(scenario, with_names=with_names, backend=backend, warm_start=warm_start)
+
+        self.number_of_candidates = number_of_candidates
+
+        self.edges_of_mb = None
+        self.edge_cp = None
+        self.edge_weight = None
+        self.edge_usable = None
+        self.mb_capacities = None
+
+        self.evaluated_candidates_per_round = []
+
+    def construct_lp(self):
+        super().construct_lp()
+
+        arrays = self.deployment_model.arrays
+        number_of_mbs = self.deployment_model.number_of_mb_variables
+
+        edge_mb = np.asarray(arrays.edge_mb, dtype=np.int64)
+        edge_order = np.argsort(edge_mb, kind="stable")
+        boundaries = np.searchsorted(edge_mb[edge_order], np.arange(number_of_mbs + 1))
+        self.edges_of_mb = [edge_order[boundaries[index]:boundaries[index + 1]] for index in range(number_of_mbs)]
+
+        cp_capacities = np.array([request.capacity for request in self.scenario.requests], dtype=float)
+        self.edge_cp = np.asarray(arrays.edge_cp, dtype=np.int64)
+        self.edge_weight = cp_capacities[self.edge_cp]
+        self.edge_usable = self.deployment_model.ub[number_of_mbs:] > 0.0
+        self.mb_capacities = np.array([self.scenario.middleboxes[mb] for mb in arrays.middleboxes], dtype=float)
+
+    def estimate_improvements(self):
+        self.adapt_lp(self.installed_mbs)
+        if self.incumbent_basis is not None and self.reloads_incumbent_basis():
+            self.set_basis(self.incumbent_basis)
+        self.solver.set_parameter(backends_pkg.CUTOFF, None)
+        self.solver.optimize()
+        self.current_round_iterations += self.solver.get_iteration_count()
+
+        duals = self.solver.get_duals("covering")
+
+        estimates = {}
+        for mb in self.uninstalled_mbs:
+            index = self.deployment_model.get_mb_variable_index(mb)
+            edges = self.edges_of_mb[index]
+            edges = edges[self.edge_usable[edges]]
+
+            profits = 1.0 - duals[self.edge_cp[edges]]
+            weights = self.edge_weight[edges]
+            selection = profits > 0.0
+            profits = profits[selection]
+            weights = weights[selection]
+
+            order = np.argsort(-profits / weights, kind="stable")
+            profits = profits[order]
+            weights = weights[order]
+
+            capacity = self.mb_capacities[index]
+            number_of_full_items = np.count_nonzero(np.cumsum(weights) <= capacity)
+            estimate = profits[:number_of_full_items].sum()
+            if number_of_full_items < len(profits):
+                remaining_capacity = capacity - weights[:number_of_full_items].sum()
+                estimate += profits[number_of_full_items] * remaining_capacity / weights[number_of_full_items]
+
+            estimates[mb] = estimate
+
+        return estimates
+
+    def select_middlebox(self, currently_connected_cps):
+
+        estimates = self.estimate_improvements()
+        ranking = sorted(self.uninstalled_mbs, key=lambda mb: -estimates[mb])
+
+        best_mb_to_open = None
+        best_improvement = 0
+        best_objval = None
+
+        evaluated_candidates = 0
+
+        for uninstalled_mb in ranking:
+
+            if estimates[uninstalled_mb] + 1e-6 <= best_improvement:
+                # the estimates are upper bounds, so none of the remaining middleboxes can be better
+                break
+            if self.number_of_candidates is not None and evaluated_candidates >= self.number_of_candidates and best_mb_to_open is not None:
+                break
+
+            objval = self.evaluate_candidate(uninstalled_mb, best_objval)
+            evaluated_candidates += 1
+
+            if objval is not None and objval - currently_connected_cps > best_improvement:
+                best_improvement = objval - currently_connected_cps
+                best_mb_to_open = uninstalled_mb
+                best_objval = objval
+                if self.reloads_incumbent_basis():
+                    self.best_basis = self.get_current_basis()
+
+        self.evaluated_candidates_per_round.append(evaluated_candidates)
+
+        return best_mb_to_open, best_objval
+
+    def _get_extra_information(self):
+        extra_information = super()._get_extra_information()
+        extra_information["evaluated_candidates_per_round"] = self.evaluated_candidates_per_round
+        return extra_information
@@ -26,6 +26,7 @@ from multiprocessing import Process, Queue, Lock
 from collections import deque
 
 from datamodel import matching_graph as mg_pkg
+from datamodel import scenario_registry as registry_pkg
 from algorithms import abstract_algorithm as aa_pkg
 
 class GreedyMatchingSlave:
@@ -196,8 +197,7 @@ class GreedyMatchingSlave:
 
 class WorkerMetaData:
 
-    def __init__(self, greedy_worker_class, process, task_queue, input_queue, result_queue):
-        self.greedy_worker_class = greedy_worker_class
+    def __init__(self, process, task_queue, input_queue, result_queue):
         self.process = process
         self.task_queue = task_queue
         self.input_queue = input_queue
@@ -205,31 +205,34 @@ class WorkerMetaData:
 
 
 
-def slave_execution(meta_data):
+def slave_execution(scenario_handle, task_queue, input_queue, result_queue):
+
+    # the slave is constructed in the worker itself, such that only the scenario handle is passed to the process
+    greedy_worker_class = GreedyMatchingSlave(registry_pkg.attach_scenario(scenario_handle))
 
     while True:
 
-        input = meta_data.input_queue.get()
+        input = input_queue.get()
         #print input
         if input is not None:
-            meta_data.greedy_worker_class.reinitialize_matching_graph_from_edges(input)
+            greedy_worker_class.reinitialize_matching_graph_from_edges(input)
         else:
             break
 
         while True:
-            mb = meta_data.task_queue.get()
+            mb = task_queue.get()
             #task may either be a real task or the command to terminate (first the tasks are written, then the command to end and then the input to free them)
             #i.e. execute task or exit loop
             if mb is not None:
-                meta_data.greedy_worker_class.greedy_step(mb)
+                greedy_worker_class.greedy_step(mb)
             else:
                 break
-        #print "worker...", meta_data.greedy_worker_class.current_optimum
+        #print "worker...", greedy_worker_class.current_optimum
         #send result back
-        if meta_data.greedy_worker_class.current_optimum is None:
-            meta_data.result_queue.put(None)
+        if greedy_worker_class.current_optimum is None:
+            result_queue.put(None)
         else:
-            meta_data.result_queue.put(meta_data.greedy_worker_class.current_optimum.edge_in_matching)
+            result_queue.put(greedy_worker_class.current_optimum.edge_in_matching)
 
 
 
@@ -239,6 +242,9 @@ class GreedyMatchingMaster(aa_pkg.AbstractAlgorithm):
     def __init__(self, scenario, number_of_processes):
         super().__init__(scenario)
 
+        self.owns_scenario_handle = not registry_pkg.is_published(scenario)
+        self.scenario_handle = registry_pkg.publish_scenario(scenario)
+
         self.matching_graph = mg_pkg.StatefulMatchingGraph(scenario)
         self.number_of_processes = number_of_processes
 
@@ -253,13 +259,14 @@ class GreedyMatchingMaster(aa_pkg.AbstractAlgorithm):
             self.input_queues.append(Queue())
 
         for i in range(self.number_of_processes):
-            slave = GreedyMatchingSlave(self.scenario)
-            meta_data = WorkerMetaData(greedy_worker_class=slave,
-                                       process=None,
+            meta_data = WorkerMetaData(process=None,
                                        task_queue=self.task_queue,
                                        input_queue=self.input_queues[i],
                                        result_queue=self.result_queues[i])
-            process = Process(target=slave_execution, args=(meta_data,))
+            process = Process(target=slave_execution, args=(self.scenario_handle,
+                                                            meta_data.task_queue,
+                                                            meta_data.input_queue,
+                                                            meta_data.result_queue))
             meta_data.process = process
             self.workers.append(meta_data)
             process.start()
@@ -298,6 +305,9 @@ class GreedyMatchingMaster(aa_pkg.AbstractAlgorithm):
         for i in range(self.number_of_processes):
             self.workers[i].process.terminate()
 
+        if self.owns_scenario_handle:
+            registry_pkg.release_scenario(self.scenario_handle)
+
         self.matching_graph.check_validity()
         print("[{}:{}]: found solution with {} many middleboxes!".format(self.alg_name, self.number_of_processes, self.matching_graph.number_of_active_mbs()))
 
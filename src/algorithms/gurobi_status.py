@@ -22,10 +22,14 @@
 
 __author__ = "Matthias Rost, Alexander Elvers (mrost / aelvers <AT> inet.tu-berlin.de)"
 
-import gurobipy
+# value of GRB.INFINITY; kept here so that the status can be used without gurobipy
+INFINITY = 1e100
 
 
 class GurobiStatus:
+    """ status of an optimization run; the status codes are the ones of gurobi and are also used by the other solver
+        backends (see solver_backends)
+    """
     LOADED = 1  # Model is loaded, but no solution information is available.
     OPTIMAL = 2  # Model was solved to optimality (subject to tolerances), and an optimal solution is available.
     INFEASIBLE = 3  # Model was proven to be infeasible.
@@ -44,9 +48,9 @@ class GurobiStatus:
     def __init__(self,
                  status=1,
                  solCount=0,
-                 objValue=gurobipy.GRB.INFINITY,
-                 objBound=gurobipy.GRB.INFINITY,
-                 objGap=gurobipy.GRB.INFINITY,
+                 objValue=INFINITY,
+                 objBound=INFINITY,
+                 objGap=INFINITY,
                  integralSolution=True
                  ):
         self.solCount = solCount
@@ -57,7 +61,7 @@ class GurobiStatus:
         self.integralSolution = integralSolution
 
     def _convertInfinityToNone(self, value):
-        if value is gurobipy.GRB.INFINITY:
+        if value == INFINITY:
             return None
         return value
 
@@ -27,6 +27,7 @@ from collections import deque
 
 
 from datamodel import matching_graph as mg_pkg
+from datamodel import scenario as scen_pkg
 
 from algorithms import abstract_algorithm as aa_pkg
 
@@ -37,7 +38,8 @@ class IncrementalGreedyMatching(aa_pkg.AbstractAlgorithm):
     alg_name = "GreedySingle"
 
     def __init__(self, scenario, matching_edges, new_cp):
-        super().__init__(scenario)
+        # the new pair is only added to a view, the given scenario is not changed
+        super().__init__(scen_pkg.ScenarioView(scenario))
 
         for req in self.scenario.requests:
             if req.capacity != 1:
@@ -45,14 +47,13 @@ class IncrementalGreedyMatching(aa_pkg.AbstractAlgorithm):
         self.matching_edges = matching_edges
         self.new_cp = new_cp
 
-        self.scenario.requests.append(new_cp)
-        self.scenario.add_single_request(new_cp)
-
         #print "CHECKING WHETHER THE MIP CAN SOLVE THE SCENARIO"
         #mip_alg = mip_pkg.ExactDeploymentMIP(scenario=scenario)
         #mip_alg.run()
 
-        self.matching_graph = mg_pkg.StatefulMatchingGraph(scenario)
+        # the graph of the scenario without the new pair is extended instead of being recomputed
+        self.matching_graph = mg_pkg.StatefulMatchingGraph(self.scenario)
+        self.matching_graph.add_request(new_cp)
 
         self.matching_graph.reinitialize_from_edges(matching_edges)
 
@@ -76,9 +77,16 @@ class IncrementalGreedyMatching(aa_pkg.AbstractAlgorithm):
         #print "XXX\n"
         #print len(self.matching_graph.edge_in_matching), " ", len(scenario.requests)
 
+        self._initialize_search()
+
+        #print "there exist {} many edges in the matching graph".format(len(self.matching_graph.edges))
+
+
+    def _initialize_search(self):
+        """ sets up the temporary matchings and the search structures for the matching graph """
         self.current_optimum = None
-        self.temp_matching_1 = mg_pkg.StatefulMatchingGraph(scenario)
-        self.temp_matching_2 = mg_pkg.StatefulMatchingGraph(scenario)
+        self.temp_matching_1 = mg_pkg.StatefulMatchingGraph(self.scenario, orig=self.matching_graph)
+        self.temp_matching_2 = mg_pkg.StatefulMatchingGraph(self.scenario, orig=self.matching_graph)
 
 
         self.predecessors = {}
@@ -90,9 +98,6 @@ class IncrementalGreedyMatching(aa_pkg.AbstractAlgorithm):
         for cp in self.matching_graph.communication_pairs:
             self.predecessors[cp] = None
 
-        #print "there exist {} many edges in the matching graph".format(len(self.matching_graph.edges))
-
-
     def _run(self):
 
         matching = self._extend_maximal_matching()
@@ -127,126 +132,29 @@ class IncrementalGreedyMatching(aa_pkg.AbstractAlgorithm):
 
 
 
-    def _compute_maximal_matching(self, candidate_mb):
-
-
-        tmp_mg = None
-
-        #mg_pkg.StatefulMatchingGraph(self.scenario,orig=self.matching_graph)
+    def _get_temporary_matching(self):
+        """ returns one of the two temporary matchings that is not the current optimum, reset to the matching graph """
         if self.temp_matching_1 is not self.current_optimum:
             tmp_mg = self.temp_matching_1
-            tmp_mg.reinitialize(self.matching_graph)
         elif self.temp_matching_2 is not self.current_optimum:
             tmp_mg = self.temp_matching_2
-            tmp_mg.reinitialize(self.matching_graph)
         else:
             raise Exception("This should not happen!")
-
-        #print "matching_graph ", self.matching_graph
-        #print "current_optimum", self.current_optimum
-        #print "temp_matching_1", self.temp_matching_1
-        #print "temp_matching_2", self.temp_matching_2
-        #print "tmp_mg         ", tmp_mg
-
-
-        tmp_mg.move_mb_to_active(candidate_mb)
-
-
-        while True:
-
-            for node in self.changed_predecessors:
-                self.predecessors[node] = None
-            self.changed_predecessors[:] = []
-
-            self.Q.clear()
-
-            for mb in tmp_mg.active_mbs:
-                if tmp_mg.available_capacity[mb] == 0:
-                    continue
-                else:
-                    self.Q.append((mb, True))
-                    self.predecessors[mb] = mb
-                    self.changed_predecessors.append(mb)
-
-            found_free_cp = None
-
-
-
-            while len(self.Q) > 0:
-
-                (node, matching_edge) = self.Q.popleft()
-
-                if matching_edge:
-                    mb = node
-                    #print "[compute matching] current MB: {}".format(node)
-                    for (mb,cp) in tmp_mg.edges_at_node[mb]:
-                        if self.predecessors[cp] is not None or (mb,cp) in tmp_mg.edge_in_matching:
-                            continue
-                        self.Q.append((cp,False))
-                        self.predecessors[cp] = mb
-                        self.changed_predecessors.append(cp)
-                else:
-                    cp = node
-                    #print "[compute matching] current CP: {}".format(node)
-                    if tmp_mg.is_free_cp[cp]:
-                        found_free_cp = cp
-                        break
-
-                    for (mb,cp) in tmp_mg.edges_at_node[cp]:
-                        if self.predecessors[mb] is not None or (mb,cp) not in tmp_mg.edge_in_matching:
-                            continue
-                        self.Q.append((mb, True))
-                        self.predecessors[mb] = cp
-                        self.changed_predecessors.append(mb)
-
-            if found_free_cp is None:
-                #we are done!
-                break
-            else:
-                tmp_mg.remove_cp_from_free_cps(cp)
-
-                current_node = found_free_cp
-                matching_edge = True
-
-                while self.predecessors[current_node] is not current_node:
-                    edge = None
-                    pred = self.predecessors[current_node]
-                    if matching_edge:
-                        edge = (pred,current_node)
-                        tmp_mg.edge_in_matching.add(edge)
-                    else:
-                        edge = (current_node, pred)
-                        tmp_mg.edge_in_matching.remove(edge)
-                    matching_edge = not matching_edge
-                    current_node = pred
-
-                #current_node is now the initial middlebox
-                tmp_mg.reduce_available_capacity_of_mb(current_node)
-
+        tmp_mg.reinitialize(self.matching_graph)
         return tmp_mg
 
+    def _compute_maximal_matching(self, candidate_mb, max_path_length=None):
+        tmp_mg = self._get_temporary_matching()
+        tmp_mg.move_mb_to_active(candidate_mb)
+        return self._augment(tmp_mg, max_path_length)
 
-    def _extend_maximal_matching(self):
-
-
-        tmp_mg = None
-
-        #mg_pkg.StatefulMatchingGraph(self.scenario,orig=self.matching_graph)
-        if self.temp_matching_1 is not self.current_optimum:
-            tmp_mg = self.temp_matching_1
-            tmp_mg.reinitialize(self.matching_graph)
-        elif self.temp_matching_2 is not self.current_optimum:
-            tmp_mg = self.temp_matching_2
-            tmp_mg.reinitialize(self.matching_graph)
-        else:
-            raise Exception("This should not happen!")
-
-        #print "matching_graph ", self.matching_graph
-        #print "current_optimum", self.current_optimum
-        #print "temp_matching_1", self.temp_matching_1
-        #print "temp_matching_2", self.temp_matching_2
-        #print "tmp_mg         ", tmp_mg
+    def _extend_maximal_matching(self, max_path_length=None):
+        return self._augment(self._get_temporary_matching(), max_path_length)
 
+    def _augment(self, tmp_mg, max_path_length=None):
+        """ augments the matching of tmp_mg along shortest augmenting paths starting at the active middleboxes with
+            free capacity until it is maximal; with max_path_length, only paths of at most this many edges are used
+        """
 
         while True:
 
@@ -260,7 +168,7 @@ class IncrementalGreedyMatching(aa_pkg.AbstractAlgorithm):
                 if tmp_mg.available_capacity[mb] == 0:
                     continue
                 else:
-                    self.Q.append((mb, True))
+                    self.Q.append((mb, True, 0))
                     self.predecessors[mb] = mb
                     self.changed_predecessors.append(mb)
 
@@ -270,20 +178,22 @@ class IncrementalGreedyMatching(aa_pkg.AbstractAlgorithm):
 
             while len(self.Q) > 0:
 
-                (node, matching_edge) = self.Q.popleft()
+                (node, matching_edge, length) = self.Q.popleft()
 
                 if matching_edge:
                     mb = node
-                    #print "[extend matching] current MB: {}".format(node)
+                    #print "[augment matching] current MB: {}".format(node)
+                    if max_path_length is not None and length >= max_path_length:
+                        continue
                     for (mb,cp) in tmp_mg.edges_at_node[mb]:
                         if self.predecessors[cp] is not None or (mb,cp) in tmp_mg.edge_in_matching:
                             continue
-                        self.Q.append((cp,False))
+                        self.Q.append((cp,False,length+1))
                         self.predecessors[cp] = mb
                         self.changed_predecessors.append(cp)
                 else:
                     cp = node
-                    #print "[extend matching] current CP: {}".format(node)
+                    #print "[augment matching] current CP: {}".format(node)
                     if tmp_mg.is_free_cp[cp]:
                         found_free_cp = cp
                         break
@@ -291,7 +201,7 @@ class IncrementalGreedyMatching(aa_pkg.AbstractAlgorithm):
                     for (mb,cp) in tmp_mg.edges_at_node[cp]:
                         if self.predecessors[mb] is not None or (mb,cp) not in tmp_mg.edge_in_matching:
                             continue
-                        self.Q.append((mb, True))
+                        self.Q.append((mb, True, length+1))
                         self.predecessors[mb] = cp
                         self.changed_predecessors.append(mb)
 
@@ -304,7 +214,9 @@ class IncrementalGreedyMatching(aa_pkg.AbstractAlgorithm):
                 current_node = found_free_cp
                 matching_edge = True
 
-                while self.predecessors[current_node] is not current_node:
+                # the middleboxes of the previous matching may stem from another process, so they are compared by
+                # value rather than identity
+                while self.predecessors[current_node] != current_node:
                     edge = None
                     pred = self.predecessors[current_node]
                     if matching_edge:
@@ -22,19 +22,64 @@
 
 __author__ = "Matthias Rost, Alexander Elvers (mrost / aelvers <AT> inet.tu-berlin.de)"
 
-import gurobipy
-from gurobipy import GRB
+import numpy as np
+import scipy.sparse as sp
 
 from algorithms import abstract_algorithm as aa_pkg
-from algorithms.gurobi_status import GurobiStatus
+from algorithms import mip_model_builder as builder_pkg
+from algorithms import solver_backends as backends_pkg
 from datamodel import matching_graph as mg_pkg
+from datamodel import scenario as scen_pkg
+
+
+def get_start_solution(deployment_model, matching_edges, new_cp, scenario):
+    """ returns the previous deployment extended by the new communication pair as values of the model's variables: the
+        pair is served by an open middlebox with free capacity or, if there is none, by opening an additional one. If
+        all middleboxes of the pair are open and full, there is no such start solution and None is returned.
+    """
+    arrays = deployment_model.arrays
+    number_of_mbs = deployment_model.number_of_mb_variables
+    edge_index = {edge: index for index, edge in enumerate(arrays.edges)}
+
+    values = np.zeros(deployment_model.number_of_variables)
+    load = {}
+    for (mb, cp) in matching_edges:
+        values[arrays.middlebox_index[mb]] = 1.0
+        values[number_of_mbs + edge_index[(mb, cp)]] = 1.0
+        load[mb] = load.get(mb, 0) + 1
+
+    new_cp_index = len(scenario.requests) - 1
+    new_edges = [(mb, cp) for (mb, cp) in arrays.edges if cp == new_cp_index]
+    new_edge = get_edge_of_new_pair(new_edges, load, scenario)
+    if new_edge is None:
+        return None
+
+    values[arrays.middlebox_index[new_edge[0]]] = 1.0
+    values[number_of_mbs + edge_index[new_edge]] = 1.0
+    return values
+
+
+def get_edge_of_new_pair(new_edges, load, scenario):
+    """ returns the edge of a new pair to an open middlebox with free capacity, else to a closed middlebox, else None """
+    open_edges = [(mb, cp) for (mb, cp) in new_edges if 0 < load.get(mb, 0) < scenario.middleboxes[mb]]
+    if len(open_edges) > 0:
+        return open_edges[0]
+    closed_edges = [(mb, cp) for (mb, cp) in new_edges if load.get(mb, 0) == 0 and scenario.middleboxes[mb] > 0]
+    if len(closed_edges) > 0:
+        return closed_edges[0]
+    return None
 
 
 class IncrementalExactDeploymentMIP(aa_pkg.AbstractAlgorithm):
+    """ computes an optimal deployment after new_cp has arrived. With warm_start, the previous deployment given by
+        matching_edges (extended by the new pair) is passed as start solution; a positive reassignment_penalty is
+        added to the objective for every previously served pair that is assigned to a different middlebox.
+    """
     alg_name = "OptimalMIP  "
 
-    def __init__(self, scenario, matching_edges, new_cp):
-        super().__init__(scenario)
+    def __init__(self, scenario, matching_edges, new_cp, with_names=False, backend=None, warm_start=False, reassignment_penalty=0.0):
+        # the new pair is only added to a view, the given scenario is not changed
+        super().__init__(scen_pkg.ScenarioView(scenario))
 
         for req in self.scenario.requests:
             if req.capacity != 1:
@@ -43,75 +88,190 @@ class IncrementalExactDeploymentMIP(aa_pkg.AbstractAlgorithm):
         self.matching_edges = matching_edges
         self.new_cp = new_cp
 
-        self.scenario.requests.append(new_cp)
-        self.scenario.add_single_request(new_cp)
-
-        self.mb_vars = {}
-        self.mb_assignment_vars = {}
-        self.model = None
-        self.mg = mg_pkg.StatefulMatchingGraph(scenario)
+        self.deployment_model = None
+        self.solver = None
+        self.backend = backend
+        self.mg = mg_pkg.StatefulMatchingGraph(self.scenario)
+        self.mg.add_request(new_cp)
+        self.with_names = with_names
+        self.warm_start = warm_start
+        self.reassignment_penalty = reassignment_penalty
 
 
     def _run(self):
-        self.model = gurobipy.Model("mb-deployment")
+        builder = builder_pkg.DeploymentModelBuilder(self.scenario, self.mg, with_names=self.with_names)
+        self.deployment_model = builder.build(objective=builder_pkg.MIN_MIDDLEBOXES, covering_sense=builder_pkg.EQUAL, integral=True)
+        self.solver = backends_pkg.create_backend(self.backend, "mb-deployment")
+        self.solver.load_model(self.deployment_model)
 
+        self.solver.set_parameter(backends_pkg.THREADS, 1)
 
-        for mb in self.mg.middleboxes:
-            variableId = "mb_decision_{}".format(mb)
-            self.mb_vars[mb] = self.model.addVar(lb=0.0, ub=1.0, obj=1.0, vtype=GRB.BINARY, name=variableId)
-        for (mb, cp) in self.mg.edges:
-            variableId = "mb_cp_assignment_{}_{}_{}".format(mb, self.scenario.requests[cp].tail, self.scenario.requests[cp].head)
-            self.mb_assignment_vars[(mb,cp)] = self.model.addVar(lb=0.0, ub=1.0, obj=0.0, vtype=GRB.BINARY, name=variableId)
+        if self.reassignment_penalty > 0:
+            previous_edges = [self.deployment_model.number_of_mb_variables + index
+                              for index, edge in enumerate(self.deployment_model.arrays.edges) if edge in self.matching_edges]
+            # keeping an assignment saves its penalty, so the objective counts the reassignments up to a constant
+            self.solver.set_objective_coefficients(previous_edges, np.full(len(previous_edges), -self.reassignment_penalty))
 
-        self.model.update()
+        if self.warm_start:
+            start_solution = get_start_solution(self.deployment_model, self.matching_edges, self.new_cp, self.scenario)
+            if start_solution is not None:
+                self.solver.set_start_solution(start_solution)
 
-        self.model.setObjective(self.model.getObjective(), GRB.MINIMIZE)
+        #self.solver.write_model("fun.lp")
 
-        for cp in self.mg.communication_pairs:
-            constr = gurobipy.LinExpr()
-            for (mb,cp) in self.mg.edges_at_node[cp]:
-                constr.addTerms(1.0, self.mb_assignment_vars[(mb,cp)])
-            self.model.addConstr(constr, GRB.EQUAL, 1.0, name="covering_{}_{}".format(self.scenario.requests[cp].tail, self.scenario.requests[cp].head))
+        self.solver.optimize()
 
-        for mb in self.mg.middleboxes:
-            constr = gurobipy.LinExpr()
-            for (mb,cp) in self.mg.edges_at_node[mb]:
-                constr.addTerms(1.0, self.mb_assignment_vars[(mb,cp)])
-            constr.addTerms(-1.0 * self.scenario.middleboxes[mb], self.mb_vars[mb])
-            self.model.addConstr(constr, GRB.LESS_EQUAL, 0.0, name="upper_bound_{}".format(mb))
+        self.status = self.solver.get_status()
 
-        for (mb,cp) in self.mg.edges:
-            constr = gurobipy.LinExpr()
-            constr.addTerms(1.0, self.mb_assignment_vars[(mb,cp)])
-            constr.addTerms(-1.0, self.mb_vars[mb])
-            self.model.addConstr(constr, GRB.LESS_EQUAL, 0.0, name="lower_bound_{}_{}_{}".format(mb, self.scenario.requests[cp].tail, self.scenario.requests[cp].head))
+        if self.status.isFeasible():
+            self.deployment_model.decode_solution(self.solver.get_solution(), self.mg)
+            self.mg.check_validity()
 
-        self.model.update()
+            return self.mg
+        return None
 
-        self.model.setParam("Threads", 1)
+    def _get_extra_information(self):
+        return {"model_build": self.deployment_model.build_statistics, "solver": self.solver.backend_name}
 
-        #self.model.write("fun.lp")
 
-        self.model.optimize()
+class PersistentDeploymentMIP:
+    """ keeps the deployment MIP of a scenario alive while communication pairs arrive.
 
-        self.status = GurobiStatus(status=self.model.getAttr("Status"),
-                                    solCount=self.model.getAttr("SolCount"),
-                                    objValue=self.model.getAttr("ObjVal"),
-                                    objGap=self.model.getAttr("MIPGap"),
-                                    objBound=self.model.getAttr("ObjBound"),
-                                    integralSolution=True)
+        add_request only appends the assignment variables of the new pair, its covering constraint and the linking
+        constraints of its edges to the loaded model, and the previous solution extended by the new pair is used as
+        start solution. With a positive reassignment_penalty, every previously served pair that is moved to another
+        middlebox is penalized, such that the solver stays close to the previous deployment.
 
-        if self.status.isFeasible():
-            for mb in self.mg.middleboxes:
-                if self.mb_vars[mb].X > 0.5:
-                    self.mg.move_mb_to_active(mb)
-            for (mb,cp) in self.mg.edges:
-                if self.mb_assignment_vars[(mb,cp)].X > 0.5:
-                    self.mg.edge_in_matching.add((mb,cp))
-            self.mg.check_validity()
+        Without reassignment penalty, the number of middleboxes of an optimal solution is minimal. As an arriving pair
+        cannot decrease the number of middleboxes needed, the start solution is then optimal if the new pairs fit into
+        open middleboxes, and the solver is not invoked. Otherwise the previous minimum is passed to the solver as
+        lower bound on the number of middleboxes. With a positive reassignment_penalty, the optimum trades middleboxes
+        against kept assignments, so it yields neither the shortcut nor the lower bound.
 
-            return self.mg
-        return None
+        Several pairs may be added between two calls of solve; active_mbs and matching_edges always describe the start
+        solution extended by the pairs added so far and respect the capacities. A pair whose middleboxes are all open
+        and full is left unassigned; no start solution is passed to the next solve then.
+    """
 
-    def _get_extra_information(self):
-        return None
+    def __init__(self, scenario, backend=None, reassignment_penalty=0.0, mip_gap=0.001):
+        for req in scenario.requests:
+            if req.capacity != 1:
+                raise Exception("Requests must have a capacity of 1.")
+
+        # arriving pairs are added to a view, the given scenario is not changed
+        self.scenario = scen_pkg.ScenarioView(scenario)
+        self.backend = backend
+        self.reassignment_penalty = reassignment_penalty
+        self.mip_gap = mip_gap
+
+        self.mg = mg_pkg.MatchingGraph(self.scenario)
+        builder = builder_pkg.DeploymentModelBuilder(self.scenario, self.mg)
+        self.deployment_model = builder.build(objective=builder_pkg.MIN_MIDDLEBOXES, covering_sense=builder_pkg.EQUAL, integral=True)
+        self.solver = backends_pkg.create_backend(self.backend, "mb-deployment-persistent")
+        self.solver.load_model(self.deployment_model)
+        self.solver.set_parameter(backends_pkg.THREADS, 1)
+        self.solver.set_parameter(backends_pkg.MIP_GAP, self.mip_gap)
+
+        arrays = self.deployment_model.arrays
+        self.middleboxes = arrays.middleboxes
+        self.middlebox_index = arrays.middlebox_index
+        self.number_of_mbs = self.deployment_model.number_of_mb_variables
+        # the assignment variables of the arriving pairs are appended, so the edge list of the model is extended here
+        self.edges = list(arrays.edges)
+
+        number_of_mbs = self.number_of_mbs
+        cardinality = sp.csr_matrix((np.ones(number_of_mbs), (np.zeros(number_of_mbs, dtype=np.int64), np.arange(number_of_mbs))),
+                                    shape=(1, self.deployment_model.number_of_variables))
+        self.solver.add_constraints("minimal_number_of_middleboxes", cardinality, builder_pkg.GREATER_EQUAL, [0.0])
+
+        self.values = None
+        self.active_mbs = set()
+        self.matching_edges = set()
+        self.status = None
+
+        self.previous_solution_is_optimal = False
+        self.start_solution_is_optimal = False
+        self.start_solution_is_feasible = False
+        self.number_of_solver_calls = 0
+
+    def add_request(self, request):
+        cp = self.mg.add_request(request)
+        mbs = [mb for (mb, _) in self.mg.edges_at_node[cp]]
+        if len(mbs) == 0:
+            raise Exception("The communication pair {} cannot be served by any middlebox.".format(cp))
+        mb_indices = np.array([self.middlebox_index[mb] for mb in mbs], dtype=np.int64)
+        number_of_new_edges = len(mbs)
+
+        capacity_columns = sp.csc_matrix((np.ones(number_of_new_edges), (mb_indices, np.arange(number_of_new_edges))),
+                                         shape=(self.number_of_mbs, number_of_new_edges))
+        columns = self.solver.add_variables(np.zeros(number_of_new_edges), np.zeros(number_of_new_edges), np.ones(number_of_new_edges),
+                                            {"upper_bound": capacity_columns}, vtype=builder_pkg.BINARY)
+
+        number_of_variables = self.solver.number_of_variables
+        covering = sp.csr_matrix((np.ones(number_of_new_edges), (np.zeros(number_of_new_edges, dtype=np.int64), columns)),
+                                 shape=(1, number_of_variables))
+        self.solver.add_constraints("covering", covering, builder_pkg.EQUAL, [1.0])
+
+        linking_rows = np.concatenate((np.arange(number_of_new_edges), np.arange(number_of_new_edges)))
+        linking_columns = np.concatenate((columns, mb_indices))
+        linking_data = np.concatenate((np.ones(number_of_new_edges), -np.ones(number_of_new_edges)))
+        linking = sp.csr_matrix((linking_data, (linking_rows, linking_columns)), shape=(number_of_new_edges, number_of_variables))
+        self.solver.add_constraints("lower_bound", linking, builder_pkg.LESS_EQUAL, np.zeros(number_of_new_edges))
+
+        self.edges.extend((mb, cp) for mb in mbs)
+
+        if self.values is not None:
+            self.values = np.concatenate((self.values, np.zeros(number_of_new_edges)))
+            load = {}
+            for (mb, _) in self.matching_edges:
+                load[mb] = load.get(mb, 0) + 1
+            # serve the new pair by an open middlebox if possible and by an additional one otherwise
+            new_edge = get_edge_of_new_pair([(mb, cp) for mb in mbs], load, self.scenario)
+            if new_edge is None:
+                self.start_solution_is_feasible = False
+                self.start_solution_is_optimal = False
+            else:
+                new_edge_index = mbs.index(new_edge[0])
+                self.values[mb_indices[new_edge_index]] = 1.0
+                self.values[columns[new_edge_index]] = 1.0
+
+                self.start_solution_is_optimal = self.start_solution_is_optimal and load.get(new_edge[0], 0) > 0
+                self.active_mbs.add(new_edge[0])
+                self.matching_edges.add(new_edge)
+
+        return cp
+
+    def solve(self):
+        if self.start_solution_is_optimal:
+            return True
+
+        if self.values is not None:
+            if self.start_solution_is_feasible:
+                self.solver.set_start_solution(self.values)
+            if self.reassignment_penalty > 0:
+                objective = np.zeros(len(self.edges))
+                objective[self.values[self.number_of_mbs:] > 0.5] = -self.reassignment_penalty
+                self.solver.set_objective_coefficients(np.arange(self.number_of_mbs, self.number_of_mbs + len(self.edges)), objective)
+
+        self.solver.optimize()
+        self.status = self.solver.get_status()
+        self.number_of_solver_calls += 1
+
+        if not self.status.isFeasible():
+            self.previous_solution_is_optimal = False
+            self.start_solution_is_optimal = False
+            return False
+        self.start_solution_is_feasible = True
+
+        # the mip gap is smaller than one middlebox, so the number of middleboxes is minimal; with reassignment
+        # penalty, the objective also counts the kept assignments and the number of middleboxes may not be minimal
+        self.previous_solution_is_optimal = (self.reassignment_penalty == 0 and self.status.isOptimal()
+                                             and self.mip_gap * len(self.scenario.middleboxes) < 1)
+        self.start_solution_is_optimal = self.previous_solution_is_optimal
+
+        self.values = np.round(self.solver.get_solution())
+        self.active_mbs = set(self.middleboxes[index] for index in np.flatnonzero(self.values[:self.number_of_mbs] > 0.5))
+        if self.previous_solution_is_optimal:
+            self.solver.set_constraint_rhs("minimal_number_of_middleboxes", [float(len(self.active_mbs))])
+        self.matching_edges = set(self.edges[index] for index in np.flatnonzero(self.values[self.number_of_mbs:] > 0.5))
+        return True
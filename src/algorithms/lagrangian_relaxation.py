@@ -0,0 +1,216 @@
+# MIT License
+#
+# Copyright (c) 2017 Matthias Rost, Alexander Elvers
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+__author__ = "Matthias Rost, Alexander Elvers (mrost / aelvers <AT> inet.tu-berlin.de)"
+
+import math
+import time
+
+import numpy as np
+
+from algorithms import abstract_algorithm as aa_pkg
+from algorithms import fractional_coverage_flow as flow_pkg
+from datamodel import matching_graph as mg_pkg
+
+
+class LagrangianDeployment(aa_pkg.AbstractAlgorithm):
+    """ lower bounds the minimal number of middleboxes by relaxing the covering constraints of the ExactDeploymentMIP
+        model with multipliers lambda_c >= 0.
+
+        The relaxation decomposes per middlebox: opening mb pays 1 and gains the largest (up to its capacity many)
+        positive multipliers of its pairs, so it is opened iff this gain exceeds 1. All subproblems are solved at once
+        by sorting the edges by middlebox and multiplier. The multipliers follow subgradient steps of Polyak type
+        towards the best known deployment, whose step scale is halved after patience iterations without
+        improvement. Every heuristic_interval iterations the middleboxes opened by the subproblems are completed to
+        a deployment: they are opened in a FractionalCoverageFlow, whose flow is integral for requests of capacity 1,
+        in the order of decreasing gain and further middleboxes are added greedily by their coverage. The completion
+        is abandoned as soon as it cannot improve on the best deployment. The bound of these iterations is kept in
+        bound_history.
+    """
+    alg_name = "Lagrangian  "
+
+    def __init__(self, scenario, max_iterations=300, heuristic_interval=10, step_scale=2.0, patience=20, min_step_scale=1e-4):
+        super().__init__(scenario)
+
+        for req in self.scenario.requests:
+            if req.capacity != 1:
+                raise Exception("Requests must have a capacity of 1.")
+
+        self.max_iterations = max_iterations
+        self.heuristic_interval = heuristic_interval
+        self.step_scale = step_scale
+        self.patience = patience
+        self.min_step_scale = min_step_scale
+
+        self.mg = mg_pkg.StatefulMatchingGraph(scenario)
+
+        self.best_bound = -math.inf
+        self.best_deployment = None
+        self.bound_history = []
+        self.heuristic_history = []
+        self.iterations = 0
+        self.time_heuristic = 0.0
+
+    def _run(self):
+        arrays = self.mg.get_array_form()
+        number_of_mbs = len(arrays.middleboxes)
+        number_of_cps = arrays.number_of_communication_pairs
+        edge_mb = np.asarray(arrays.edge_mb, dtype=np.int64)
+        edge_cp = np.asarray(arrays.edge_cp, dtype=np.int64)
+        capacities = np.array([self.scenario.middleboxes[mb] for mb in arrays.middleboxes], dtype=np.int64)
+        edge_capacity = capacities[edge_mb]
+
+        if np.any(np.bincount(edge_cp, minlength=number_of_cps) == 0):
+            # a pair that no middlebox can serve renders the scenario infeasible
+            return None
+
+        # start with the multipliers that make the cheapest middlebox of each pair break even
+        multipliers = np.full(number_of_cps, np.inf)
+        np.minimum.at(multipliers, edge_cp, 1.0 / edge_capacity)
+
+        step_scale = self.step_scale
+        iterations_without_improvement = 0
+        mb_order = np.argsort(edge_mb, kind="stable")
+        for iteration in range(self.max_iterations):
+            self.iterations = iteration + 1
+
+            bound, opened, selected_edges = self._solve_subproblems(multipliers, edge_mb, edge_cp, edge_capacity, number_of_mbs, mb_order)
+
+            if bound > self.best_bound + 1e-9:
+                self.best_bound = bound
+                iterations_without_improvement = 0
+            else:
+                iterations_without_improvement += 1
+
+            if self.best_deployment is None or iteration % self.heuristic_interval == 0:
+                # the bound is only recorded together with the heuristic to keep the extra information small
+                self.bound_history.append((time.perf_counter() - self.start_time, float(bound)))
+                self._run_heuristic(opened, multipliers, edge_mb, edge_cp, arrays)
+
+            upper_bound = self.best_deployment.number_of_active_mbs()
+            if math.ceil(self.best_bound - 1e-6) >= upper_bound:
+                break
+
+            if iterations_without_improvement >= self.patience:
+                step_scale /= 2.0
+                iterations_without_improvement = 0
+                if step_scale < self.min_step_scale:
+                    break
+
+            subgradient = 1.0 - np.bincount(edge_cp[selected_edges], minlength=number_of_cps)
+            # multipliers that are zero cannot decrease any further
+            subgradient[(multipliers <= 0.0) & (subgradient < 0.0)] = 0.0
+            norm = subgradient @ subgradient
+            if norm == 0.0:
+                # the relaxed solution covers every pair exactly once and is thus optimal
+                break
+            step = step_scale * (upper_bound - bound) / norm
+            multipliers = np.maximum(0.0, multipliers + step * subgradient)
+
+        if self.best_deployment is None:
+            return None
+
+        self.best_deployment.check_validity()
+        print(f"[{self.alg_name}]: found solution with {self.best_deployment.number_of_active_mbs()} many middleboxes"
+              f" (lagrangian bound {self.best_bound:.3f} after {self.iterations} iterations)")
+        return self.best_deployment
+
+    def _solve_subproblems(self, multipliers, edge_mb, edge_cp, edge_capacity, number_of_mbs, mb_order):
+        """ returns the lagrangian bound, the opened middleboxes and the selected edges for the given multipliers """
+        edge_multipliers = multipliers[edge_cp]
+        # edges grouped by middlebox, each group sorted by decreasing multiplier
+        order = np.lexsort((-edge_multipliers, edge_mb))
+        sorted_mbs = edge_mb[order]
+        group_start = np.searchsorted(sorted_mbs, sorted_mbs, side="left")
+        rank = np.arange(len(order)) - group_start
+        candidate = (rank < edge_capacity[order]) & (edge_multipliers[order] > 0.0)
+
+        gain = np.bincount(sorted_mbs[candidate], weights=edge_multipliers[order][candidate], minlength=number_of_mbs)
+        reduced_costs = 1.0 - gain
+        opened = reduced_costs < 0.0
+
+        selected_edges = order[candidate & opened[sorted_mbs]]
+        bound = multipliers.sum() + reduced_costs[opened].sum()
+        return bound, opened, selected_edges
+
+    def _run_heuristic(self, opened, multipliers, edge_mb, edge_cp, arrays):
+        start_time = time.perf_counter()
+        # the middleboxes with the largest gain are matched first
+        gain = np.bincount(edge_mb, weights=multipliers[edge_cp], minlength=len(arrays.middleboxes))
+        candidates = np.flatnonzero(opened)
+        candidates = candidates[np.argsort(-gain[candidates], kind="stable")]
+        max_middleboxes = None if self.best_deployment is None else self.best_deployment.number_of_active_mbs() - 1
+        deployment = self._complete_deployment([arrays.middleboxes[index] for index in candidates],
+                                               [arrays.middleboxes[index] for index in np.argsort(-gain, kind="stable")],
+                                               max_middleboxes)
+        self.time_heuristic += time.perf_counter() - start_time
+
+        if deployment is None:
+            return
+        self.heuristic_history.append((time.perf_counter() - self.start_time, deployment.number_of_active_mbs()))
+        if self.best_deployment is None or deployment.number_of_active_mbs() < self.best_deployment.number_of_active_mbs():
+            self.best_deployment = deployment
+
+    def _complete_deployment(self, middleboxes, middleboxes_by_gain, max_middleboxes):
+        """ opens the given middleboxes that serve further pairs and then adds the middlebox serving the most further
+            pairs until all are served; ties are broken by the order of middleboxes_by_gain
+        """
+        flow = flow_pkg.FractionalCoverageFlow(self.scenario, self.mg)
+        opened = set()
+        for mb in middleboxes:
+            if max_middleboxes is not None and len(opened) >= max_middleboxes:
+                break
+            if flow.evaluate_opening(mb) > flow.get_value() + 0.5:
+                flow.open_middlebox(mb)
+                opened.add(mb)
+
+        number_of_cps = len(self.mg.communication_pairs)
+        while flow.get_value() < number_of_cps - 0.5:
+            if max_middleboxes is not None and len(opened) >= max_middleboxes:
+                return None
+            best_mb = None
+            best_value = flow.get_value()
+            for mb in middleboxes_by_gain:
+                if mb in opened:
+                    continue
+                value = flow.evaluate_opening(mb)
+                if value > best_value + 0.5:
+                    best_mb, best_value = mb, value
+            if best_mb is None:
+                return None
+            flow.open_middlebox(best_mb)
+            opened.add(best_mb)
+
+        deployment = mg_pkg.StatefulMatchingGraph(self.scenario, orig=self.mg)
+        deployment.reinitialize_from_edges({edge for edge, value in flow.get_assignment_values().items() if value > 0.5})
+        return deployment
+
+    def _get_extra_information(self):
+        lower_bound = math.ceil(self.best_bound - 1e-6)
+        number_of_middleboxes = self.best_deployment.number_of_active_mbs()
+        return {"lagrangian_bound": float(self.best_bound),
+                "lower_bound": lower_bound,
+                "gap": (number_of_middleboxes - lower_bound) / number_of_middleboxes,
+                "iterations": self.iterations,
+                "bound_history": self.bound_history,
+                "heuristic_history": self.heuristic_history,
+                "time_heuristic": self.time_heuristic}
@@ -0,0 +1,206 @@
+# MIT License
+#
+# Copyright (c) 2017 Matthias Rost, Alexander Elvers
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+__author__ = "Matthias Rost, Alexander Elvers (mrost / aelvers <AT> inet.tu-berlin.de)"
+
+import math
+import time
+
+import numpy as np
+import scipy.sparse as sp
+
+from algorithms import abstract_algorithm as aa_pkg
+from algorithms import greedy_matching as greedy_pkg
+from algorithms import mip_model_builder as builder_pkg
+from algorithms import solver_backends as backends_pkg
+from datamodel import matching_graph as mg_pkg
+
+
+# every middlebox is opened independently with (scaled) probability of its lp value
+ROUNDING_INDEPENDENT = "independent"
+# systematic sampling over the middleboxes in random order, which opens floor or ceil of the (scaled) lp objective
+ROUNDING_DEPENDENT = "dependent"
+
+
+class MatchingRepair(greedy_pkg.GreedyMatching):
+    """ completes a set of opened middleboxes to a deployment using the augmenting paths of GreedyMatching: the opened
+        middleboxes are matched maximally and further middleboxes are added greedily until all pairs are covered.
+        The repair is abandoned (None) once more than max_middleboxes middleboxes would be used; as the used
+        middleboxes stay in use, the repair cannot end up below their number.
+    """
+    alg_name = "MatchingRepair"
+
+    def repair(self, middleboxes, max_middleboxes=None):
+        self.matching_graph.reinitialize_from_edges(set())
+        self.current_optimum = None
+        for mb in middleboxes:
+            self.current_optimum = self._compute_maximal_matching(mb)
+            self.matching_graph.reinitialize(self.current_optimum)
+
+        number_of_cps = len(self.matching_graph.communication_pairs)
+        while self.matching_graph.get_size_of_matching() < number_of_cps:
+            if len(self.matching_graph.inactive_mbs) == 0:
+                return None
+            # the opened middleboxes are matched maximally, so any further pair needs another middlebox
+            if max_middleboxes is not None and len({mb for (mb, cp) in self.matching_graph.edge_in_matching}) >= max_middleboxes:
+                return None
+            self.matching_graph.reinitialize(self._greedy_step())
+
+        # opened middleboxes that ended up without any pair are closed again
+        result = mg_pkg.StatefulMatchingGraph(self.scenario, orig=self.matching_graph)
+        used_mbs = {mb for (mb, cp) in result.edge_in_matching}
+        for mb in result.active_mbs - used_mbs:
+            result.active_mbs.remove(mb)
+            result.inactive_mbs.add(mb)
+        return result
+
+
+class LPRoundingDeployment(aa_pkg.AbstractAlgorithm):
+    """ solves the lp relaxation of the ExactDeploymentMIP model once and rounds its middlebox decisions.
+
+        The roundings are drawn as one batch for all scaling factors and screened with numpy: only the distinct
+        roundings opening enough capacity and covering every pair are candidates, of which the number_of_repairs
+        smallest ones (plus the threshold rounding of the lp values at one half) are repaired by MatchingRepair.
+        As the number of middleboxes is integral, the rounded up lp objective is a lower bound for the gap.
+    """
+    alg_name = "LPRounding  "
+
+    def __init__(self, scenario, number_of_roundings=256, number_of_repairs=8, scaling_factors=(1.0, 1.5, 2.0),
+                 rounding=ROUNDING_DEPENDENT, seed=0, backend=None):
+        super().__init__(scenario)
+
+        for req in self.scenario.requests:
+            if req.capacity != 1:
+                raise Exception("Requests must have a capacity of 1.")
+        if rounding not in (ROUNDING_INDEPENDENT, ROUNDING_DEPENDENT):
+            raise Exception("Unknown rounding {}".format(rounding))
+
+        self.number_of_roundings = number_of_roundings
+        self.number_of_repairs = number_of_repairs
+        self.scaling_factors = scaling_factors
+        self.rounding = rounding
+        self.seed = seed
+        self.backend = backend
+
+        self.mg = mg_pkg.StatefulMatchingGraph(scenario)
+        self.deployment_model = None
+        self.solver = None
+
+        self.lp_bound = None
+        self.lower_bound = None
+        self.statistics = {}
+
+    def _run(self):
+        start_time = time.perf_counter()
+        builder = builder_pkg.DeploymentModelBuilder(self.scenario, self.mg)
+        self.deployment_model = builder.build(objective=builder_pkg.MIN_MIDDLEBOXES, covering_sense=builder_pkg.EQUAL, integral=False)
+        self.solver = backends_pkg.create_backend(self.backend, "mb-deployment-relaxation")
+        self.solver.load_model(self.deployment_model)
+        self.solver.set_parameter(backends_pkg.THREADS, 1)
+        self.solver.optimize()
+
+        status = self.solver.get_status()
+        if not status.isFeasible():
+            return None
+        self.lp_bound = self.solver.get_objective_value()
+        self.lower_bound = math.ceil(self.lp_bound - 1e-6)
+        lp_values = np.clip(self.solver.get_solution()[:self.deployment_model.number_of_mb_variables], 0.0, 1.0)
+        lp_time = time.perf_counter()
+
+        candidates = self._draw_candidates(lp_values)
+        rounding_time = time.perf_counter()
+
+        middleboxes = self.deployment_model.arrays.middleboxes
+        repair = MatchingRepair(self.scenario)
+        best = None
+        repaired_sizes = []
+        for opened in candidates:
+            # only repairs improving on the best deployment are of interest
+            max_middleboxes = None if best is None else best.number_of_active_mbs() - 1
+            repaired = repair.repair([middleboxes[index] for index in np.flatnonzero(opened)], max_middleboxes)
+            if repaired is None:
+                continue
+            repaired_sizes.append(repaired.number_of_active_mbs())
+            if best is None or repaired.number_of_active_mbs() < best.number_of_active_mbs():
+                best = repaired
+            if best.number_of_active_mbs() == self.lower_bound:
+                break
+        end_time = time.perf_counter()
+
+        self.statistics.update({"time_lp": lp_time - start_time,
+                                "time_rounding": rounding_time - lp_time,
+                                "time_repair": end_time - rounding_time,
+                                "number_of_repairs": len(repaired_sizes),
+                                "repaired_sizes": repaired_sizes})
+        if best is None:
+            return None
+
+        best.check_validity()
+        self.statistics["gap"] = (best.number_of_active_mbs() - self.lower_bound) / best.number_of_active_mbs()
+        print(f"[{self.alg_name}]: found solution with {best.number_of_active_mbs()} many middleboxes"
+              f" (lp bound {self.lp_bound:.3f})")
+        return best
+
+    def _draw_candidates(self, lp_values):
+        """ returns the opened middleboxes of the candidates to repair as boolean rows, the smallest first """
+        rng = np.random.default_rng(self.seed)
+        number_of_mbs = len(lp_values)
+        samples_per_factor = max(1, self.number_of_roundings // len(self.scaling_factors))
+
+        roundings = []
+        for factor in self.scaling_factors:
+            probabilities = np.minimum(1.0, factor * lp_values)
+            if self.rounding == ROUNDING_INDEPENDENT:
+                roundings.append(rng.random((samples_per_factor, number_of_mbs)) < probabilities)
+            else:
+                order = np.argsort(rng.random((samples_per_factor, number_of_mbs)), axis=1)
+                ordered_probabilities = probabilities[order]
+                cumulative = np.cumsum(ordered_probabilities, axis=1) + rng.random((samples_per_factor, 1))
+                # a middlebox is opened if an integer falls into its interval of the cumulative probabilities
+                previous = cumulative - ordered_probabilities
+                opened = np.zeros((samples_per_factor, number_of_mbs), dtype=bool)
+                np.put_along_axis(opened, order, np.floor(cumulative) > np.floor(previous), axis=1)
+                roundings.append(opened)
+        roundings = np.unique(np.concatenate(roundings), axis=0)
+        number_of_roundings = len(roundings)
+
+        arrays = self.deployment_model.arrays
+        incidence = sp.csr_matrix((np.ones(len(arrays.edges)), (arrays.edge_cp, arrays.edge_mb)),
+                                  shape=(arrays.number_of_communication_pairs, number_of_mbs))
+        capacities = np.array([self.scenario.middleboxes[mb] for mb in arrays.middleboxes], dtype=float)
+        covering = np.asarray((incidence @ roundings.T.astype(float)) > 0).all(axis=0)
+        enough_capacity = roundings.astype(float) @ capacities >= arrays.number_of_communication_pairs
+        screened = roundings[covering & enough_capacity]
+        screened = screened[np.argsort(screened.sum(axis=1), kind="stable")][:self.number_of_repairs]
+
+        threshold = (lp_values >= 0.5 - 1e-6)[np.newaxis, :]
+        self.statistics.update({"number_of_roundings": number_of_roundings, "number_of_screened_roundings": int((covering & enough_capacity).sum())})
+        return np.concatenate((threshold, screened))
+
+    def _get_extra_information(self):
+        extra_information = {"model_build": self.deployment_model.build_statistics,
+                             "solver": self.solver.backend_name,
+                             "rounding": self.rounding,
+                             "lp_bound": self.lp_bound,
+                             "lower_bound": self.lower_bound}
+        extra_information.update(self.statistics)
+        return extra_information
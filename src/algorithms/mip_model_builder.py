@@ -0,0 +1,296 @@
+# MIT License
+#
+# Copyright (c) 2017 Matthias Rost, Alexander Elvers
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+__author__ = "Matthias Rost, Alexander Elvers (mrost / aelvers <AT> inet.tu-berlin.de)"
+
+import time
+
+import numpy as np
+import scipy.sparse as sp
+
+
+MIN_MIDDLEBOXES = "min_middleboxes"
+MAX_ASSIGNMENTS = "max_assignments"
+
+# senses and variable types use the single character codes of gurobi, the other backends translate them
+LESS_EQUAL = "<"
+GREATER_EQUAL = ">"
+EQUAL = "="
+
+CONTINUOUS = "C"
+BINARY = "B"
+
+# formulations of the link between the middlebox decisions and the assignments: the capacity constraints alone
+# (aggregated) already suffice for integral middlebox decisions, the per edge constraints (disaggregated) only
+# strengthen the lp relaxation and are either part of the model or handed to the solver as lazy constraints
+LINKING_DISAGGREGATED = "disaggregated"
+LINKING_AGGREGATED = "aggregated"
+LINKING_LAZY = "lazy"
+
+
+class ConstraintBlock:
+
+    def __init__(self, name, matrix, sense, rhs, row_names=None, lazy=False):
+        self.name = name
+        self.matrix = matrix
+        self.sense = sense
+        self.rhs = rhs
+        self.row_names = row_names
+        self.lazy = lazy
+
+
+class DeploymentModel:
+    """ matrix form of a deployment model: the variables are ordered as [middlebox decisions | assignments], where the
+        assignment variables follow the edge order of the matching graph's array form
+    """
+
+    def __init__(self, scenario, arrays, objective):
+        self.scenario = scenario
+        self.arrays = arrays
+        self.objective = objective
+
+        self.number_of_mb_variables = len(arrays.middleboxes)
+        self.number_of_variables = self.number_of_mb_variables + len(arrays.edges)
+
+        self.obj = np.zeros(self.number_of_variables)
+        self.lb = np.zeros(self.number_of_variables)
+        self.ub = np.ones(self.number_of_variables)
+        self.vtype = CONTINUOUS
+        self.variable_names = None
+
+        self.constraint_blocks = []
+
+        self.build_statistics = {}
+
+    def get_constraint_block(self, name):
+        for block in self.constraint_blocks:
+            if block.name == name:
+                return block
+        return None
+
+    def get_mb_variable_index(self, mb):
+        return self.arrays.middlebox_index[mb]
+
+    def get_active_middleboxes(self, values):
+        return [self.arrays.middleboxes[index] for index in np.flatnonzero(values[:self.number_of_mb_variables] > 0.5)]
+
+    def get_matching_edges(self, values):
+        return [self.arrays.edges[index] for index in np.flatnonzero(values[self.number_of_mb_variables:] > 0.5)]
+
+    def get_assignment_values(self, values):
+        return dict(zip(self.arrays.edges, values[self.number_of_mb_variables:].tolist()))
+
+    def decode_solution(self, values, matching_graph):
+        for mb in self.get_active_middleboxes(values):
+            matching_graph.move_mb_to_active(mb)
+        for edge in self.get_matching_edges(values):
+            matching_graph.edge_in_matching.add(edge)
+
+
+class RestrictedDeploymentModel(DeploymentModel):
+    """ lp relaxation of MAX_ASSIGNMENTS that only contains the assignment variables of the opened middleboxes.
+
+        Initially the model consists of the (empty) covering constraints. Opening a middlebox appends the columns of
+        its usable edges and its capacity constraint; as the middlebox decision is fixed to one, the linking
+        constraints reduce to the upper bounds of the assignment variables. The columns are ordered by the opening
+        order of the middleboxes and column_edges holds the edge index of each column.
+    """
+
+    def __init__(self, scenario, arrays, covering_sense, respect_edge_capacities):
+        super().__init__(scenario, arrays, MAX_ASSIGNMENTS)
+
+        self.number_of_mb_variables = 0
+        self.number_of_variables = 0
+        self.obj = np.zeros(0)
+        self.lb = np.zeros(0)
+        self.ub = np.ones(0)
+
+        number_of_cps = arrays.number_of_communication_pairs
+        self.constraint_blocks.append(ConstraintBlock("covering", sp.csr_matrix((number_of_cps, 0)), covering_sense, np.ones(number_of_cps)))
+
+        edge_mb = np.asarray(arrays.edge_mb, dtype=np.int64)
+        self.edge_cp = np.asarray(arrays.edge_cp, dtype=np.int64)
+        self.cp_capacities = np.array([request.capacity for request in scenario.requests], dtype=float)
+        self.mb_capacities = np.array([scenario.middleboxes[mb] for mb in arrays.middleboxes], dtype=float)
+
+        edge_order = np.argsort(edge_mb, kind="stable")
+        boundaries = np.searchsorted(edge_mb[edge_order], np.arange(len(arrays.middleboxes) + 1))
+        self.edges_of_mb = []
+        for index in range(len(arrays.middleboxes)):
+            edges = edge_order[boundaries[index]:boundaries[index + 1]]
+            if respect_edge_capacities:
+                edges = edges[self.cp_capacities[self.edge_cp[edges]] <= self.mb_capacities[index]]
+            self.edges_of_mb.append(edges)
+
+        self.column_edges = np.zeros(0, dtype=np.int64)
+
+    def get_middlebox_columns(self, mb):
+        """ returns the edge indices, the covering coefficients and the capacity coefficients of the columns of mb """
+        edges = self.edges_of_mb[self.arrays.middlebox_index[mb]]
+        number_of_columns = len(edges)
+        covering = sp.csc_matrix((np.ones(number_of_columns), (self.edge_cp[edges], np.arange(number_of_columns))),
+                                 shape=(self.arrays.number_of_communication_pairs, number_of_columns))
+        return edges, covering, self.cp_capacities[self.edge_cp[edges]]
+
+    def get_middlebox_capacity(self, mb):
+        return self.mb_capacities[self.arrays.middlebox_index[mb]]
+
+    def get_active_middleboxes(self, values):
+        raise Exception("The middlebox decisions are not part of the restricted model.")
+
+    def get_matching_edges(self, values):
+        return [self.arrays.edges[index] for index in self.column_edges[values > 0.5]]
+
+    def get_assignment_values(self, values):
+        assignment_values = np.zeros(len(self.arrays.edges))
+        assignment_values[self.column_edges] = values
+        return dict(zip(self.arrays.edges, assignment_values.tolist()))
+
+
+class DeploymentModelBuilder:
+    """ constructs the constraint matrices of the deployment formulations from the array form of the matching graph.
+
+        Variable and constraint names are only generated if with_names is set, as creating them dominates the build
+        time on larger scenarios and they are only needed for writing models to disk.
+    """
+
+    def __init__(self, scenario, matching_graph, with_names=False):
+        self.scenario = scenario
+        self.matching_graph = matching_graph
+        self.with_names = with_names
+
+    def build(self, objective, covering_sense=None, integral=True, number_of_middleboxes=None, respect_edge_capacities=False,
+              linking=LINKING_DISAGGREGATED):
+        """ objective is either MIN_MIDDLEBOXES or MAX_ASSIGNMENTS; covering_sense is EQUAL, LESS_EQUAL or None
+            if the communication pairs need not be covered; number_of_middleboxes fixes the number of middleboxes
+            to place if given; linking selects whether the lower_bound block is omitted, contained or lazy
+        """
+        if linking not in (LINKING_DISAGGREGATED, LINKING_AGGREGATED, LINKING_LAZY):
+            raise Exception("Unknown linking formulation {}".format(linking))
+        if linking != LINKING_DISAGGREGATED and not integral:
+            raise Exception("The aggregated linking is only valid for integral middlebox decisions.")
+
+        start_time = time.perf_counter()
+
+        arrays = self.matching_graph.get_array_form()
+        model = DeploymentModel(self.scenario, arrays, objective)
+
+        number_of_mbs = model.number_of_mb_variables
+        number_of_edges = len(arrays.edges)
+        number_of_cps = arrays.number_of_communication_pairs
+        number_of_variables = model.number_of_variables
+
+        edge_mb = np.asarray(arrays.edge_mb, dtype=np.int64)
+        edge_cp = np.asarray(arrays.edge_cp, dtype=np.int64)
+        edge_columns = number_of_mbs + np.arange(number_of_edges, dtype=np.int64)
+        edge_ones = np.ones(number_of_edges)
+
+        mb_capacities = np.array([self.scenario.middleboxes[mb] for mb in arrays.middleboxes], dtype=float)
+        cp_capacities = np.array([request.capacity for request in self.scenario.requests], dtype=float)
+
+        arrays_time = time.perf_counter()
+
+        if objective == MIN_MIDDLEBOXES:
+            model.obj[:number_of_mbs] = 1.0
+        elif objective == MAX_ASSIGNMENTS:
+            model.obj[number_of_mbs:] = 1.0
+        else:
+            raise Exception("Unknown objective {}".format(objective))
+
+        if integral:
+            model.vtype = BINARY
+
+        if respect_edge_capacities:
+            # a communication pair cannot be (partially) served by a middlebox offering less capacity than it needs
+            model.ub[edge_columns[mb_capacities[edge_mb] < cp_capacities[edge_cp]]] = 0.0
+
+        if covering_sense is not None:
+            covering = sp.csr_matrix((edge_ones, (edge_cp, edge_columns)), shape=(number_of_cps, number_of_variables))
+            model.constraint_blocks.append(ConstraintBlock("covering", covering, covering_sense, np.ones(number_of_cps)))
+
+        capacity_rows = np.concatenate((edge_mb, np.arange(number_of_mbs, dtype=np.int64)))
+        capacity_columns = np.concatenate((edge_columns, np.arange(number_of_mbs, dtype=np.int64)))
+        capacity_data = np.concatenate((cp_capacities[edge_cp], -mb_capacities))
+        capacity = sp.csr_matrix((capacity_data, (capacity_rows, capacity_columns)), shape=(number_of_mbs, number_of_variables))
+        model.constraint_blocks.append(ConstraintBlock("upper_bound", capacity, LESS_EQUAL, np.zeros(number_of_mbs)))
+
+        if linking != LINKING_AGGREGATED:
+            linking_rows = np.concatenate((np.arange(number_of_edges, dtype=np.int64), np.arange(number_of_edges, dtype=np.int64)))
+            linking_columns = np.concatenate((edge_columns, edge_mb))
+            linking_data = np.concatenate((edge_ones, -edge_ones))
+            linking_matrix = sp.csr_matrix((linking_data, (linking_rows, linking_columns)), shape=(number_of_edges, number_of_variables))
+            model.constraint_blocks.append(ConstraintBlock("lower_bound", linking_matrix, LESS_EQUAL, np.zeros(number_of_edges),
+                                                           lazy=linking == LINKING_LAZY))
+
+        if number_of_middleboxes is not None:
+            cardinality = sp.csr_matrix((np.ones(number_of_mbs), (np.zeros(number_of_mbs, dtype=np.int64), np.arange(number_of_mbs, dtype=np.int64))), shape=(1, number_of_variables))
+            model.constraint_blocks.append(ConstraintBlock("fix_number_of_middleboxes_to_place", cardinality, EQUAL, np.array([float(number_of_middleboxes)])))
+
+        matrices_time = time.perf_counter()
+
+        if self.with_names:
+            self._create_names(model)
+
+        end_time = time.perf_counter()
+
+        model.build_statistics["linking"] = linking
+        model.build_statistics["number_of_variables"] = number_of_variables
+        model.build_statistics["number_of_constraints"] = sum(block.matrix.shape[0] for block in model.constraint_blocks)
+        model.build_statistics["number_of_lazy_constraints"] = sum(block.matrix.shape[0] for block in model.constraint_blocks if block.lazy)
+        model.build_statistics["number_of_nonzeros"] = sum(block.matrix.nnz for block in model.constraint_blocks)
+        model.build_statistics["time_arrays"] = arrays_time - start_time
+        model.build_statistics["time_matrices"] = matrices_time - arrays_time
+        model.build_statistics["time_names"] = end_time - matrices_time
+        model.build_statistics["time_build"] = end_time - start_time
+
+        return model
+
+    def build_restricted(self, covering_sense=LESS_EQUAL, respect_edge_capacities=False):
+        """ builds the RestrictedDeploymentModel; names are not supported as the model is changed by the solver """
+        start_time = time.perf_counter()
+
+        model = RestrictedDeploymentModel(self.scenario, self.matching_graph.get_array_form(), covering_sense, respect_edge_capacities)
+
+        model.build_statistics["number_of_variables"] = 0
+        model.build_statistics["number_of_constraints"] = model.arrays.number_of_communication_pairs
+        model.build_statistics["number_of_nonzeros"] = 0
+        model.build_statistics["time_build"] = time.perf_counter() - start_time
+
+        return model
+
+    def _create_names(self, model):
+        requests = self.scenario.requests
+        arrays = model.arrays
+
+        model.variable_names = ["mb_decision_{}".format(mb) for mb in arrays.middleboxes] + \
+                               ["mb_cp_assignment_{}_{}_{}".format(mb, requests[cp].tail, requests[cp].head) for (mb, cp) in arrays.edges]
+
+        for block in model.constraint_blocks:
+            if block.name == "covering":
+                block.row_names = ["covering_{}_{}".format(requests[cp].tail, requests[cp].head) for cp in range(arrays.number_of_communication_pairs)]
+            elif block.name == "upper_bound":
+                block.row_names = ["upper_bound_{}".format(mb) for mb in arrays.middleboxes]
+            elif block.name == "lower_bound":
+                block.row_names = ["lower_bound_{}_{}_{}".format(mb, requests[cp].tail, requests[cp].head) for (mb, cp) in arrays.edges]
+            else:
+                block.row_names = [block.name]
+
@@ -0,0 +1,119 @@
+# MIT License
+#
+# Copyright (c) 2017 Matthias Rost, Alexander Elvers
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+__author__ = "Matthias Rost, Alexander Elvers (mrost / aelvers <AT> inet.tu-berlin.de)"
+
+import copy
+import gzip
+import hashlib
+import os
+import pickle
+import shutil
+import time
+
+import scipy.sparse as sp
+
+from algorithms import mip_model_builder as builder_pkg
+
+
+class ModelCache:
+    """ stores built deployment models as gzip compressed mps files in a directory and loads them directly into the
+        solver on later runs.
+
+        A model is identified by the fingerprint of its scenario and the arguments of DeploymentModelBuilder.build,
+        i.e. the formulation variant. Alongside the mps file the deployment model is stored without its constraint
+        matrices, as its index maps (the array form of the matching graph) are needed to decode solutions.
+        Formulations with lazy constraints are built without the cache, as mps files cannot mark them.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.number_of_hits = 0
+        self.number_of_misses = 0
+
+    def get_key(self, scenario, build_arguments):
+        content = repr((scenario.get_fingerprint(), sorted(build_arguments.items())))
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def get_paths(self, key):
+        return os.path.join(self.directory, f"{key}.mps.gz"), os.path.join(self.directory, f"{key}.model.pickle.gz")
+
+    def load_model(self, builder, solver, **build_arguments):
+        """ loads the model for the builder's scenario and the build arguments into the solver, building and storing
+            it if it is not cached yet; returns the deployment model
+        """
+        if build_arguments.get("linking") == builder_pkg.LINKING_LAZY:
+            deployment_model = builder.build(**build_arguments)
+            solver.load_model(deployment_model)
+            deployment_model.build_statistics["model_cache"] = None
+            return deployment_model
+
+        key = self.get_key(builder.scenario, build_arguments)
+        model_path, index_path = self.get_paths(key)
+
+        if os.path.exists(model_path) and os.path.exists(index_path):
+            start_time = time.perf_counter()
+            with gzip.open(index_path, "rb") as f:
+                deployment_model = pickle.load(f)
+            deployment_model.scenario = builder.scenario
+            index_time = time.perf_counter() - start_time
+
+            solver.read_model(model_path, deployment_model)
+            self.number_of_hits += 1
+            deployment_model.build_statistics.update({"model_cache": "hit",
+                                                      "time_arrays": 0.0,
+                                                      "time_matrices": 0.0,
+                                                      "time_names": 0.0,
+                                                      "time_build": index_time})
+            return deployment_model
+
+        deployment_model = builder.build(**build_arguments)
+        solver.load_model(deployment_model)
+        self.number_of_misses += 1
+
+        start_time = time.perf_counter()
+        self._store(deployment_model, solver, model_path, index_path)
+        deployment_model.build_statistics["model_cache"] = "miss"
+        deployment_model.build_statistics["time_cache_store"] = time.perf_counter() - start_time
+        return deployment_model
+
+    def _store(self, deployment_model, solver, model_path, index_path):
+        # written to temporary files first, so that concurrent runs never read a partially written model
+        temporary_suffix = ".{}.tmp".format(os.getpid())
+        plain_model_path = model_path[:-len(".gz")] + temporary_suffix + ".mps"
+        solver.write_model(plain_model_path)
+        with open(plain_model_path, "rb") as source, gzip.open(model_path + temporary_suffix, "wb") as target:
+            shutil.copyfileobj(source, target)
+        os.remove(plain_model_path)
+
+        index_model = copy.copy(deployment_model)
+        index_model.scenario = None
+        index_model.build_statistics = dict(deployment_model.build_statistics)
+        index_model.constraint_blocks = [builder_pkg.ConstraintBlock(block.name, sp.csr_matrix(block.matrix.shape), block.sense,
+                                                                     block.rhs, block.row_names, block.lazy)
+                                         for block in deployment_model.constraint_blocks]
+        with gzip.open(index_path + temporary_suffix, "wb") as f:
+            pickle.dump(index_model, f)
+
+        os.replace(index_path + temporary_suffix, index_path)
+        os.replace(model_path + temporary_suffix, model_path)
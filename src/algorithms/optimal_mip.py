@@ -22,91 +22,164 @@
 
 __author__ = "Matthias Rost, Alexander Elvers (mrost / aelvers <AT> inet.tu-berlin.de)"
 
-import gurobipy
-from gurobipy import GRB
+import time
+
+import numpy as np
 
 from algorithms import abstract_algorithm as aa_pkg
-from algorithms.gurobi_status import GurobiStatus
+from algorithms import greedy_matching as greedy_pkg
+from algorithms import mip_model_builder as builder_pkg
+from algorithms import solver_backends as backends_pkg
 from datamodel import matching_graph as mg_pkg
 
 
 class ExactDeploymentMIP(aa_pkg.AbstractAlgorithm):
+    """ computes a deployment with the minimal number of middleboxes.
+
+        If greedy_start is set, the solution of GreedyMatching (or the given start_result, e.g. a previously computed
+        greedy result of the same scenario) is passed to the solver as start solution and its number of middleboxes
+        as cutoff. The solver times of the first and of the best incumbent are recorded in any case, as well as the
+        progress of the solver (sampled every progress_interval seconds and at new incumbents).
+
+        linking selects the formulation of the link between middlebox decisions and assignments (see
+        mip_model_builder). If root_relaxation is set, the lp relaxation of the model is solved once before the mip
+        to record its bound and solver time, which is what benchmark_linking_formulations compares. If a ModelCache is
+        given, the model is read from (or stored in) it instead of being built.
+    """
     alg_name = "OptimalMIP  "
 
-    def __init__(self, scenario, mip_gap=0.001):
+    def __init__(self, scenario, mip_gap=0.001, with_names=False, backend=None, greedy_start=False, start_result=None,
+                 linking=builder_pkg.LINKING_DISAGGREGATED, root_relaxation=False, progress_interval=1.0, model_cache=None):
         super().__init__(scenario)
 
         for req in self.scenario.requests:
             if req.capacity != 1:
                 raise Exception("Requests must have a capacity of 1.")
 
-        self.mb_vars = {}
-        self.mb_assignment_vars = {}
-        self.model = None
+        self.deployment_model = None
+        self.solver = None
+        self.backend = backend
         self.mg = mg_pkg.StatefulMatchingGraph(scenario)
         self.mip_gap = mip_gap
+        self.with_names = with_names
 
+        self.greedy_start = greedy_start or start_result is not None
+        self.start_result = start_result
+        self.start_information = None
 
-    def _run(self):
-        self.model = gurobipy.Model("mb-deployment")
-
-
-        for mb in self.mg.middleboxes:
-            variableId = "mb_decision_{}".format(mb)
-            self.mb_vars[mb] = self.model.addVar(lb=0.0, ub=1.0, obj=1.0, vtype=GRB.BINARY, name=variableId)
-        for (mb, cp) in self.mg.edges:
-            variableId = "mb_cp_assignment_{}_{}_{}".format(mb, self.scenario.requests[cp].tail, self.scenario.requests[cp].head)
-            self.mb_assignment_vars[(mb,cp)] = self.model.addVar(lb=0.0, ub=1.0, obj=0.0, vtype=GRB.BINARY, name=variableId)
-
-        self.model.update()
+        self.linking = linking
+        self.root_relaxation = root_relaxation
+        self.root_relaxation_information = None
+        self.progress_interval = progress_interval
+        self.model_cache = model_cache
+        self.time_optimize = None
 
-        self.model.setObjective(self.model.getObjective(), GRB.MINIMIZE)
 
-        for cp in self.mg.communication_pairs:
-            constr = gurobipy.LinExpr()
-            for (mb,cp) in self.mg.edges_at_node[cp]:
-                constr.addTerms(1.0, self.mb_assignment_vars[(mb,cp)])
-            self.model.addConstr(constr, GRB.EQUAL, 1.0, name="covering_{}_{}".format(self.scenario.requests[cp].tail, self.scenario.requests[cp].head))
-
-        for mb in self.mg.middleboxes:
-            constr = gurobipy.LinExpr()
-            for (mb,cp) in self.mg.edges_at_node[mb]:
-                constr.addTerms(1.0, self.mb_assignment_vars[(mb,cp)])
-            constr.addTerms(-1.0 * self.scenario.middleboxes[mb], self.mb_vars[mb])
-            self.model.addConstr(constr, GRB.LESS_EQUAL, 0.0, name="upper_bound_{}".format(mb))
+    def _run(self):
+        builder = builder_pkg.DeploymentModelBuilder(self.scenario, self.mg, with_names=self.with_names)
+        build_arguments = {"objective": builder_pkg.MIN_MIDDLEBOXES, "covering_sense": builder_pkg.EQUAL, "integral": True, "linking": self.linking}
+        self.solver = backends_pkg.create_backend(self.backend, "mb-deployment")
+        if self.model_cache is not None:
+            self.deployment_model = self.model_cache.load_model(builder, self.solver, **build_arguments)
+        else:
+            self.deployment_model = builder.build(**build_arguments)
+            self.solver.load_model(self.deployment_model)
 
-        for (mb,cp) in self.mg.edges:
-            constr = gurobipy.LinExpr()
-            constr.addTerms(1.0, self.mb_assignment_vars[(mb,cp)])
-            constr.addTerms(-1.0, self.mb_vars[mb])
-            self.model.addConstr(constr, GRB.LESS_EQUAL, 0.0, name="lower_bound_{}_{}_{}".format(mb, self.scenario.requests[cp].tail, self.scenario.requests[cp].head))
+        #self.solver.write_model("fun.lp")
 
-        self.model.update()
+        self.solver.set_parameter(backends_pkg.MIP_GAP, self.mip_gap)
+        self.solver.set_incumbent_tracking(True)
+        self.solver.set_progress_tracking(True, self.progress_interval)
 
-        #self.model.write("fun.lp")
+        if self.root_relaxation:
+            objective_value, runtime, iterations = self.solver.solve_relaxation()
+            self.root_relaxation_information = {"objective": objective_value, "time": runtime, "iterations": iterations}
 
-        self.model.setParam("MIPGap", self.mip_gap)
+        if self.greedy_start:
+            self.set_start_solution()
 
-        self.model.optimize()
+        start_time = time.perf_counter()
+        self.solver.optimize()
+        self.time_optimize = time.perf_counter() - start_time
 
-        self.status = GurobiStatus(status=self.model.getAttr("Status"),
-                                    solCount=self.model.getAttr("SolCount"),
-                                    objValue=self.model.getAttr("ObjVal"),
-                                    objGap=self.model.getAttr("MIPGap"),
-                                    objBound=self.model.getAttr("ObjBound"),
-                                    integralSolution=True)
+        self.status = self.solver.get_status()
 
         if self.status.isFeasible():
-            for mb in self.mg.middleboxes:
-                if self.mb_vars[mb].X > 0.5:
-                    self.mg.move_mb_to_active(mb)
-            for (mb,cp) in self.mg.edges:
-                if self.mb_assignment_vars[(mb,cp)].X > 0.5:
-                    self.mg.edge_in_matching.add((mb,cp))
+            self.deployment_model.decode_solution(self.solver.get_solution(), self.mg)
             self.mg.check_validity()
 
             return self.mg
         return None
 
+    def set_start_solution(self):
+        self.start_information = {"source": "result"}
+        if self.start_result is None:
+            start_time = time.perf_counter()
+            self.start_result = greedy_pkg.GreedyMatching(self.scenario).run()
+            self.start_information = {"source": "greedy", "time_greedy": time.perf_counter() - start_time}
+
+        arrays = self.deployment_model.arrays
+        values = np.zeros(self.deployment_model.number_of_variables)
+        for mb in self.start_result.active_mbs:
+            if mb not in arrays.middlebox_index:
+                raise Exception("The middlebox {} of the start solution is not a middlebox of the scenario.".format(mb))
+            values[arrays.middlebox_index[mb]] = 1.0
+        edge_index = {edge: index for index, edge in enumerate(arrays.edges)}
+        for edge in self.start_result.matching_edges:
+            if edge not in edge_index:
+                raise Exception("The edge {} of the start solution is not an edge of the scenario's matching graph.".format(edge))
+            values[self.deployment_model.number_of_mb_variables + edge_index[edge]] = 1.0
+
+        number_of_middleboxes = len(self.start_result.active_mbs)
+        self.start_information["number_of_middleboxes"] = number_of_middleboxes
+
+        self.solver.set_start_solution(values)
+        # the objective is integral, so this only cuts off deployments using more middleboxes than the start
+        self.solver.set_parameter(backends_pkg.CUTOFF, number_of_middleboxes + 0.5)
+
     def _get_extra_information(self):
-        return None
+        incumbent_history = self.solver.get_incumbent_history()
+        extra_information = {"model_build": self.deployment_model.build_statistics,
+                             "solver": self.solver.backend_name,
+                             "time_environment_setup": self.solver.get_environment_setup_time(),
+                             "mip_start": self.start_information,
+                             "linking": self.linking,
+                             "root_relaxation": self.root_relaxation_information,
+                             "lazy_constraints": self.solver.get_lazy_statistics(),
+                             "time_optimize": self.time_optimize,
+                             "incumbent_history": incumbent_history,
+                             "solver_progress": self.solver.get_progress_history(),
+                             "time_to_first_incumbent": None,
+                             "time_to_best_incumbent": None,
+                             "time_to_optimal": None}
+        if len(incumbent_history) > 0:
+            extra_information["time_to_first_incumbent"] = incumbent_history[0][0]
+            extra_information["time_to_best_incumbent"] = min(incumbent_history, key=lambda time_objective: (time_objective[1], time_objective[0]))[0]
+        if self.status.isOptimal():
+            extra_information["time_to_optimal"] = self.solver.get_runtime()
+        return extra_information
+
+
+def benchmark_linking_formulations(scenario, backend=None, mip_gap=0.001,
+                                   linkings=(builder_pkg.LINKING_DISAGGREGATED, builder_pkg.LINKING_AGGREGATED, builder_pkg.LINKING_LAZY)):
+    """ solves the scenario once per linking formulation and returns, per formulation, the build time (including the
+        solver load), the time and bound of the root lp relaxation, the time of the mip and the total time
+    """
+    benchmark = {}
+    for linking in linkings:
+        result = ExactDeploymentMIP(scenario, mip_gap=mip_gap, backend=backend, linking=linking, root_relaxation=True).run()
+        if result is None:
+            benchmark[linking] = None
+            continue
+        extra_information = result.extra_information
+        build_statistics = extra_information["model_build"]
+        benchmark[linking] = {"number_of_constraints": build_statistics["number_of_constraints"],
+                              "number_of_lazy_constraints": build_statistics["number_of_lazy_constraints"],
+                              "time_build": build_statistics["time_build"] + build_statistics["time_solver_load"],
+                              "root_lp_bound": extra_information["root_relaxation"]["objective"],
+                              "time_root_lp": extra_information["root_relaxation"]["time"],
+                              "time_mip": extra_information["time_optimize"],
+                              "time_total": result.runtime_without_init,
+                              "number_of_middleboxes": len(result.active_mbs)}
+        print("{:>14} {}".format(linking, benchmark[linking]))
+    return benchmark
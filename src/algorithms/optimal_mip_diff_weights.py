@@ -22,85 +22,48 @@
 
 __author__ = "Matthias Rost, Alexander Elvers (mrost / aelvers <AT> inet.tu-berlin.de)"
 
-import gurobipy
-from gurobipy import GRB
-
 from algorithms import abstract_algorithm as aa_pkg
-from algorithms.gurobi_status import GurobiStatus
+from algorithms import mip_model_builder as builder_pkg
+from algorithms import solver_backends as backends_pkg
 from datamodel import matching_graph as mg_pkg
 
 
 class ExactDeploymentMIP_diff_weights(aa_pkg.AbstractAlgorithm_Diff_Weights):
     alg_name = "OptimalMIP  "
 
-    def __init__(self, scenario, mip_gap=0.001):
+    def __init__(self, scenario, mip_gap=0.001, with_names=False, backend=None, linking=builder_pkg.LINKING_DISAGGREGATED,
+                 progress_interval=1.0):
         super().__init__(scenario)
 
-        self.mb_vars = {}
-        self.mb_assignment_vars = {}
-        self.model = None
+        self.deployment_model = None
+        self.solver = None
+        self.backend = backend
         self.mg = mg_pkg.StatefulMatchingGraph(scenario)
         self.mip_gap = mip_gap
+        self.with_names = with_names
+        self.linking = linking
+        self.progress_interval = progress_interval
 
 
     def _run(self):
-        self.model = gurobipy.Model("mb-deployment-weights")
-
-
-        for mb in self.mg.middleboxes:
-            variableId = "mb_decision_{}".format(mb)
-            self.mb_vars[mb] = self.model.addVar(lb=0.0, ub=1.0, obj=1.0, vtype=GRB.BINARY, name=variableId)
-        for (mb, cp) in self.mg.edges:
-            variableId = "mb_cp_assignment_{}_{}_{}".format(mb, self.scenario.requests[cp].tail, self.scenario.requests[cp].head)
-            self.mb_assignment_vars[(mb,cp)] = self.model.addVar(lb=0.0, ub=1.0, obj=0.0, vtype=GRB.BINARY, name=variableId)
-
-        self.model.update()
-
-        self.model.setObjective(self.model.getObjective(), GRB.MINIMIZE)
-
-        for cp in self.mg.communication_pairs:
-            constr = gurobipy.LinExpr()
-            for (mb,cp) in self.mg.edges_at_node[cp]:
-                constr.addTerms(1.0, self.mb_assignment_vars[(mb,cp)])
-            self.model.addConstr(constr, GRB.EQUAL, 1.0, name="covering_{}_{}".format(self.scenario.requests[cp].tail, self.scenario.requests[cp].head))
+        builder = builder_pkg.DeploymentModelBuilder(self.scenario, self.mg, with_names=self.with_names)
+        self.deployment_model = builder.build(objective=builder_pkg.MIN_MIDDLEBOXES, covering_sense=builder_pkg.EQUAL, integral=True,
+                                              linking=self.linking)
+        self.solver = backends_pkg.create_backend(self.backend, "mb-deployment-weights")
+        self.solver.load_model(self.deployment_model)
 
-        for mb in self.mg.middleboxes:
-            constr = gurobipy.LinExpr()
-            for (mb,cp) in self.mg.edges_at_node[mb]:
-                constr.addTerms(self.scenario.requests[cp].capacity, self.mb_assignment_vars[(mb,cp)])
-            constr.addTerms(-1.0 * self.scenario.middleboxes[mb], self.mb_vars[mb])
-            self.model.addConstr(constr, GRB.LESS_EQUAL, 0.0, name="upper_bound_{}".format(mb))
+        #self.solver.write_model("diff_weights.lp")
 
-        for (mb,cp) in self.mg.edges:
-            constr = gurobipy.LinExpr()
-            constr.addTerms(1.0, self.mb_assignment_vars[(mb,cp)])
-            constr.addTerms(-1.0, self.mb_vars[mb])
-            self.model.addConstr(constr, GRB.LESS_EQUAL, 0.0, name="lower_bound_{}_{}_{}".format(mb, self.scenario.requests[cp].tail, self.scenario.requests[cp].head))
+        self.solver.set_parameter(backends_pkg.MIP_GAP, self.mip_gap)
+        self.solver.set_parameter(backends_pkg.THREADS, 1)
+        self.solver.set_progress_tracking(True, self.progress_interval)
 
-        self.model.update()
+        self.solver.optimize()
 
-        #self.model.write("diff_weights.lp")
+        self.status = self.solver.get_status()
 
-        self.model.setParam("MIPGap", self.mip_gap)
-        self.model.setParam("Threads", 1.0)
-
-        self.model.optimize()
-
-        if self.model.getAttr("SolCount") > 0.0:
-
-            self.status = GurobiStatus(status=self.model.getAttr("Status"),
-                                        solCount=self.model.getAttr("SolCount"),
-                                        objValue=self.model.getAttr("ObjVal"),
-                                        objGap=self.model.getAttr("MIPGap"),
-                                        objBound=self.model.getAttr("ObjBound"),
-                                        integralSolution=True)
-
-            for mb in self.mg.middleboxes:
-                if self.mb_vars[mb].X > 0.5:
-                    self.mg.move_mb_to_active(mb)
-            for (mb,cp) in self.mg.edges:
-                if self.mb_assignment_vars[(mb,cp)].X > 0.5:
-                    self.mg.edge_in_matching.add((mb,cp))
+        if self.status.solCount > 0:
+            self.deployment_model.decode_solution(self.solver.get_solution(), self.mg)
             self.mg.check_validity_weights()
 
             return self.mg
@@ -108,4 +71,9 @@ class ExactDeploymentMIP_diff_weights(aa_pkg.AbstractAlgorithm_Diff_Weights):
         return None
 
     def _get_extra_information(self):
-        return None
+        return {"model_build": self.deployment_model.build_statistics,
+                "solver": self.solver.backend_name,
+                "time_environment_setup": self.solver.get_environment_setup_time(),
+                "linking": self.linking,
+                "lazy_constraints": self.solver.get_lazy_statistics(),
+                "solver_progress": self.solver.get_progress_history()}
@@ -24,113 +24,172 @@ __author__ = "Matthias Rost, Alexander Elvers (mrost / aelvers <AT> inet.tu-berl
 
 import copy
 
-import gurobipy
-from gurobipy import GRB
+import numpy as np
 
 from algorithms import abstract_algorithm as aa_pkg
-from algorithms.gurobi_status import GurobiStatus
+from algorithms import mip_model_builder as builder_pkg
+from algorithms import solver_backends as backends_pkg
 from datamodel import matching_graph as mg_pkg
 
 
+SEARCH_LINEAR = "linear"
+SEARCH_BISECTION = "bisection"
+
+
 class ExactDeploymentMIP_mb_after_mb(aa_pkg.AbstractAlgorithm):
+    """ computes for k = 1, 2, ... the maximal number of communication pairs that can be served by k middleboxes until
+        all pairs are served.
+
+        A single model is built; only the right hand side of fix_number_of_middleboxes_to_place changes between the
+        solves. With warm_start, the optimum for the largest smaller k plus greedily opened middleboxes is passed as
+        start solution. With SEARCH_BISECTION only the minimal k serving all pairs is searched for, such that the
+        matching history only contains the evaluated values of k.
+    """
     alg_name = "OptimalMIP_mb_after_mb"
 
-    def __init__(self, scenario):
+    def __init__(self, scenario, with_names=False, backend=None, warm_start=True, search=SEARCH_LINEAR):
         super().__init__(scenario)
 
         for req in self.scenario.requests:
             if req.capacity != 1:
                 raise Exception("Requests must have a capacity of 1.")
 
-        self.mb_vars = {}
-        self.mb_assignment_vars = {}
-        self.model = None
+        if search not in [SEARCH_LINEAR, SEARCH_BISECTION]:
+            raise Exception("Unknown search {}".format(search))
+
+        self.deployment_model = None
+        self.solver = None
+        self.backend = backend
+        self.with_names = with_names
+        self.warm_start = warm_start
+        self.search = search
+
+        self.base_mg = None
+        self.mg = None
+        self.status = None
 
+        self.solutions = {}
         self.matching_history = {}
+        self.build_statistics = {}
+        self.solve_statistics = {}
 
 
     def _run(self):
 
+        self.base_mg = mg_pkg.StatefulMatchingGraph(self.scenario)
+
+        builder = builder_pkg.DeploymentModelBuilder(self.scenario, self.base_mg, with_names=self.with_names)
+        self.deployment_model = builder.build(objective=builder_pkg.MAX_ASSIGNMENTS, covering_sense=builder_pkg.LESS_EQUAL, integral=True,
+                                              number_of_middleboxes=1)
+        self.solver = backends_pkg.create_backend(self.backend, "mb-deployment-one-after-another")
+        self.solver.load_model(self.deployment_model)
+        self.build_statistics = self.deployment_model.build_statistics
+
+        if self.search == SEARCH_LINEAR:
+            return self._run_linear()
+        return self._run_bisection()
+
+    def _run_linear(self):
+
         number_assigned_cps = 0
         allowed_number_of_middleboxes = 1
 
-        while number_assigned_cps < len(self.scenario.requests):
+        while number_assigned_cps < len(self.scenario.requests) and allowed_number_of_middleboxes <= self.deployment_model.number_of_mb_variables:
 
-            self.mg = mg_pkg.StatefulMatchingGraph(self.scenario)
+            self.mg = self.solve(allowed_number_of_middleboxes)
 
-            self.model = gurobipy.Model("mb-deployment-one-after-another")
+            allowed_number_of_middleboxes += 1
 
-            for mb in self.mg.middleboxes:
-                variableId = "mb_decision_{}".format(mb)
-                self.mb_vars[mb] = self.model.addVar(lb=0.0, ub=1.0, obj=0.0, vtype=GRB.BINARY, name=variableId)
-            for (mb, cp) in self.mg.edges:
-                variableId = "mb_cp_assignment_{}_{}_{}".format(mb, self.scenario.requests[cp].tail, self.scenario.requests[cp].head)
-                self.mb_assignment_vars[(mb,cp)] = self.model.addVar(lb=0.0, ub=1.0, obj=1.0, vtype=GRB.BINARY, name=variableId)
+            number_assigned_cps = self.get_number_of_served_pairs(self.mg)
 
-            self.model.update()
 
-            self.model.setObjective(self.model.getObjective(), GRB.MAXIMIZE)
+        if self.status.isFeasible():
+            return self.mg
+        else:
+            return None
 
-            constr = gurobipy.LinExpr()
-            for mb in self.mg.middleboxes:
-                constr.addTerms(1.0, self.mb_vars[mb])
-            self.model.addConstr(constr, GRB.EQUAL, allowed_number_of_middleboxes, name="fix_number_of_middleboxes_to_place")
+    def _run_bisection(self):
 
-            # for cp in self.mg.communication_pairs:
-            #     constr = gurobipy.LinExpr()
-            #     for (mb,cp) in self.mg.edges_at_node[cp]:
-            #         constr.addTerms(1.0, self.mb_assignment_vars[(mb,cp)])
-            #     self.model.addConstr(constr, GRB.EQUAL, 1.0, name="covering_{}_{}".format(self.scenario.requests[cp].tail, self.scenario.requests[cp].head))
+        lower = 1
+        upper = self.deployment_model.number_of_mb_variables
 
-            for mb in self.mg.middleboxes:
-                constr = gurobipy.LinExpr()
-                for (mb,cp) in self.mg.edges_at_node[mb]:
-                    constr.addTerms(1.0, self.mb_assignment_vars[(mb,cp)])
-                constr.addTerms(-1.0 * self.scenario.middleboxes[mb], self.mb_vars[mb])
-                self.model.addConstr(constr, GRB.LESS_EQUAL, 0.0, name="upper_bound_{}".format(mb))
+        self.mg = self.solve(upper)
+        if not self.status.isFeasible() or self.get_number_of_served_pairs(self.mg) < len(self.scenario.requests):
+            # like the linear search, the search stops once all pairs can be served
+            return None
 
-            for (mb,cp) in self.mg.edges:
-                constr = gurobipy.LinExpr()
-                constr.addTerms(1.0, self.mb_assignment_vars[(mb,cp)])
-                constr.addTerms(-1.0, self.mb_vars[mb])
-                self.model.addConstr(constr, GRB.LESS_EQUAL, 0.0, name="lower_bound_{}_{}_{}".format(mb, self.scenario.requests[cp].tail, self.scenario.requests[cp].head))
+        while lower < upper:
+            middle = (lower + upper) // 2
+            mg = self.solve(middle)
+            if self.status.isFeasible() and self.get_number_of_served_pairs(mg) >= len(self.scenario.requests):
+                upper = middle
+                self.mg = mg
+            else:
+                lower = middle + 1
 
-            self.model.update()
+        return self.mg
 
-            #self.model.write("fun.lp")
+    @staticmethod
+    def get_number_of_served_pairs(mg):
+        return len({cp for (mb, cp) in mg.edge_in_matching})
 
-            self.model.optimize()
+    def solve(self, number_of_middleboxes):
+        """ solves the model for the given number of middleboxes and records the result in the matching history """
 
-            self.status = GurobiStatus(status=self.model.getAttr("Status"),
-                                        solCount=self.model.getAttr("SolCount"),
-                                        objValue=self.model.getAttr("ObjVal"),
-                                        objGap=self.model.getAttr("MIPGap"),
-                                        objBound=self.model.getAttr("ObjBound"),
-                                        integralSolution=True)
+        self.solver.set_constraint_rhs("fix_number_of_middleboxes_to_place", [float(number_of_middleboxes)])
 
-            if self.status.isFeasible():
-                for mb in self.mg.middleboxes:
-                    if self.mb_vars[mb].X > 0.5:
-                        self.mg.move_mb_to_active(mb)
-                for (mb,cp) in self.mg.edges:
-                    if self.mb_assignment_vars[(mb,cp)].X > 0.5:
-                        self.mg.edge_in_matching.add((mb,cp))
-                self.mg.check_validity(all_cps_must_be_assigned=False)
+        smaller_numbers = [k for k in self.solutions.keys() if k < number_of_middleboxes]
+        warm_started = self.warm_start and len(smaller_numbers) > 0
+        if warm_started:
+            previous_number = max(smaller_numbers)
+            self.solver.set_start_solution(self.extend_solution(self.solutions[previous_number], number_of_middleboxes - previous_number))
 
+        #self.solver.write_model("fun.lp")
 
+        self.solver.optimize()
 
+        self.status = self.solver.get_status()
 
-            self.matching_history[allowed_number_of_middleboxes] = (copy.deepcopy(self.mg.active_mbs), copy.deepcopy(self.mg.edge_in_matching))
+        mg = mg_pkg.StatefulMatchingGraph(self.scenario, orig=self.base_mg)
+        if self.status.isFeasible():
+            values = self.solver.get_solution()
+            self.solutions[number_of_middleboxes] = values
+            self.deployment_model.decode_solution(values, mg)
+            mg.check_validity(all_cps_must_be_assigned=False)
 
-            allowed_number_of_middleboxes += 1
+        self.matching_history[number_of_middleboxes] = (copy.deepcopy(mg.active_mbs), copy.deepcopy(mg.edge_in_matching))
+        self.solve_statistics[number_of_middleboxes] = {"runtime": self.solver.get_runtime(), "warm_started": warm_started}
 
-            number_assigned_cps = len(self.mg.edge_in_matching)
+        return mg
 
+    def extend_solution(self, values, number_of_additional_middleboxes):
+        """ opens additional middleboxes in the given solution, each serving as many unserved pairs as possible """
 
-        if self.status.isFeasible():
-            return self.mg
-        else:
-            return None
+        arrays = self.deployment_model.arrays
+        number_of_mbs = self.deployment_model.number_of_mb_variables
+        edge_mb = np.asarray(arrays.edge_mb, dtype=np.int64)
+        edge_cp = np.asarray(arrays.edge_cp, dtype=np.int64)
+
+        start = np.round(values)
+        served = np.zeros(arrays.number_of_communication_pairs, dtype=bool)
+        served[edge_cp[start[number_of_mbs:] > 0.5]] = True
+
+        for i in range(number_of_additional_middleboxes):
+            closed = start[:number_of_mbs] < 0.5
+            candidate_edges = np.flatnonzero(closed[edge_mb] & ~served[edge_cp])
+            if len(candidate_edges) == 0:
+                start[np.flatnonzero(closed)[0]] = 1.0
+                continue
+
+            mb_index = np.bincount(edge_mb[candidate_edges], minlength=number_of_mbs).argmax()
+            capacity = int(self.scenario.middleboxes[arrays.middleboxes[mb_index]])
+            edges = candidate_edges[edge_mb[candidate_edges] == mb_index][:capacity]
+
+            start[mb_index] = 1.0
+            start[number_of_mbs + edges] = 1.0
+            served[edge_cp[edges]] = True
+
+        return start
 
     def _get_extra_information(self):
         return self.matching_history
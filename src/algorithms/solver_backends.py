@@ -0,0 +1,962 @@
+# MIT License
+#
+# Copyright (c) 2017 Matthias Rost, Alexander Elvers
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+__author__ = "Matthias Rost, Alexander Elvers (mrost / aelvers <AT> inet.tu-berlin.de)"
+
+import abc
+import os
+import time
+
+import numpy as np
+import scipy.sparse as sp
+
+try:
+    import gurobipy
+    from gurobipy import GRB
+except ImportError:
+    gurobipy = None
+
+try:
+    import highspy
+except ImportError:
+    highspy = None
+
+from algorithms import mip_model_builder as builder_pkg
+from algorithms.gurobi_status import GurobiStatus, INFINITY
+
+
+GUROBI = "gurobi"
+HIGHS = "highs"
+
+# solver independent parameter names
+MIP_GAP = "mip_gap"
+THREADS = "threads"
+CUTOFF = "cutoff"
+TIME_LIMIT = "time_limit"
+OUTPUT = "output"
+METHOD = "method"
+
+# events of the solver progress samples: a new incumbent was found, the periodic sample during the branch and bound,
+# and the final state after the optimization
+PROGRESS_SOLUTION = "solution"
+PROGRESS_NODE = "node"
+PROGRESS_FINAL = "final"
+
+# values of the METHOD parameter; None lets the solver choose
+PRIMAL_SIMPLEX = "primal_simplex"
+DUAL_SIMPLEX = "dual_simplex"
+BARRIER = "barrier"
+
+
+def get_available_backends():
+    available = []
+    if gurobipy is not None:
+        available.append(GUROBI)
+    if highspy is not None:
+        available.append(HIGHS)
+    return available
+
+
+def get_default_backend_name():
+    available = get_available_backends()
+    if len(available) == 0:
+        raise Exception("Neither gurobipy nor highspy is installed.")
+    return available[0]
+
+
+class SolverEnvironment:
+    """ the solver environment of a process, which is shared by all models of the backend created in the process.
+
+        For gurobi this is a started gurobipy.Env, so the environment and license setup is paid once per process
+        instead of once per model; HiGHS has no environment, so only the parameters are applied to each instance.
+    """
+
+    def __init__(self, backend_name, parameters):
+        start_time = time.perf_counter()
+        self.backend_name = backend_name
+        self.parameters = dict(parameters)
+        self.env = None
+        if backend_name == GUROBI:
+            self.env = gurobipy.Env(empty=True)
+            if parameters.get(OUTPUT) is not None:
+                self.env.setParam("OutputFlag", int(parameters[OUTPUT]))
+            if parameters.get(THREADS) is not None:
+                self.env.setParam("Threads", parameters[THREADS])
+            self.env.start()
+        self.setup_time = time.perf_counter() - start_time
+        self.number_of_models = 0
+
+    def dispose(self):
+        if self.env is not None:
+            self.env.dispose()
+            self.env = None
+
+
+# parameters of the environments created from now on; None keeps the default of the solver
+environment_parameters = {OUTPUT: None, THREADS: None}
+# environments of the current process by backend name; the pid guards against using environments inherited by fork
+_environments = {}
+_environments_pid = None
+
+
+def configure_environments(output=None, threads=None):
+    """ sets the output and thread parameters of the solver environments of this process; if they change, existing
+        environments are disposed, so that the next model is created in a newly configured environment
+    """
+    if (environment_parameters[OUTPUT], environment_parameters[THREADS]) == (output, threads):
+        return
+    environment_parameters[OUTPUT] = output
+    environment_parameters[THREADS] = threads
+    dispose_environments()
+
+
+def get_environment(backend_name):
+    """ returns the environment of the backend in this process and whether it has just been created """
+    global _environments_pid
+    if _environments_pid != os.getpid():
+        # the environments of the parent process must not be used (nor disposed) after a fork
+        _environments.clear()
+        _environments_pid = os.getpid()
+    if backend_name in _environments:
+        return _environments[backend_name], False
+    environment = SolverEnvironment(backend_name, environment_parameters)
+    _environments[backend_name] = environment
+    return environment, True
+
+
+def dispose_environments():
+    if _environments_pid == os.getpid():
+        for environment in _environments.values():
+            environment.dispose()
+    _environments.clear()
+
+
+def create_backend(backend_name=None, model_name="mb-deployment"):
+    if backend_name is None:
+        backend_name = get_default_backend_name()
+    if backend_name == GUROBI:
+        backend_class = GurobiBackend
+    elif backend_name == HIGHS:
+        backend_class = HighsBackend
+    else:
+        raise Exception("Unknown solver backend {}".format(backend_name))
+    # fails with the message of the backend if its solver is not installed
+    backend_class.check_availability()
+
+    environment, created = get_environment(backend_name)
+    environment.number_of_models += 1
+    backend = backend_class(model_name, environment)
+    backend.environment_setup_time = environment.setup_time if created else 0.0
+    return backend
+
+
+class AbstractSolverBackend(abc.ABC):
+    """ solves a DeploymentModel of the mip_model_builder; all variables are addressed by their index in the model's
+        variable vector and all solver states are reported using the status codes of GurobiStatus
+    """
+    backend_name = None
+    # whether the solver continues from the basis of the last optimization after bounds or objective were changed, such
+    # that reloading a basis via set_basis only pays off for a basis other than the last one
+    keeps_basis = False
+
+    def __init__(self, model_name, environment=None):
+        self.model_name = model_name
+        self.environment = environment
+        # time spent on setting up the solver environment for this backend, zero if an existing one was reused
+        self.environment_setup_time = 0.0
+        self.deployment_model = None
+        self.number_of_variables = 0
+        self.cutoff = None
+        self.track_incumbents = False
+        self.incumbent_history = []
+        self.track_progress = False
+        self.progress_interval = 1.0
+        self.progress_history = []
+        self.lazy_statistics = None
+
+    @classmethod
+    def check_availability(cls):
+        pass
+
+    def get_environment_setup_time(self):
+        return self.environment_setup_time
+
+    def load_model(self, deployment_model):
+        """ loads the model into the solver and records the time needed as time_solver_load in its build statistics """
+        start_time = time.perf_counter()
+        self.deployment_model = deployment_model
+        self.number_of_variables = deployment_model.number_of_variables
+        self._load_model(deployment_model)
+        deployment_model.build_statistics["time_solver_load"] = time.perf_counter() - start_time
+
+    def read_model(self, path, deployment_model):
+        """ loads a model file written by write_model for the given deployment model, whose constraint blocks only
+            need to have the right number of rows; records the time needed as time_solver_load
+        """
+        if any(block.lazy for block in deployment_model.constraint_blocks):
+            raise Exception("Models with lazy constraints cannot be read from a file.")
+        start_time = time.perf_counter()
+        self.deployment_model = deployment_model
+        self.number_of_variables = deployment_model.number_of_variables
+        self._read_model(path, deployment_model)
+        deployment_model.build_statistics["time_solver_load"] = time.perf_counter() - start_time
+
+    def is_integral(self):
+        return self.deployment_model.vtype == builder_pkg.BINARY
+
+    def is_maximization(self):
+        return self.deployment_model.objective == builder_pkg.MAX_ASSIGNMENTS
+
+    def set_parameter(self, parameter, value):
+        """ sets one of the solver independent parameters; a cutoff of None removes the cutoff """
+        if parameter == CUTOFF:
+            self.cutoff = value
+        self._set_parameter(parameter, value)
+
+    @abc.abstractmethod
+    def set_variable_bounds(self, indices, lb, ub):
+        ...
+
+    @abc.abstractmethod
+    def set_objective_coefficients(self, indices, obj):
+        ...
+
+    @abc.abstractmethod
+    def add_variables(self, obj, lb, ub, block_columns, vtype=builder_pkg.CONTINUOUS):
+        """ appends variables of the given type; block_columns maps the name of a constraint block to a sparse matrix holding
+            the coefficients of the new variables in the rows of the block. Returns the indices of the new variables.
+        """
+        ...
+
+    @abc.abstractmethod
+    def add_constraints(self, block_name, matrix, sense, rhs):
+        """ appends the rows of matrix (over all current variables) to the given constraint block, which is created if
+            it does not exist
+        """
+        ...
+
+    @abc.abstractmethod
+    def set_constraint_rhs(self, block_name, rhs):
+        """ changes the right hand sides of the constraints of the given constraint block """
+        ...
+
+    @abc.abstractmethod
+    def set_start_solution(self, values):
+        """ passes the values of all variables as start solution of the next optimization of a mip """
+        ...
+
+    def set_incumbent_tracking(self, track_incumbents):
+        """ if set, the solver time and objective of every new incumbent of a mip are recorded during optimize """
+        self.track_incumbents = track_incumbents
+
+    def get_incumbent_history(self):
+        """ returns the (solver time, objective) pairs of the incumbents found by the last optimization """
+        return self.incumbent_history
+
+    def set_progress_tracking(self, track_progress, interval=1.0):
+        """ if set, the progress of a mip is sampled during optimize at every new incumbent and at least interval
+            seconds apart during the branch and bound
+        """
+        self.track_progress = track_progress
+        self.progress_interval = interval
+
+    def get_progress_history(self):
+        """ returns the progress samples of the last optimization as dicts with the solver time, the event, the
+            objective of the incumbent, the bound, the number of explored nodes and the number of simplex iterations;
+            values the solver does not know (yet) are None
+        """
+        return self.progress_history
+
+    def _record_progress(self, runtime, event, incumbent, bound, nodes, iterations):
+        incumbent = incumbent if incumbent is not None and abs(incumbent) < INFINITY else None
+        bound = bound if bound is not None and abs(bound) < INFINITY else None
+        if event == PROGRESS_NODE and len(self.progress_history) > 0:
+            last_sample = self.progress_history[-1]
+            if runtime - last_sample["time"] < self.progress_interval and \
+                    (incumbent, bound) == (last_sample["incumbent"], last_sample["bound"]):
+                return
+        self.progress_history.append({"time": runtime,
+                                      "event": event,
+                                      "incumbent": incumbent,
+                                      "bound": bound,
+                                      "nodes": int(nodes) if nodes is not None and nodes >= 0 else None,
+                                      "iterations": int(iterations) if iterations is not None and iterations >= 0 else None})
+
+    def _record_final_progress(self):
+        if not self.track_progress or not self.is_integral():
+            return
+        status = self.get_status()
+        self._record_progress(self.get_runtime(), PROGRESS_FINAL,
+                              status.objValue if status.solCount > 0 else None,
+                              status.objBound if status.solCount > 0 else None,
+                              self._get_node_count(), self.get_iteration_count())
+
+    def _get_node_count(self):
+        return None
+
+    @abc.abstractmethod
+    def get_runtime(self):
+        """ returns the solver time of the last optimization """
+        ...
+
+    def get_lazy_statistics(self):
+        """ returns the statistics of the lazy constraint blocks of the last optimization or None if there are none """
+        return self.lazy_statistics
+
+    @abc.abstractmethod
+    def solve_relaxation(self):
+        """ solves the lp relaxation of the loaded mip (without its lazy constraints) once, leaving the mip unchanged;
+            returns the objective value (None if not solved to optimality), the solver time and the iteration count
+        """
+        ...
+
+    @abc.abstractmethod
+    def remove_variables(self, indices):
+        """ removes the given variables; the indices of the subsequent variables are shifted accordingly """
+        ...
+
+    @abc.abstractmethod
+    def remove_constraints(self, block_name, indices):
+        """ removes the rows with the given indices (relative to the block) from the constraint block """
+        ...
+
+    @abc.abstractmethod
+    def optimize(self):
+        ...
+
+    @abc.abstractmethod
+    def get_status(self):
+        ...
+
+    @abc.abstractmethod
+    def get_objective_value(self):
+        ...
+
+    @abc.abstractmethod
+    def get_solution(self):
+        """ returns the values of all variables as numpy array """
+        ...
+
+    @abc.abstractmethod
+    def get_duals(self, block_name):
+        """ returns the dual values of the constraints of the given constraint block as numpy array """
+        ...
+
+    @abc.abstractmethod
+    def get_iteration_count(self):
+        """ returns the number of simplex iterations of the last optimization """
+        ...
+
+    @abc.abstractmethod
+    def get_basis(self):
+        ...
+
+    @abc.abstractmethod
+    def set_basis(self, basis):
+        """ the basis is used as starting point of the next optimization """
+        ...
+
+    @abc.abstractmethod
+    def write_model(self, path):
+        ...
+
+    @abc.abstractmethod
+    def _load_model(self, deployment_model):
+        ...
+
+    @abc.abstractmethod
+    def _read_model(self, path, deployment_model):
+        ...
+
+    @abc.abstractmethod
+    def _set_parameter(self, parameter, value):
+        ...
+
+
+class GurobiBackend(AbstractSolverBackend):
+    backend_name = GUROBI
+    keeps_basis = True
+
+    parameter_names = {
+        MIP_GAP: "MIPGap",
+        THREADS: "Threads",
+        CUTOFF: "Cutoff",
+        TIME_LIMIT: "TimeLimit",
+        OUTPUT: "OutputFlag",
+        METHOD: "Method",
+    }
+
+    methods = {
+        None: -1,
+        PRIMAL_SIMPLEX: 0,
+        DUAL_SIMPLEX: 1,
+        BARRIER: 2,
+    }
+
+    @classmethod
+    def check_availability(cls):
+        if gurobipy is None:
+            raise Exception("The gurobi backend requires gurobipy.")
+
+    def __init__(self, model_name, environment=None):
+        self.check_availability()
+        super().__init__(model_name, environment)
+        self.model = None
+        self.variables = None
+        self.constraints = None
+
+    def _load_model(self, deployment_model):
+        self.model = gurobipy.Model(self.model_name, env=self.environment.env if self.environment is not None else None)
+
+        vtype = deployment_model.vtype
+        if vtype == builder_pkg.BINARY:
+            vtype = np.full(deployment_model.number_of_variables, GRB.BINARY)
+
+        self.variables = self.model.addMVar(deployment_model.number_of_variables,
+                                            lb=deployment_model.lb,
+                                            ub=deployment_model.ub,
+                                            obj=deployment_model.obj,
+                                            vtype=vtype,
+                                            name=deployment_model.variable_names if deployment_model.variable_names is not None else "")
+
+        self.constraints = {}
+        for block in deployment_model.constraint_blocks:
+            self.constraints[block.name] = self.model.addMConstr(block.matrix, self.variables, block.sense, block.rhs,
+                                                                 name=block.row_names if block.row_names is not None else "")
+            if block.lazy:
+                # pulled into the model whenever they cut off an incumbent or the relaxation at the root
+                self.constraints[block.name].Lazy = np.full(block.matrix.shape[0], 3)
+
+        if self.is_maximization():
+            self.model.ModelSense = GRB.MAXIMIZE
+        else:
+            self.model.ModelSense = GRB.MINIMIZE
+
+        self.model.update()
+
+    def _read_model(self, path, deployment_model):
+        self.model = gurobipy.read(path, env=self.environment.env if self.environment is not None else None)
+        self.model.ModelName = self.model_name
+        self.model.ModelSense = GRB.MAXIMIZE if self.is_maximization() else GRB.MINIMIZE
+        self.model.update()
+
+        self.variables = gurobipy.MVar.fromlist(self.model.getVars())
+        constraints = self.model.getConstrs()
+        self.constraints = {}
+        first_row = 0
+        for block in deployment_model.constraint_blocks:
+            number_of_rows = block.matrix.shape[0]
+            self.constraints[block.name] = gurobipy.MConstr.fromlist(constraints[first_row:first_row + number_of_rows])
+            first_row += number_of_rows
+
+    def _set_parameter(self, parameter, value):
+        if parameter == CUTOFF and value is None:
+            value = -GRB.INFINITY if self.is_maximization() else GRB.INFINITY
+        if parameter == OUTPUT:
+            value = int(value)
+        if parameter == METHOD:
+            value = self.methods[value]
+        self.model.setParam(self.parameter_names[parameter], value)
+
+    def set_variable_bounds(self, indices, lb, ub):
+        selected_variables = self.variables[indices]
+        selected_variables.lb = lb
+        selected_variables.ub = ub
+
+    def set_objective_coefficients(self, indices, obj):
+        self.variables[indices].Obj = obj
+
+    def add_variables(self, obj, lb, ub, block_columns, vtype=builder_pkg.CONTINUOUS):
+        vtype = GRB.BINARY if vtype == builder_pkg.BINARY else GRB.CONTINUOUS
+        block_columns = {name: (sp.csc_matrix(matrix), self.constraints[name].tolist()) for name, matrix in block_columns.items()}
+        new_variables = []
+        for column in range(len(obj)):
+            coefficients = []
+            constraints = []
+            for matrix, block_constraints in block_columns.values():
+                start, end = matrix.indptr[column], matrix.indptr[column + 1]
+                coefficients.extend(matrix.data[start:end].tolist())
+                constraints.extend(block_constraints[row] for row in matrix.indices[start:end])
+            new_variables.append(self.model.addVar(lb=lb[column], ub=ub[column], obj=obj[column], vtype=vtype,
+                                                   column=gurobipy.Column(coefficients, constraints)))
+        self.model.update()
+
+        first_index = self.number_of_variables
+        self.variables = gurobipy.MVar.fromlist(self.variables.tolist() + new_variables)
+        self.number_of_variables += len(new_variables)
+        return np.arange(first_index, self.number_of_variables)
+
+    def add_constraints(self, block_name, matrix, sense, rhs):
+        new_constraints = self.model.addMConstr(matrix, self.variables, sense, rhs)
+        self.model.update()
+        if block_name in self.constraints:
+            new_constraints = gurobipy.MConstr.fromlist(self.constraints[block_name].tolist() + new_constraints.tolist())
+        self.constraints[block_name] = new_constraints
+
+    def remove_variables(self, indices):
+        variables = self.variables.tolist()
+        removed = np.zeros(len(variables), dtype=bool)
+        removed[indices] = True
+        self.model.remove([variables[index] for index in np.flatnonzero(removed)])
+        self.model.update()
+        self.variables = gurobipy.MVar.fromlist([variables[index] for index in np.flatnonzero(~removed)])
+        self.number_of_variables = len(self.variables.tolist())
+
+    def remove_constraints(self, block_name, indices):
+        constraints = self.constraints[block_name].tolist()
+        removed = np.zeros(len(constraints), dtype=bool)
+        removed[indices] = True
+        self.model.remove([constraints[index] for index in np.flatnonzero(removed)])
+        self.model.update()
+        self.constraints[block_name] = gurobipy.MConstr.fromlist([constraints[index] for index in np.flatnonzero(~removed)])
+
+    def set_constraint_rhs(self, block_name, rhs):
+        self.constraints[block_name].RHS = rhs
+
+    def set_start_solution(self, values):
+        self.variables.Start = values
+
+    def optimize(self):
+        self.incumbent_history = []
+        self.progress_history = []
+        if (self.track_incumbents or self.track_progress) and self.is_integral():
+            self.model.optimize(self._mip_callback)
+        else:
+            self.model.optimize()
+        self._record_final_progress()
+        lazy_blocks = [block for block in self.deployment_model.constraint_blocks if block.lazy]
+        if len(lazy_blocks) > 0:
+            # gurobi does not report how many lazy constraints it has used
+            self.lazy_statistics = {"number_of_lazy_constraints": sum(block.matrix.shape[0] for block in lazy_blocks)}
+
+    def solve_relaxation(self):
+        relaxation = self.model.relax()
+        # the copy does not keep the lazy attribute, but it keeps the order of the constraints
+        lazy = self.model.getAttr("Lazy", self.model.getConstrs())
+        relaxation.remove([constraint for constraint, is_lazy in zip(relaxation.getConstrs(), lazy) if is_lazy != 0])
+        relaxation.setParam("Cutoff", -GRB.INFINITY if self.is_maximization() else GRB.INFINITY)
+        relaxation.optimize()
+        objective_value = relaxation.getAttr("ObjVal") if relaxation.getAttr("Status") == GRB.OPTIMAL else None
+        result = objective_value, relaxation.getAttr("Runtime"), int(relaxation.getAttr("IterCount"))
+        relaxation.dispose()
+        return result
+
+    def _mip_callback(self, model, where):
+        if where == GRB.Callback.MIPSOL:
+            runtime = model.cbGet(GRB.Callback.RUNTIME)
+            if self.track_incumbents:
+                self.incumbent_history.append((runtime, model.cbGet(GRB.Callback.MIPSOL_OBJ)))
+            if self.track_progress:
+                # the incumbent is only updated after the callback and the iteration count is not available for new
+                # solutions, so the one of the last sample is kept
+                best = min if not self.is_maximization() else max
+                incumbent = best(model.cbGet(GRB.Callback.MIPSOL_OBJ), model.cbGet(GRB.Callback.MIPSOL_OBJBST))
+                iterations = self.progress_history[-1]["iterations"] if len(self.progress_history) > 0 else None
+                self._record_progress(runtime, PROGRESS_SOLUTION, incumbent, model.cbGet(GRB.Callback.MIPSOL_OBJBND),
+                                      model.cbGet(GRB.Callback.MIPSOL_NODCNT), iterations)
+        elif where == GRB.Callback.MIP and self.track_progress:
+            self._record_progress(model.cbGet(GRB.Callback.RUNTIME), PROGRESS_NODE, model.cbGet(GRB.Callback.MIP_OBJBST),
+                                  model.cbGet(GRB.Callback.MIP_OBJBND), model.cbGet(GRB.Callback.MIP_NODCNT),
+                                  model.cbGet(GRB.Callback.MIP_ITRCNT))
+
+    def get_runtime(self):
+        return self.model.getAttr("Runtime")
+
+    def _get_node_count(self):
+        return self.model.getAttr("NodeCount")
+
+    def get_status(self):
+        integral = self.is_integral()
+        solution_count = self.model.getAttr("SolCount")
+        if solution_count > 0 or not integral and self.model.getAttr("Status") == GurobiStatus.OPTIMAL:
+            return GurobiStatus(status=self.model.getAttr("Status"),
+                                solCount=solution_count,
+                                objValue=self.model.getAttr("ObjVal"),
+                                objGap=self.model.getAttr("MIPGap") if integral else 0.0,
+                                objBound=self.model.getAttr("ObjBound") if integral else self.model.getAttr("ObjVal"),
+                                integralSolution=integral)
+        return GurobiStatus(status=self.model.getAttr("Status"), solCount=solution_count, integralSolution=integral)
+
+    def get_objective_value(self):
+        return self.model.getAttr("ObjVal")
+
+    def get_solution(self):
+        return self.variables.X
+
+    def get_duals(self, block_name):
+        return self.constraints[block_name].Pi
+
+    def get_iteration_count(self):
+        return int(self.model.getAttr("IterCount"))
+
+    def get_basis(self):
+        return self.variables.VBasis, {name: constraints.CBasis for name, constraints in self.constraints.items()}
+
+    def set_basis(self, basis):
+        variable_basis, constraint_basis = basis
+        self.variables.VBasis = variable_basis
+        for name, block_basis in constraint_basis.items():
+            self.constraints[name].CBasis = block_basis
+
+    def write_model(self, path):
+        self.model.write(path)
+
+
+class HighsBackend(AbstractSolverBackend):
+    backend_name = HIGHS
+
+    parameter_names = {
+        MIP_GAP: "mip_rel_gap",
+        THREADS: "threads",
+        TIME_LIMIT: "time_limit",
+        OUTPUT: "output_flag",
+    }
+
+    # values of the options solver and simplex_strategy
+    methods = {
+        None: ("choose", 0),
+        PRIMAL_SIMPLEX: ("simplex", 4),
+        DUAL_SIMPLEX: ("simplex", 1),
+        BARRIER: ("ipm", 0),
+    }
+
+    status_codes = {}
+    if highspy is not None:
+        status_codes = {
+            highspy.HighsModelStatus.kNotset: GurobiStatus.LOADED,
+            highspy.HighsModelStatus.kModelEmpty: GurobiStatus.LOADED,
+            highspy.HighsModelStatus.kOptimal: GurobiStatus.OPTIMAL,
+            highspy.HighsModelStatus.kInfeasible: GurobiStatus.INFEASIBLE,
+            highspy.HighsModelStatus.kUnboundedOrInfeasible: GurobiStatus.INF_OR_UNBD,
+            highspy.HighsModelStatus.kUnbounded: GurobiStatus.UNBOUNDED,
+            highspy.HighsModelStatus.kObjectiveBound: GurobiStatus.CUTOFF,
+            highspy.HighsModelStatus.kObjectiveTarget: GurobiStatus.SOLUTION_LIMIT,
+            highspy.HighsModelStatus.kTimeLimit: GurobiStatus.TIME_LIMIT,
+            highspy.HighsModelStatus.kIterationLimit: GurobiStatus.ITERATION_LIMIT,
+            highspy.HighsModelStatus.kSolutionLimit: GurobiStatus.SOLUTION_LIMIT,
+            highspy.HighsModelStatus.kInterrupt: GurobiStatus.INTERRUPTED,
+        }
+
+    @classmethod
+    def check_availability(cls):
+        if highspy is None:
+            raise Exception("The highs backend requires highspy.")
+
+    def __init__(self, model_name, environment=None):
+        self.check_availability()
+        super().__init__(model_name, environment)
+        self.highs = highspy.Highs()
+        if environment is not None:
+            for parameter in (OUTPUT, THREADS):
+                if environment.parameters.get(parameter) is not None:
+                    self._set_parameter(parameter, environment.parameters[parameter])
+        self.model_status = None
+        # rows of each constraint block in the model of HiGHS, which only appends rows at the end
+        self.block_rows = {}
+        self.block_senses = {}
+        # HiGHS has no lazy constraints: the rows of lazy blocks are withheld and separated at the root instead
+        self.pending_lazy_rows = {}
+        self.start_solution = None
+        # the run time of HiGHS accumulates over all runs of the instance
+        self.run_start_time = 0.0
+        self.runtime = 0.0
+
+    def _load_model(self, deployment_model):
+        lp = highspy.HighsLp()
+        lp.model_name_ = self.model_name
+        lp.num_col_ = deployment_model.number_of_variables
+        lp.col_cost_ = deployment_model.obj
+        lp.col_lower_ = deployment_model.lb
+        lp.col_upper_ = deployment_model.ub
+        if self.is_maximization():
+            lp.sense_ = highspy.ObjSense.kMaximize
+        else:
+            lp.sense_ = highspy.ObjSense.kMinimize
+        if self.is_integral():
+            lp.integrality_ = [highspy.HighsVarType.kInteger] * deployment_model.number_of_variables
+
+        blocks = [block for block in deployment_model.constraint_blocks if not block.lazy]
+        for block in deployment_model.constraint_blocks:
+            if block.lazy:
+                self.pending_lazy_rows[block.name] = (block.matrix, block.sense, np.asarray(block.rhs, dtype=float))
+        matrix = sp.vstack([block.matrix for block in blocks], format="csr")
+        row_lower = []
+        row_upper = []
+        first_row = 0
+        for block in blocks:
+            self.block_rows[block.name] = np.arange(first_row, first_row + block.matrix.shape[0], dtype=np.int32)
+            self.block_senses[block.name] = block.sense
+            first_row += block.matrix.shape[0]
+            lower, upper = self._get_row_bounds(block.sense, block.rhs)
+            row_lower.append(lower)
+            row_upper.append(upper)
+
+        lp.num_row_ = matrix.shape[0]
+        lp.row_lower_ = np.concatenate(row_lower)
+        lp.row_upper_ = np.concatenate(row_upper)
+        lp.a_matrix_.format_ = highspy.MatrixFormat.kRowwise
+        lp.a_matrix_.start_ = matrix.indptr
+        lp.a_matrix_.index_ = matrix.indices
+        lp.a_matrix_.value_ = matrix.data
+
+        if deployment_model.variable_names is not None:
+            lp.col_names_ = deployment_model.variable_names
+            lp.row_names_ = [name for block in blocks for name in block.row_names]
+
+        self.highs.passModel(lp)
+
+    def _read_model(self, path, deployment_model):
+        self.highs.readModel(path)
+        self.highs.changeObjectiveSense(highspy.ObjSense.kMaximize if self.is_maximization() else highspy.ObjSense.kMinimize)
+        first_row = 0
+        for block in deployment_model.constraint_blocks:
+            number_of_rows = block.matrix.shape[0]
+            self.block_rows[block.name] = np.arange(first_row, first_row + number_of_rows, dtype=np.int32)
+            self.block_senses[block.name] = block.sense
+            first_row += number_of_rows
+
+    def _set_parameter(self, parameter, value):
+        if parameter == CUTOFF:
+            # HiGHS only knows an objective bound for MIPs; LPs are checked against the cutoff after solving
+            if self.is_integral():
+                if value is None:
+                    value = -INFINITY if self.is_maximization() else INFINITY
+                self.highs.setOptionValue("objective_bound", float(value))
+            return
+        if parameter == METHOD:
+            solver, simplex_strategy = self.methods[value]
+            self.highs.setOptionValue("solver", solver)
+            self.highs.setOptionValue("simplex_strategy", simplex_strategy)
+            return
+        if parameter == OUTPUT:
+            value = bool(value)
+        self.highs.setOptionValue(self.parameter_names[parameter], value)
+
+    def set_variable_bounds(self, indices, lb, ub):
+        indices = np.asarray(indices, dtype=np.int32)
+        self.highs.changeColsBounds(len(indices), indices, np.asarray(lb, dtype=float), np.asarray(ub, dtype=float))
+
+    def set_objective_coefficients(self, indices, obj):
+        indices = np.asarray(indices, dtype=np.int32)
+        self.highs.changeColsCost(len(indices), indices, np.asarray(obj, dtype=float))
+
+    def add_variables(self, obj, lb, ub, block_columns, vtype=builder_pkg.CONTINUOUS):
+        number_of_rows = self.highs.getNumRow()
+        row_indices = []
+        column_indices = []
+        values = []
+        for name, matrix in block_columns.items():
+            matrix = sp.coo_matrix(matrix)
+            row_indices.append(self.block_rows[name][matrix.row])
+            column_indices.append(matrix.col)
+            values.append(matrix.data)
+        columns = sp.csc_matrix((np.concatenate(values), (np.concatenate(row_indices), np.concatenate(column_indices))),
+                                shape=(number_of_rows, len(obj)))
+        self.highs.addCols(len(obj), np.asarray(obj, dtype=float), np.asarray(lb, dtype=float), np.asarray(ub, dtype=float),
+                           columns.nnz, columns.indptr[:-1].astype(np.int32), columns.indices.astype(np.int32), columns.data)
+
+        first_index = self.number_of_variables
+        self.number_of_variables += len(obj)
+        indices = np.arange(first_index, self.number_of_variables)
+        if vtype == builder_pkg.BINARY:
+            self.highs.changeColsIntegrality(len(obj), indices.astype(np.int32), np.array([highspy.HighsVarType.kInteger] * len(obj)))
+        return indices
+
+    def add_constraints(self, block_name, matrix, sense, rhs):
+        number_of_rows = self.highs.getNumRow()
+        lower, upper = self._get_row_bounds(sense, rhs)
+        matrix = sp.csr_matrix(matrix)
+        self.highs.addRows(matrix.shape[0], lower, upper, matrix.nnz, matrix.indptr[:-1].astype(np.int32),
+                           matrix.indices.astype(np.int32), matrix.data)
+
+        new_rows = np.arange(number_of_rows, number_of_rows + matrix.shape[0], dtype=np.int32)
+        self.block_rows[block_name] = np.concatenate((self.block_rows.get(block_name, np.zeros(0, dtype=np.int32)), new_rows))
+        self.block_senses[block_name] = sense
+
+    def _get_row_bounds(self, sense, rhs):
+        inf = self.highs.getInfinity()
+        rhs = np.asarray(rhs, dtype=float)
+        lower = rhs if sense != builder_pkg.LESS_EQUAL else np.full(len(rhs), -inf)
+        upper = rhs if sense != builder_pkg.GREATER_EQUAL else np.full(len(rhs), inf)
+        return lower, upper
+
+    def set_constraint_rhs(self, block_name, rhs):
+        rows = self.block_rows[block_name]
+        lower, upper = self._get_row_bounds(self.block_senses[block_name], rhs)
+        self.highs.changeRowsBounds(len(rows), rows, lower, upper)
+
+    def remove_variables(self, indices):
+        indices = np.asarray(indices, dtype=np.int32)
+        self.highs.deleteCols(len(indices), indices)
+        self.number_of_variables -= len(indices)
+
+    def remove_constraints(self, block_name, indices):
+        removed = np.zeros(len(self.block_rows[block_name]), dtype=bool)
+        removed[indices] = True
+        removed_rows = np.sort(self.block_rows[block_name][removed])
+        self.highs.deleteRows(len(removed_rows), removed_rows)
+        self.block_rows[block_name] = self.block_rows[block_name][~removed]
+        for name, rows in self.block_rows.items():
+            self.block_rows[name] = (rows - np.searchsorted(removed_rows, rows)).astype(np.int32)
+
+    def set_start_solution(self, values):
+        # passed right before the mip is run, as solving the relaxations of the lazy separation replaces the solution
+        self.start_solution = np.asarray(values, dtype=float)
+
+    def _pass_start_solution(self):
+        if self.start_solution is not None:
+            solution = highspy.HighsSolution()
+            solution.col_value = self.start_solution
+            solution.value_valid = True
+            self.highs.setSolution(solution)
+            self.start_solution = None
+
+    def _set_integrality(self, integral):
+        var_type = highspy.HighsVarType.kInteger if integral else highspy.HighsVarType.kContinuous
+        indices = np.arange(self.number_of_variables, dtype=np.int32)
+        self.highs.changeColsIntegrality(len(indices), indices, np.array([var_type] * len(indices)))
+
+    def _separate_lazy_constraints(self):
+        """ solves the lp relaxation and adds the violated withheld rows until it satisfies all of them """
+        start_time = time.perf_counter()
+        statistics = {"number_of_lazy_constraints": sum(matrix.shape[0] for matrix, sense, rhs in self.pending_lazy_rows.values()),
+                      "separation_rounds": 0,
+                      "separated_constraints": 0}
+        self._set_integrality(False)
+        while len(self.pending_lazy_rows) > 0:
+            self.highs.run()
+            if self.highs.getModelStatus() != highspy.HighsModelStatus.kOptimal:
+                break
+            statistics["separation_rounds"] += 1
+            values = np.array(self.highs.getSolution().col_value)
+            found_violation = False
+            for name, (matrix, sense, rhs) in list(self.pending_lazy_rows.items()):
+                activity = matrix @ values
+                violated = np.zeros(len(rhs), dtype=bool)
+                if sense != builder_pkg.GREATER_EQUAL:
+                    violated |= activity > rhs + 1e-6
+                if sense != builder_pkg.LESS_EQUAL:
+                    violated |= activity < rhs - 1e-6
+                if not violated.any():
+                    continue
+                found_violation = True
+                self.add_constraints(name, matrix[violated], sense, rhs[violated])
+                statistics["separated_constraints"] += int(violated.sum())
+                if violated.all():
+                    del self.pending_lazy_rows[name]
+                else:
+                    self.pending_lazy_rows[name] = (matrix[~violated], sense, rhs[~violated])
+            if not found_violation:
+                break
+        self._set_integrality(True)
+        statistics["time_separation"] = time.perf_counter() - start_time
+        return statistics
+
+    def solve_relaxation(self):
+        start_time = self.highs.getRunTime()
+        self._set_integrality(False)
+        self.highs.run()
+        status = self.highs.getModelStatus()
+        objective_value = self.highs.getInfo().objective_function_value if status == highspy.HighsModelStatus.kOptimal else None
+        iterations = self.highs.getInfo().simplex_iteration_count
+        self._set_integrality(self.is_integral())
+        return objective_value, self.highs.getRunTime() - start_time, iterations
+
+    def optimize(self):
+        self.incumbent_history = []
+        self.progress_history = []
+        self.run_start_time = self.highs.getRunTime()
+        if len(self.pending_lazy_rows) > 0 and self.is_integral():
+            self.lazy_statistics = self._separate_lazy_constraints()
+        self._pass_start_solution()
+        if (self.track_incumbents or self.track_progress) and self.is_integral():
+            self.highs.cbMipImprovingSolution.subscribe(self._record_incumbent)
+            if self.track_progress:
+                self.highs.cbMipInterrupt.subscribe(self._record_node_progress)
+            self.highs.run()
+            self.highs.cbMipImprovingSolution.unsubscribe(self._record_incumbent)
+            if self.track_progress:
+                self.highs.cbMipInterrupt.unsubscribe(self._record_node_progress)
+        else:
+            self.highs.run()
+        self.runtime = self.highs.getRunTime() - self.run_start_time
+        self.model_status = self.status_codes.get(self.highs.getModelStatus(), GurobiStatus.NUMERIC)
+        if self.model_status == GurobiStatus.OPTIMAL and self.cutoff is not None and not self.is_integral():
+            objective_value = self.get_objective_value()
+            if self.is_maximization() and objective_value <= self.cutoff or not self.is_maximization() and objective_value >= self.cutoff:
+                self.model_status = GurobiStatus.CUTOFF
+        self._record_final_progress()
+
+    def _record_incumbent(self, event):
+        runtime = event.data_out.running_time - self.run_start_time
+        if self.track_incumbents:
+            self.incumbent_history.append((runtime, event.data_out.objective_function_value))
+        if self.track_progress:
+            self._record_progress(runtime, PROGRESS_SOLUTION, event.data_out.mip_primal_bound, event.data_out.mip_dual_bound,
+                                  event.data_out.mip_node_count, event.data_out.simplex_iteration_count)
+
+    def _record_node_progress(self, event):
+        self._record_progress(event.data_out.running_time - self.run_start_time, PROGRESS_NODE, event.data_out.mip_primal_bound,
+                              event.data_out.mip_dual_bound, event.data_out.mip_node_count, event.data_out.simplex_iteration_count)
+
+    def get_runtime(self):
+        return self.runtime
+
+    def _get_node_count(self):
+        return self.highs.getInfo().mip_node_count
+
+    def _has_solution(self):
+        return self.highs.getInfo().primal_solution_status == 2
+
+    def get_status(self):
+        integral = self.is_integral()
+        if self.model_status == GurobiStatus.CUTOFF or not self._has_solution():
+            return GurobiStatus(status=self.model_status, solCount=0, integralSolution=integral)
+        info = self.highs.getInfo()
+        objective_value = info.objective_function_value
+        return GurobiStatus(status=self.model_status,
+                            solCount=1,
+                            objValue=objective_value,
+                            objGap=info.mip_gap if integral else 0.0,
+                            objBound=info.mip_dual_bound if integral else objective_value,
+                            integralSolution=integral)
+
+    def get_objective_value(self):
+        return self.highs.getInfo().objective_function_value
+
+    def get_solution(self):
+        return np.array(self.highs.getSolution().col_value)
+
+    def get_duals(self, block_name):
+        return np.array(self.highs.getSolution().row_dual)[self.block_rows[block_name]]
+
+    def get_iteration_count(self):
+        return self.highs.getInfo().simplex_iteration_count
+
+    def get_basis(self):
+        return self.highs.getBasis()
+
+    def set_basis(self, basis):
+        self.highs.setBasis(basis)
+
+    def write_model(self, path):
+        self.highs.writeModel(path)
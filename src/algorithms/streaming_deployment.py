@@ -0,0 +1,234 @@
+# MIT License
+#
+# Copyright (c) 2017 Matthias Rost, Alexander Elvers
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+__author__ = "Matthias Rost, Alexander Elvers (mrost / aelvers <AT> inet.tu-berlin.de)"
+
+import json
+import time
+
+from algorithms import greedy_matching as greedy_pkg
+from algorithms import incremental_greedy_matching as inc_greedy_pkg
+from datamodel import matching_graph as mg_pkg
+from datamodel import requests as req_pkg
+from datamodel import scenario as scen_pkg
+
+
+EVENT_ARRIVAL = "arrival"
+EVENT_DEPARTURE = "departure"
+
+STATUS_SERVED = "served"
+STATUS_REJECTED = "rejected"
+STATUS_DEPARTED = "departed"
+
+
+def read_events(path):
+    """ yields the events of a JSONL file, one JSON object per line, e.g.
+            {"type": "arrival", "id": "c17", "tail": "Berlin", "head": "Paris", "max_deviation": 0.5}
+            {"type": "departure", "id": "c17"}
+    """
+    with open(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if len(line) > 0:
+                yield json.loads(line)
+
+
+def write_records(records, path):
+    """ writes the records as JSONL while they are produced, so that the file can be followed during a run """
+    with open(path, "w") as f:
+        for record in records:
+            f.write(json.dumps(record, default=str) + "\n")
+            f.flush()
+
+
+class StreamingDeployment(inc_greedy_pkg.IncrementalGreedyMatching):
+    """ maintains a deployment while communication pairs arrive and depart.
+
+        An arriving pair is served by augmenting the current matching first, i.e. by reassigning pairs among the open
+        middleboxes. Only if this fails, the nearest inactive middlebox of the pair or, as a last resort, the
+        middlebox chosen by the greedy step is opened; a pair that cannot be served at all is rejected. A departing
+        pair frees its capacity: its middlebox is closed if it becomes empty, or, if its load drops to at most
+        underuse_threshold of its capacity, if all of its pairs can be moved to the other open middleboxes.
+
+        The pairs are never removed from the scenario view, departed ones only lose their edges, so the view grows
+        with the number of arrivals. Events are given as dicts (see read_events) and keyed by their id.
+    """
+    alg_name = "Streaming   "
+
+    def __init__(self, scenario, events=None, matching_edges=None, underuse_threshold=0.25):
+        # the set-up of IncrementalGreedyMatching expects a new pair and is replaced; arriving pairs are added to a
+        # view, the given scenario is not changed
+        inc_greedy_pkg.aa_pkg.AbstractAlgorithm.__init__(self, scen_pkg.ScenarioView(scenario))
+
+        for req in self.scenario.requests:
+            if req.capacity != 1:
+                raise Exception("Requests must have a capacity of 1.")
+        self.events = events
+        self.underuse_threshold = underuse_threshold
+
+        if matching_edges is None:
+            if len(self.scenario.requests) > 0:
+                matching_edges = set(greedy_pkg.GreedyMatching(self.scenario).run().matching_edges)
+            else:
+                matching_edges = set()
+
+        self.matching_graph = mg_pkg.StatefulMatchingGraph(self.scenario)
+        self.matching_graph.reinitialize_from_edges(matching_edges)
+
+        self._initialize_search()
+
+        # the pairs given with the scenario are keyed by their index
+        self.cp_of_key = {cp: cp for cp in self.matching_graph.communication_pairs}
+        self.rejected_keys = set()
+        self.number_of_events = 0
+        self.number_of_rejections = 0
+        self.number_of_reassignments = 0
+        self.maximal_number_of_active_mbs = self.matching_graph.number_of_active_mbs()
+        self.event_time = 0.0
+
+    def process(self, events):
+        """ handles the events one by one and yields a record per event """
+        for event in events:
+            yield self.process_event(event)
+
+    def process_event(self, event):
+        start = time.perf_counter()
+        active_mbs_before = set(self.matching_graph.active_mbs)
+        if event["type"] == EVENT_ARRIVAL:
+            key = event["id"]
+            if key in self.cp_of_key or key in self.rejected_keys:
+                raise Exception("The communication pair {} has already arrived.".format(key))
+            request = req_pkg.Request(event["tail"], event["head"], event["max_deviation"], capacity=event.get("capacity", 1))
+            cp, status, reassignments = self.arrive(request)
+            if status == STATUS_SERVED:
+                self.cp_of_key[key] = cp
+            else:
+                self.rejected_keys.add(key)
+        elif event["type"] == EVENT_DEPARTURE:
+            key = event["id"]
+            if key in self.rejected_keys:
+                self.rejected_keys.remove(key)
+                cp, status, reassignments = None, STATUS_DEPARTED, 0
+            elif key in self.cp_of_key:
+                cp = self.cp_of_key.pop(key)
+                status, reassignments = STATUS_DEPARTED, self.depart(cp)
+            else:
+                raise Exception("The communication pair {} is not present.".format(key))
+        else:
+            raise Exception("Unknown event type {}.".format(event["type"]))
+        latency = time.perf_counter() - start
+
+        self.number_of_events += 1
+        self.number_of_reassignments += reassignments
+        self.event_time += latency
+        active_mbs = self.matching_graph.active_mbs
+        self.maximal_number_of_active_mbs = max(self.maximal_number_of_active_mbs, len(active_mbs))
+        return {"event": self.number_of_events - 1,
+                "type": event["type"],
+                "id": key,
+                "cp": cp,
+                "status": status,
+                "latency": latency,
+                "reassignments": reassignments,
+                "opened": sorted(active_mbs - active_mbs_before, key=str),
+                "closed": sorted(active_mbs_before - active_mbs, key=str),
+                "active_mbs": len(active_mbs),
+                "active_cps": len(self.cp_of_key)}
+
+    def arrive(self, request):
+        """ adds the request and serves it; returns its pair, its status and the number of reassigned pairs """
+        if request.capacity != 1:
+            raise Exception("Requests must have a capacity of 1.")
+        cp = self.matching_graph.add_request(request)
+        self._share_adjacency()
+        self.predecessors[cp] = None
+        # an optimum of an earlier event must not be returned by the greedy step
+        self.current_optimum = None
+
+        previous_edges = self.matching_graph.edge_in_matching
+        size = self.matching_graph.get_size_of_matching()
+
+        matching = self._extend_maximal_matching()
+        if matching.get_size_of_matching() <= size:
+            matching = None
+            for (mb, cp) in self.matching_graph.edges_at_node[cp]:
+                if mb in self.matching_graph.inactive_mbs:
+                    matching = self._compute_maximal_matching(mb)
+                    break
+        if matching is None:
+            matching = self._greedy_step()
+        if matching is None or matching.get_size_of_matching() <= size:
+            self.matching_graph.detach_communication_pair(cp)
+            self._share_adjacency()
+            self.number_of_rejections += 1
+            return cp, STATUS_REJECTED, 0
+
+        self.matching_graph.reinitialize(matching)
+        return cp, STATUS_SERVED, len(previous_edges - self.matching_graph.edge_in_matching)
+
+    def depart(self, cp):
+        """ removes the pair and closes its middlebox if it is empty or underused and can be emptied; returns the
+            number of reassigned pairs
+        """
+        mb = self.matching_graph.detach_communication_pair(cp)
+        self._share_adjacency()
+        if mb is None:
+            return 0
+
+        capacity = self.scenario.middleboxes[mb]
+        load = capacity - self.matching_graph.available_capacity[mb]
+        if load == 0:
+            self.matching_graph.close_middlebox(mb)
+            return 0
+        if load > self.underuse_threshold * capacity:
+            return 0
+
+        previous_edges = self.matching_graph.edge_in_matching
+        size = self.matching_graph.get_size_of_matching()
+        tmp_mg = self._get_temporary_matching()
+        tmp_mg.close_middlebox(mb)
+        self._augment(tmp_mg)
+        if tmp_mg.get_size_of_matching() < size:
+            return 0
+        self.matching_graph.reinitialize(tmp_mg)
+        return len(previous_edges - self.matching_graph.edge_in_matching)
+
+    def _share_adjacency(self):
+        # the temporary matchings have to see the pairs added or detached in the matching graph
+        self.temp_matching_1.share_adjacency(self.matching_graph)
+        self.temp_matching_2.share_adjacency(self.matching_graph)
+
+    def _run(self):
+        if self.events is None:
+            raise Exception("No events to process.")
+        for record in self.process(self.events):
+            print("[{}]: {} {} -> {} with {} many middleboxes ({} reassignments)".format(
+                self.alg_name, record["type"], record["id"], record["status"], record["active_mbs"], record["reassignments"]))
+        self.matching_graph.check_validity(all_cps_must_be_assigned=False)
+        return self.matching_graph
+
+    def _get_extra_information(self):
+        return {"number_of_events": self.number_of_events,
+                "number_of_rejections": self.number_of_rejections,
+                "number_of_reassignments": self.number_of_reassignments,
+                "maximal_number_of_active_mbs": self.maximal_number_of_active_mbs,
+                "time_events": self.event_time}
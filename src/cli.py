@@ -27,6 +27,7 @@ import os
 import click
 
 import main
+from algorithms import solver_backends as backends_pkg
 from evaluation import abstract_data_extractor as ade_pkg
 from experiments import abstract_experiment_manager as aem_pkg
 
@@ -40,10 +41,11 @@ def cli(ctx, experiment):
 
 @cli.command()
 @click.option("--output", "-o", required=True, type=click.Path(resolve_path=True))
+@click.option("--number_of_cores", "-c", default=1, type=int, help="number of cores generating the scenarios")
 @click.pass_obj
-def generate(exp_main_pkg, output):
+def generate(exp_main_pkg, output, number_of_cores):
     exp_mgr = exp_main_pkg.create_experiment_manager_for_generation()
-    exp_mgr.construct_scenarios()
+    exp_mgr.construct_scenarios(number_of_cores=number_of_cores)
 
     if os.path.exists(output):
         click.confirm("output file exists. overwrite?", prompt_suffix="")
@@ -56,12 +58,20 @@ def generate(exp_main_pkg, output):
 @click.option("--server", "-S", required=True, type=int, help="server id (0 .. number_of_servers - 1)")
 @click.option("--number_of_servers", "-s", required=True, type=int, help="number of servers that are available")
 @click.option("--number_of_cores", "-c", required=True, type=int, help="number of cores that shall be used")
+@click.option("--solver", type=click.Choice([backends_pkg.GUROBI, backends_pkg.HIGHS]), default=None,
+              help="solver backend of the MIP and LP based algorithms (default: gurobi if installed, otherwise highs)")
+@click.option("--solver_output/--no_solver_output", default=None, help="enable or disable the log output of the solver")
+@click.option("--solver_threads", type=int, default=None, help="number of threads of the solver environment of each process")
 @click.pass_obj
-def execute(exp_main_pkg, input, output, server, number_of_servers, number_of_cores):
+def execute(exp_main_pkg, input, output, server, number_of_servers, number_of_cores, solver, solver_output, solver_threads):
     exp_mgr = aem_pkg.unpickle_experiment_manager(path=input)
     if not isinstance(exp_mgr, exp_main_pkg.experiment_manager_class):
         raise click.ClickException(f"type of input experiment manager is {type(exp_mgr).__name__}"
                                    f" but should be {exp_main_pkg.experiment_manager_class.__name__}")
+    if solver is not None:
+        exp_mgr.algorithm_manager.solver_backend = solver
+    exp_mgr.algorithm_manager.solver_output = solver_output
+    exp_mgr.algorithm_manager.solver_threads = solver_threads
 
     exp_mgr.execute_scenarios(
         server_number=server,
@@ -22,6 +22,7 @@
 
 __author__ = "Matthias Rost, Alexander Elvers (mrost / aelvers <AT> inet.tu-berlin.de)"
 
+from datamodel import scenario_registry as registry_pkg
 from util import util as util_pkg
 
 def get_copy_stateful_matching_graph(other):
@@ -40,6 +41,9 @@ class MatchingGraph:
         #print "\n\n INIT \n {} \n\n".format(self.middleboxes)
         self.communication_pairs = range(len(self.scenario.requests))
 
+        if orig is None:
+            # reuse the adjacency structures of a published scenario instead of recomputing them
+            orig = registry_pkg.get_precomputed_matching_graph(scenario)
 
         if orig is None:
             self.edges = []
@@ -87,6 +91,168 @@ class MatchingGraph:
             self.edges = orig.edges
             self.edges_at_node = orig.edges_at_node
 
+        self.array_form = None if orig is None else orig.array_form
+        # the adjacency structures taken from orig are shared and copied before add_request changes them
+        self.shares_adjacency = orig is not None
+        self.owned_adjacency_nodes = set()
+
+    def add_request(self, request):
+        """ appends the request to the scenario and its edges to the adjacency structures, leaving the existing edges
+            and state in place; only the middleboxes are checked, so the cost per request is O(|MB|). The edges of
+            the new communication pair are appended to the lists of the middleboxes. Returns the new pair.
+
+            Frozen scenarios cannot be extended; the graph has to be built on a ScenarioView of them instead.
+        """
+        if self.scenario.is_frozen():
+            raise Exception("Cannot add a request to the frozen scenario {}; use a ScenarioView.".format(self.scenario.id))
+        self.scenario.requests.append(request)
+        self.scenario.add_single_request(request)
+        cp = len(self.scenario.requests) - 1
+        self._add_communication_pair(cp)
+        return cp
+
+    def add_requests(self, requests):
+        return [self.add_request(request) for request in requests]
+
+    def _add_communication_pair(self, cp):
+        if cp != len(self.communication_pairs):
+            raise Exception("Communication pair {} is not the next one of the matching graph.".format(cp))
+
+        if self.shares_adjacency:
+            self.edges = list(self.edges)
+            self.edges_at_node = dict(self.edges_at_node)
+            self.shares_adjacency = False
+
+        distance_matrix = self.scenario.substrate.get_shortest_paths_cost_dict()
+        request = self.scenario.requests[cp]
+        tail = request.tail
+        head = request.head
+        cp_edges = []
+        for mb in self.middleboxes:
+            if distance_matrix[tail][mb] + distance_matrix[mb][head] <= ((1+request.max_deviation) * (distance_matrix[tail][head])):
+                dist_quo = distance_matrix[tail][mb] + distance_matrix[mb][head] / ((1+request.max_deviation) * (distance_matrix[tail][head] + 0.001))
+                cp_edges.append((mb, dist_quo))
+
+        self.communication_pairs = range(cp + 1)
+        self.edges_at_node[cp] = [(mb, cp) for (mb, dist_quo) in sorted(cp_edges, key=lambda x: x[1])]
+        self.owned_adjacency_nodes.add(cp)
+        for (mb, cp) in self.edges_at_node[cp]:
+            if mb not in self.owned_adjacency_nodes:
+                self.edges_at_node[mb] = list(self.edges_at_node[mb])
+                self.owned_adjacency_nodes.add(mb)
+            self.edges_at_node[mb].append((mb, cp))
+            self.edges.append((mb, cp))
+
+        # the array form has to be recomputed for the new edges
+        self.array_form = None
+
+    def detach_communication_pair(self, cp):
+        """ removes the edges of the communication pair, e.g. when it departs, while its index remains reserved, so
+            that the indices of the other pairs stay valid
+        """
+        if self.shares_adjacency:
+            self.edges_at_node = dict(self.edges_at_node)
+            self.shares_adjacency = False
+
+        for (mb, cp) in self.edges_at_node[cp]:
+            if mb not in self.owned_adjacency_nodes:
+                self.edges_at_node[mb] = list(self.edges_at_node[mb])
+                self.owned_adjacency_nodes.add(mb)
+            self.edges_at_node[mb].remove((mb, cp))
+        self.edges_at_node[cp] = []
+        self.owned_adjacency_nodes.add(cp)
+        self.edges = [(mb, other_cp) for (mb, other_cp) in self.edges if other_cp != cp]
+
+        self.array_form = None
+
+    def drop_infeasible_edges(self, distance_matrix):
+        """ removes the edges that exceed the maximal deviation w.r.t. the given distances, e.g. after a link failure;
+            a distance of None means that the nodes are disconnected. Edges that become feasible are not added.
+            Returns the removed edges.
+        """
+        removed_edges = []
+        for (mb, cp) in self.edges:
+            request = self.scenario.requests[cp]
+            tail = request.tail
+            head = request.head
+            via_mb = None
+            if distance_matrix[tail][mb] is not None and distance_matrix[mb][head] is not None:
+                via_mb = distance_matrix[tail][mb] + distance_matrix[mb][head]
+            if via_mb is None or distance_matrix[tail][head] is None or via_mb > ((1+request.max_deviation) * (distance_matrix[tail][head])):
+                removed_edges.append((mb, cp))
+        if len(removed_edges) == 0:
+            return removed_edges
+
+        if self.shares_adjacency:
+            self.edges_at_node = dict(self.edges_at_node)
+            self.shares_adjacency = False
+        removed = set(removed_edges)
+        for node in set(node for edge in removed_edges for node in edge):
+            self.edges_at_node[node] = [edge for edge in self.edges_at_node[node] if edge not in removed]
+            self.owned_adjacency_nodes.add(node)
+        self.edges = [edge for edge in self.edges if edge not in removed]
+
+        self.array_form = None
+        return removed_edges
+
+    def share_adjacency(self, orig):
+        """ takes over the (possibly extended) adjacency structures of orig, which are not copied """
+        self.communication_pairs = orig.communication_pairs
+        self.edges = orig.edges
+        self.edges_at_node = orig.edges_at_node
+        self.array_form = orig.array_form
+        self.shares_adjacency = True
+        self.owned_adjacency_nodes = set()
+
+    def get_prefix_graph(self, scenario, number_of_communication_pairs):
+        """ returns the matching graph of the scenario, whose requests are the first number_of_communication_pairs
+            requests of this graph's scenario, by filtering the edges of this graph instead of recomputing them
+        """
+        prefix = MatchingGraph(scenario, orig=self)
+        prefix.communication_pairs = range(number_of_communication_pairs)
+        prefix.edges = [(mb, cp) for (mb, cp) in self.edges if cp < number_of_communication_pairs]
+        prefix.edges_at_node = {}
+        for mb in self.middleboxes:
+            prefix.edges_at_node[mb] = [(mb, cp) for (mb, cp) in self.edges_at_node[mb] if cp < number_of_communication_pairs]
+        # the lists of the pairs are shared, they are only replaced but never changed by the matching graphs
+        for cp in prefix.communication_pairs:
+            prefix.edges_at_node[cp] = self.edges_at_node[cp]
+        prefix.shares_adjacency = False
+        prefix.owned_adjacency_nodes = set(self.middleboxes)
+        prefix.array_form = None
+        return prefix
+
+    def get_array_form(self):
+        if self.array_form is None:
+            self.array_form = MatchingGraphArrays(self)
+        return self.array_form
+
+    def __getstate__(self):
+        # dict_keys cannot be pickled; the middleboxes are restored from the scenario
+        state = self.__dict__.copy()
+        del state["middleboxes"]
+        return state
+
+    def __setstate__(self, state):
+        state.setdefault("shares_adjacency", False)
+        state.setdefault("owned_adjacency_nodes", set())
+        self.__dict__.update(state)
+        self.middleboxes = self.scenario.middleboxes.keys()
+
+
+class MatchingGraphArrays:
+    """ index-based form of a matching graph: middleboxes are numbered by their position in middleboxes and the
+        i-th edge connects middlebox edge_mb[i] with communication pair edge_cp[i]
+    """
+
+    def __init__(self, matching_graph):
+        self.middleboxes = list(matching_graph.middleboxes)
+        self.middlebox_index = {mb: index for index, mb in enumerate(self.middleboxes)}
+        self.edges = list(matching_graph.edges)
+        self.edge_mb = [self.middlebox_index[mb] for (mb, cp) in self.edges]
+        self.edge_cp = [cp for (mb, cp) in self.edges]
+        self.number_of_communication_pairs = len(matching_graph.communication_pairs)
+
 
 class StatefulMatchingGraph(MatchingGraph):
 
@@ -94,7 +260,6 @@ class StatefulMatchingGraph(MatchingGraph):
     def __init__(self, scenario, orig=None):
         super().__init__(scenario, orig)
 
-
         self.active_mbs = set()
         self.inactive_mbs = set()
 
@@ -136,6 +301,48 @@ class StatefulMatchingGraph(MatchingGraph):
                 self.available_capacity[mb] = orig.available_capacity[mb]
 
 
+    def _add_communication_pair(self, cp):
+        super()._add_communication_pair(cp)
+        self.is_free_cp[cp] = True
+
+    def detach_communication_pair(self, cp):
+        """ additionally removes the pair from the matching; a detached pair is not free as it needs no middlebox.
+            Returns the middlebox the pair was assigned to or None.
+        """
+        assigned_mb = None
+        for (mb, cp) in self.edges_at_node[cp]:
+            if (mb, cp) in self.edge_in_matching:
+                assigned_mb = mb
+                self.edge_in_matching.remove((mb, cp))
+                self.available_capacity[mb] += 1
+                self.size_of_matching -= 1
+        self.is_free_cp[cp] = False
+        super().detach_communication_pair(cp)
+        return assigned_mb
+
+    def drop_infeasible_edges(self, distance_matrix):
+        """ additionally unassigns the communication pairs of removed matching edges, which become free """
+        removed_edges = super().drop_infeasible_edges(distance_matrix)
+        for (mb, cp) in removed_edges:
+            if (mb, cp) in self.edge_in_matching:
+                self.edge_in_matching.remove((mb, cp))
+                self.available_capacity[mb] += 1
+                self.size_of_matching -= 1
+                self.is_free_cp[cp] = True
+        return removed_edges
+
+    def close_middlebox(self, mb):
+        """ deactivates the middlebox and frees the communication pairs assigned to it; returns these pairs """
+        freed_cps = [cp for (mb, cp) in self.edges_at_node[mb] if (mb, cp) in self.edge_in_matching]
+        for cp in freed_cps:
+            self.edge_in_matching.remove((mb, cp))
+            self.is_free_cp[cp] = True
+        self.size_of_matching -= len(freed_cps)
+        self.available_capacity[mb] = self.scenario.middleboxes[mb]
+        self.active_mbs.discard(mb)
+        self.inactive_mbs.add(mb)
+        return freed_cps
+
     def reinitialize(self, orig):
         self.active_mbs.clear()
         self.inactive_mbs.clear()
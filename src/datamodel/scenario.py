@@ -22,6 +22,10 @@
 
 __author__ = "Matthias Rost, Alexander Elvers (mrost / aelvers <AT> inet.tu-berlin.de)"
 
+import collections.abc
+import hashlib
+
+
 class Scenario:
 
     def __init__(self, id, substrate, requests, middleboxes):
@@ -36,7 +40,19 @@ class Scenario:
         for req in requests:
             self.add_single_request(req)
 
+    def freeze(self):
+        """ makes the requests immutable (a tuple); incremental algorithms then work on a ScenarioView, which can be
+            shared between processes and probing points without copying the scenario. Returns the scenario.
+        """
+        self.requests = tuple(self.requests)
+        return self
+
+    def is_frozen(self):
+        return isinstance(self.requests, tuple)
+
     def add_single_request(self, req):
+        if self.is_frozen():
+            raise Exception("Cannot add a request to the frozen scenario {}; use a ScenarioView.".format(self.id))
         tail = req.tail
         head = req.head
         if tail not in self.communication_pairs_at_node:
@@ -47,8 +63,93 @@ class Scenario:
         self.communication_pairs_at_node[tail].append(req)
         self.communication_pairs_at_node[head].append(req)
 
+    def get_fingerprint(self):
+        """ returns a hash of the substrate, the requests (in their order) and the middleboxes, which identifies the
+            scenario independently of its id, e.g. for caching models built for it
+        """
+        substrate = self.substrate
+        content = repr((substrate.name,
+                        sorted(repr(node) for node in substrate.nodes),
+                        sorted(repr((edge, substrate.edge_cost[edge])) for edge in substrate.edges),
+                        [(req.tail, req.head, req.max_deviation, req.capacity) for req in self.requests],
+                        sorted(repr(item) for item in self.middleboxes.items())))
+        return hashlib.sha256(content.encode()).hexdigest()
+
     def print_it(self):
         print("\nScenario is as follows..\n")
         print("substrate graph has {} many nodes and {} many edges".format(len(self.substrate.nodes), len(self.substrate.edges)))
         print("there exist {} many communication requests".format(len(self.requests)))
         print("there exist {} many middlebox locations".format(len(self.middleboxes.keys())))
+
+
+class RequestOverlay(collections.abc.Sequence):
+    """ the first number_of_base_requests requests of base_requests followed by own requests; the base requests are
+        neither copied nor changed, append only extends the own requests
+    """
+
+    def __init__(self, base_requests, number_of_base_requests, requests):
+        if number_of_base_requests > len(base_requests):
+            raise Exception("There are only {} base requests.".format(len(base_requests)))
+        self.base_requests = base_requests
+        self.number_of_base_requests = number_of_base_requests
+        self.requests = requests
+
+    def __len__(self):
+        return self.number_of_base_requests + len(self.requests)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError("request index out of range")
+        if index < self.number_of_base_requests:
+            return self.base_requests[index]
+        return self.requests[index - self.number_of_base_requests]
+
+    def __iter__(self):
+        for index in range(self.number_of_base_requests):
+            yield self.base_requests[index]
+        yield from self.requests
+
+    def append(self, request):
+        self.requests.append(request)
+
+
+class ScenarioView(Scenario):
+    """ a scenario presenting the first number_of_base_requests requests of the base scenario (all by default)
+        followed by further requests, without copying or changing the base scenario. Requests added to the view, e.g.
+        by MatchingGraph.add_request, only extend the view.
+    """
+
+    def __init__(self, base, number_of_base_requests=None, requests=()):
+        if number_of_base_requests is None:
+            number_of_base_requests = len(base.requests)
+        self.base = base
+        self.id = base.id
+        self.substrate = base.substrate
+        self.middleboxes = base.middleboxes
+        self.requests = RequestOverlay(base.requests, number_of_base_requests, list(requests))
+        # the pairs at the nodes are only collected on demand
+        self._communication_pairs_at_node = None
+
+    @property
+    def communication_pairs_at_node(self):
+        if self._communication_pairs_at_node is None:
+            self._communication_pairs_at_node = {}
+            for req in self.requests:
+                Scenario.add_single_request(self, req)
+        return self._communication_pairs_at_node
+
+    @communication_pairs_at_node.setter
+    def communication_pairs_at_node(self, value):
+        self._communication_pairs_at_node = value
+
+    def add_single_request(self, req):
+        if self._communication_pairs_at_node is not None:
+            Scenario.add_single_request(self, req)
+
+    def presents_base(self):
+        """ returns whether the view (still) consists of exactly the requests of the base scenario """
+        return self.requests.number_of_base_requests == len(self.base.requests) and len(self.requests.requests) == 0
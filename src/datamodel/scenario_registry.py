@@ -0,0 +1,185 @@
+# MIT License
+#
+# Copyright (c) 2017 Matthias Rost, Alexander Elvers
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+__author__ = "Matthias Rost, Alexander Elvers (mrost / aelvers <AT> inet.tu-berlin.de)"
+
+import itertools
+import multiprocessing
+import os
+import pickle
+import time
+from multiprocessing import shared_memory
+
+from datamodel import matching_graph as mg_pkg
+from datamodel import scenario as scen_pkg
+
+
+# Scenarios are published once per process. Children created via fork inherit the registry (copy-on-write) and
+# only receive a ScenarioHandle; children created via spawn unpickle the scenario once from a shared memory block.
+
+
+class ScenarioHandle:
+    """ small, picklable reference to a published scenario that is handed to child processes """
+
+    def __init__(self, scenario_id, setup_time, shared_memory_name=None, shared_memory_size=0):
+        self.scenario_id = scenario_id
+        self.setup_time = setup_time
+        self.shared_memory_name = shared_memory_name
+        self.shared_memory_size = shared_memory_size
+
+    def __str__(self):
+        return f"ScenarioHandle {self.scenario_id}"
+
+
+class PublishedScenario:
+
+    def __init__(self, handle, scenario, matching_graph):
+        self.handle = handle
+        self.scenario = scenario
+        self.requests = scenario.requests
+        self.number_of_requests = len(scenario.requests)
+        self.matching_graph = matching_graph
+        # matching graphs of views presenting a prefix of the requests, by the length of the prefix
+        self.prefix_matching_graphs = {}
+        self.shared_memory = None
+
+
+_id_generator = itertools.count()
+_published_scenarios = {}
+_scenario_ids = {}
+
+
+def publish_scenario(scenario, use_shared_memory=None):
+    """ precomputes the distance matrix and the matching graph of the scenario and makes it available by id
+
+        If the scenario was already published in this process (or inherited from the parent), the existing handle
+        is returned. Shared memory is used by default whenever child processes are not forked.
+    """
+    published = _get_published(scenario)
+    if published is not None:
+        return published.handle
+
+    start_time = time.perf_counter()
+    scenario.substrate.get_shortest_paths_cost_dict()
+    matching_graph = mg_pkg.MatchingGraph(scenario)
+    matching_graph.get_array_form()
+    setup_time = time.perf_counter() - start_time
+
+    handle = ScenarioHandle(scenario_id=f"{os.getpid()}-{next(_id_generator)}", setup_time=setup_time)
+    published = PublishedScenario(handle, scenario, matching_graph)
+
+    if use_shared_memory is None:
+        use_shared_memory = multiprocessing.get_start_method() != "fork"
+    if use_shared_memory:
+        data = pickle.dumps((scenario, matching_graph))
+        published.shared_memory = shared_memory.SharedMemory(create=True, size=len(data))
+        published.shared_memory.buf[:len(data)] = data
+        handle.shared_memory_name = published.shared_memory.name
+        handle.shared_memory_size = len(data)
+
+    _register(published)
+    print(f"published scenario {scenario.id} as {handle.scenario_id} (setup took {setup_time:.4f}s)")
+    return handle
+
+
+def attach_scenario(handle):
+    """ returns the scenario belonging to the handle; unpickles it from shared memory at most once per process """
+    published = _published_scenarios.get(handle.scenario_id)
+    if published is None:
+        if handle.shared_memory_name is None:
+            raise Exception(f"Scenario {handle.scenario_id} is neither known to this process nor available via"
+                            f" shared memory.")
+        block = shared_memory.SharedMemory(name=handle.shared_memory_name)
+        try:
+            scenario, matching_graph = pickle.loads(bytes(block.buf[:handle.shared_memory_size]))
+        finally:
+            block.close()
+        published = PublishedScenario(handle, scenario, matching_graph)
+        _register(published)
+    return published.scenario
+
+
+def release_scenario(handle):
+    published = _published_scenarios.pop(handle.scenario_id, None)
+    if published is None:
+        return
+    del _scenario_ids[id(published.scenario)]
+    if published.shared_memory is not None:
+        published.shared_memory.close()
+        published.shared_memory.unlink()
+
+
+def detach_scenario(handle):
+    """ forgets an attached scenario in this process; its shared memory is left to the publishing process """
+    published = _published_scenarios.pop(handle.scenario_id, None)
+    if published is not None:
+        del _scenario_ids[id(published.scenario)]
+
+
+def is_published(scenario):
+    return _get_published(scenario) is not None
+
+
+def get_precomputed_matching_graph(scenario):
+    """ returns the published matching graph of the scenario if its requests were not changed since publishing.
+
+        For an unpublished ScenarioView without own requests, the graph is derived from the one of its base scenario:
+        it is the base graph itself or, for a prefix of the requests, the base graph restricted to the prefix.
+    """
+    published = _get_published(scenario)
+    if published is None:
+        if isinstance(scenario, scen_pkg.ScenarioView) and len(scenario.requests.requests) == 0:
+            return _get_view_matching_graph(scenario)
+        return None
+    if published.requests is not scenario.requests or published.number_of_requests != len(scenario.requests):
+        return None
+    return published.matching_graph
+
+
+def _get_view_matching_graph(view):
+    base_graph = get_precomputed_matching_graph(view.base)
+    if base_graph is None or view.presents_base():
+        return base_graph
+    number_of_requests = view.requests.number_of_base_requests
+    # prefix graphs are kept with a published base, so that all algorithms of a process share them
+    published_base = _get_published(view.base)
+    if published_base is not None and number_of_requests in published_base.prefix_matching_graphs:
+        return published_base.prefix_matching_graphs[number_of_requests]
+    prefix_graph = base_graph.get_prefix_graph(view, number_of_requests)
+    if published_base is not None:
+        published_base.prefix_matching_graphs[number_of_requests] = prefix_graph
+    return prefix_graph
+
+
+def _get_published(scenario):
+    scenario_id = _scenario_ids.get(id(scenario))
+    if scenario_id is None:
+        return None
+    published = _published_scenarios[scenario_id]
+    if published.scenario is not scenario:
+        return None
+    return published
+
+
+def _register(published):
+    _published_scenarios[published.handle.scenario_id] = published
+    _scenario_ids[id(published.scenario)] = published.handle.scenario_id
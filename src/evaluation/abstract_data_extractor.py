@@ -42,6 +42,44 @@ class AbstractDataExtractor(abc.ABC):
     def print_it(self):
         ...
 
+    def get_solver_progress(self, scenario_key, algorithm_id):
+        """ returns the solver progress samples recorded by the algorithm (see AbstractSolverBackend) or None """
+        data = self.extracted_solution_data[scenario_key][algorithm_id]
+        if getattr(data, "solver_progress", None) is not None:
+            return data.solver_progress
+        extra_information = getattr(data, "extra_information", None)
+        if isinstance(extra_information, dict):
+            return extra_information.get("solver_progress")
+        return None
+
+    def get_time_to_gap(self, scenario_key, algorithm_id, gap):
+        """ returns the solver time at which the relative gap between incumbent and bound first was at most gap,
+            or None if it was never reached (or no progress was recorded)
+        """
+        progress = self.get_solver_progress(scenario_key, algorithm_id)
+        if progress is None:
+            return None
+        for sample in progress:
+            if sample["incumbent"] is None or sample["bound"] is None:
+                continue
+            if abs(sample["incumbent"] - sample["bound"]) <= gap * max(abs(sample["incumbent"]), 1e-10):
+                return sample["time"]
+        return None
+
+    def get_progress_at(self, scenario_key, algorithm_id, time):
+        """ returns the last progress sample taken at or before the given solver time, e.g. to evaluate which
+            incumbent and bound a time limit would have yielded
+        """
+        progress = self.get_solver_progress(scenario_key, algorithm_id)
+        if progress is None:
+            return None
+        last_sample = None
+        for sample in progress:
+            if sample["time"] > time:
+                break
+            last_sample = sample
+        return last_sample
+
 
 def unpickle_data_extractor(path):
     with open(path, "rb") as f:
@@ -28,10 +28,11 @@ from evaluation.abstract_data_extractor import AbstractDataExtractor
 
 
 class EvaluationData:
-    def __init__(self, number_of_mbs, runtime_with_init, runtime_without_init):
+    def __init__(self, number_of_mbs, runtime_with_init, runtime_without_init, solver_progress=None):
         self.number_of_mbs = number_of_mbs
         self.runtime_with_init = runtime_with_init
         self.runtime_without_init = runtime_without_init
+        self.solver_progress = solver_progress
 
 
 class DataExtractor(AbstractDataExtractor):
@@ -60,6 +61,8 @@ class DataExtractor(AbstractDataExtractor):
                     number_of_mbs=len(algorithm_result.active_mbs),
                     runtime_with_init=algorithm_result.runtime_with_init,
                     runtime_without_init=algorithm_result.runtime_without_init,
+                    solver_progress=algorithm_result.extra_information.get("solver_progress")
+                    if isinstance(algorithm_result.extra_information, dict) else None,
                 )
 
             self.scenario_keys.add(scenario_key)
@@ -24,9 +24,23 @@ __author__ = "Matthias Rost, Alexander Elvers (mrost / aelvers <AT> inet.tu-berl
 
 import abc
 import enum
+import itertools
+import multiprocessing
 import os
 import pickle
 import random
+import time
+
+from algorithms import solver_backends as backends_pkg
+from datamodel import (
+    scenario_registry as registry_pkg,
+    scenario as scen_pkg,
+)
+from experiments import process_pool as process_pool_pkg
+
+
+# seed of the random generators of the scenario groups, which are additionally seeded by the group's key
+SCENARIO_SEED = 1337
 
 
 class AlgorithmIdentifier:
@@ -45,6 +59,11 @@ class AlgorithmIdentifier:
     def __ne__(self, other):
         return not self.__eq__(other)
 
+    def get_property(self, name, default=None):
+        if self.properties is None:
+            return default
+        return self.properties.get(name, default)
+
     def __hash__(self):
         if self._hash is None:
             self._hash = ""
@@ -78,14 +97,63 @@ class AlgorithmType(enum.Enum):
     MIP = "MIP"
     GREEDY_SINGLE = "GREEDY_SINGLE"
     GREEDY_PARALLEL = "GREEDY_PARALLEL"
+    GREEDY_PRICING = "GREEDY_PRICING"
+    LP_ROUNDING = "LP_ROUNDING"
+    LAGRANGIAN = "LAGRANGIAN"
+
+
+class ScenarioExecution:
+    """ the tasks of the algorithms on one scenario and the collection of their results. The tasks are tuples
+        (key, method name of the algorithm manager, arguments, process count); add_result may return further tasks,
+        which depend on the result.
+    """
+
+    def __init__(self, algorithm_manager, scenario, number_of_cores):
+        self.algorithm_manager = algorithm_manager
+        self.scenario = scenario
+        self.number_of_cores = number_of_cores
+        self.handles = []
+        self.results = {}
+
+    def publish(self, scenario):
+        # the persistent workers were started before, so the scenario is handed over via shared memory
+        handle = registry_pkg.publish_scenario(scenario, use_shared_memory=True)
+        self.handles.append(handle)
+        return handle
+
+    def get_tasks(self):
+        handle = self.publish(self.scenario)
+        return [(alg, "execute_algorithm", (handle, alg), self.algorithm_manager.get_process_count(alg, self.number_of_cores))
+                for alg in self.algorithm_manager.algorithms]
+
+    def add_result(self, key, result):
+        print(f"received result {key} {result}")
+        result.scenario = self.scenario
+        self.results[key] = result
+        return []
+
+    def get_results(self):
+        return self.results
+
+    def release(self):
+        for handle in self.handles:
+            registry_pkg.release_scenario(handle)
+        self.handles = []
 
 
 class AbstractAlgorithmManager(abc.ABC):
     default_algorithms = []
+    scenario_execution_class = ScenarioExecution
+    # solver backend used by the MIP and LP based algorithms unless an algorithm sets the property "backend"
+    solver_backend = None
+    # output and thread parameters of the solver environment of each process (None keeps the solver's default)
+    solver_output = None
+    solver_threads = None
+    # the scenario attached last by a worker process, which is detached when the worker moves on
+    attached_handle = None
 
     def __init__(self):
         self.algorithms = []
-        self.algorithm_partition = None
 
     def add_algorithm(self, algorithm_key, properties=None):
         algorithm = AlgorithmIdentifier(algorithm_key, properties)
@@ -105,55 +173,89 @@ class AbstractAlgorithmManager(abc.ABC):
             alg_mgr.add_algorithm(*alg)
         return alg_mgr
 
-    @abc.abstractmethod
-    def execute_algorithms_in_parallel(self, scenario, max_number_of_processes, *args):
-        ...
+    def execute_scenarios_in_pool(self, scenarios, number_of_cores, *args):
+        """ executes the algorithms on the scenarios, given as (key, scenario) pairs, in one pool of persistent worker
+            processes and yields (key, results) whenever all tasks of a scenario are done.
+
+            Scenarios are taken up as long as fewer than two tasks per core are waiting, so that the tasks of the next
+            scenarios fill the cores while the last tasks of the previous ones are still running.
+        """
+        scenarios = iter(scenarios)
+        executions = {}
+        outstanding = {}
+        execution_ids = itertools.count()
+
+        with process_pool_pkg.ProcessPoolScheduler(self, number_of_cores) as scheduler:
+
+            def submit(execution_id, tasks):
+                for (key, method_name, arguments, process_count) in tasks:
+                    scheduler.submit((execution_id, key), method_name, arguments, process_count)
+                outstanding[execution_id] += len(tasks)
+
+            def take_up_scenarios():
+                finished = []
+                while len(scheduler.pending) < 2 * number_of_cores:
+                    scenario_key, scenario = next(scenarios, (None, None))
+                    if scenario is None:
+                        break
+                    execution_id = next(execution_ids)
+                    executions[execution_id] = (scenario_key, self.scenario_execution_class(self, scenario, number_of_cores, *args))
+                    outstanding[execution_id] = 0
+                    submit(execution_id, executions[execution_id][1].get_tasks())
+                    if outstanding[execution_id] == 0:
+                        finished.append(execution_id)
+                return finished
+
+            def finish(execution_id):
+                scenario_key, execution = executions.pop(execution_id)
+                del outstanding[execution_id]
+                execution.release()
+                return scenario_key, execution.get_results()
+
+            for execution_id in take_up_scenarios():
+                yield finish(execution_id)
+            for (execution_id, key), result in scheduler.get_results():
+                outstanding[execution_id] -= 1
+                submit(execution_id, executions[execution_id][1].add_result(key, result))
+                if outstanding[execution_id] == 0:
+                    yield finish(execution_id)
+                for finished_id in take_up_scenarios():
+                    yield finish(finished_id)
+
+    def attach(self, scenario_handle):
+        """ attaches the scenario in a worker process, detaching the one of the previous task """
+        if self.attached_handle is not None and self.attached_handle.scenario_id != scenario_handle.scenario_id:
+            registry_pkg.detach_scenario(self.attached_handle)
+        start_time = time.perf_counter()
+        scenario = registry_pkg.attach_scenario(scenario_handle)
+        self.attached_handle = scenario_handle
+        backends_pkg.configure_environments(output=self.solver_output, threads=self.solver_threads)
+        return scenario, time.perf_counter() - start_time
+
+    def execute_algorithm(self, scenario_handle, algorithm, *extra_parameters):
+        scenario, attach_time = self.attach(scenario_handle)
+        print(f"{algorithm} attached to {scenario_handle} in {attach_time:.6f}s"
+              f" (saving the setup of {scenario_handle.setup_time:.4f}s)")
 
-    def execute_algorithm_multiprocess(self, scenario, algorithm, result_queue, *extra_parameters):
         alg = self.create_algorithm(scenario, algorithm, *extra_parameters)
         result = alg.run()
-        result_queue.put([algorithm, result])
+        if result is not None:
+            # the parent process re-attaches its own scenario; don't send it back through the queue
+            result.scenario = None
+        return result
 
     @abc.abstractmethod
     def create_algorithm(self, scenario, algorithm, *extra_parameters):
         ...
 
-    def get_algorithm_partition(self, max_number_parallel_processes):
-        result = []
-
-        process_count_to_alg = {}
-        for alg in self.algorithms:
-            process_count = 1
-            if alg.key == AlgorithmType.GREEDY_SINGLE or alg.key == AlgorithmType.GREEDY_PARALLEL:
-                if alg.key == AlgorithmType.GREEDY_PARALLEL:
-                    process_count = alg.properties["processes"]
-            if process_count not in process_count_to_alg:
-                process_count_to_alg[process_count] = []
-            process_count_to_alg[process_count].append(alg)
-
-        process_counts = sorted(process_count_to_alg.keys(), reverse=True)
-
-        while len(process_counts) > 0:
-
-            available_count = max_number_parallel_processes
-            partition = []
-            print("starting a new partition")
-            print(f"remaining elements are {process_count_to_alg} ")
-
-            for i in process_counts:
-                while available_count >= i and i in process_count_to_alg and len(process_count_to_alg[i]) > 0:
-                    available_count -= i
-                    partition.append(process_count_to_alg[i][0])
-                    print(f"\tadding {process_count_to_alg[i][0]} to partition obtaining {partition}")
-                    process_count_to_alg[i] = process_count_to_alg[i][1:]
-                    if len(process_count_to_alg[i]) == 0:
-                        del process_count_to_alg[i]
-                    print(f"\tnew remaining algorithms {process_count_to_alg}")
-
-            result.append(partition)
-            process_counts = sorted(process_count_to_alg.keys(), reverse=True)
+    def get_solver_backend(self, algorithm):
+        return algorithm.get_property("backend", self.solver_backend)
 
-        return result
+    def get_process_count(self, algorithm, number_of_cores):
+        """ returns the number of cores the algorithm occupies """
+        if algorithm.key == AlgorithmType.GREEDY_PARALLEL:
+            return algorithm.properties["processes"]
+        return 1
 
 
 class AbstractExperimentManager(abc.ABC):
@@ -173,7 +275,85 @@ class AbstractExperimentManager(abc.ABC):
 
         self.algorithm_manager = self.algorithm_manager_class.get_standard_algorithm_manager()
 
-        random.seed(1337)
+        random.seed(SCENARIO_SEED)
+
+    def generate_scenarios(self, number_of_cores=1):
+        """ generates the scenarios of all groups (prob, cap_factor, substrate_name, repetition), using number_of_cores
+            processes. Each group draws from its own random generator seeded by the group's key, so the scenarios
+            (including their ids) are the same for any number of cores.
+        """
+        groups = self.get_scenario_groups()
+        number_of_scenarios = len(groups) * len(self.max_deviation)
+        pool = None
+        if number_of_cores > 1:
+            pool = multiprocessing.Pool(number_of_cores, initializer=_initialize_generation, initargs=(self,))
+            generated_groups = pool.imap(_generate_scenario_group, groups)
+        else:
+            generated_groups = (self.generate_scenario_group(group, get_group_random(group)) for group in groups)
+
+        try:
+            for group_index, (group, generated_group) in enumerate(zip(groups, generated_groups)):
+                prob, cap_factor, substrate_name, repetition = group
+                # the processes of the pool return copies of the node names; the substrate's own ones are used instead,
+                # so that the pickled scenarios are the same as the ones of a serial run
+                nodes = {node: node for node in self.get_substrate(substrate_name).nodes}
+                for deviation_index, (deviation, requests, middleboxes) in enumerate(generated_group):
+                    for req in requests:
+                        req.tail = nodes[req.tail]
+                        req.head = nodes[req.head]
+                    middleboxes = {nodes[u]: capacity for u, capacity in middleboxes.items()}
+                    scenario_id = group_index * len(self.max_deviation) + deviation_index
+                    if scenario_id > 0 and scenario_id % 100 == 0:
+                        print(f"Having created {scenario_id} of {number_of_scenarios} many scenarios")
+                    key = (prob, deviation, cap_factor, substrate_name, repetition)
+                    self.scenario_keys.append(key)
+                    self.scenarios[key] = self.create_scenario(scenario_id, substrate_name, requests, middleboxes)
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+
+    def get_scenario_groups(self):
+        return [(prob, cap_factor, substrate_name, repetition)
+                for prob, cap_factor, substrate_name, repetition in itertools.product(self.probability_for_pair,
+                                                                                      self.capacity_factor,
+                                                                                      self.get_substrate_names(),
+                                                                                      range(self.number_of_repetitions))
+                if self.substrate_filter is None or substrate_name in self.substrate_filter]
+
+    @abc.abstractmethod
+    def get_substrate_names(self):
+        ...
+
+    @abc.abstractmethod
+    def get_substrate(self, substrate_name):
+        ...
+
+    @abc.abstractmethod
+    def generate_scenario_group(self, group, rng):
+        """ returns the requests and middleboxes of the group's scenarios as (deviation, requests, middleboxes) """
+        ...
+
+    def create_scenario(self, scenario_id, substrate_name, requests, middleboxes):
+        return scen_pkg.Scenario(scenario_id, self.get_substrate(substrate_name), requests, middleboxes)
+
+
+def get_group_random(group):
+    return random.Random(repr((SCENARIO_SEED,) + tuple(group)))
+
+
+# the experiment manager of a scenario generating process; it is set once per process of the pool, so that the
+# substrates are not sent along with every group
+_generating_manager = None
+
+
+def _initialize_generation(experiment_manager):
+    global _generating_manager
+    _generating_manager = experiment_manager
+
+
+def _generate_scenario_group(group):
+    return _generating_manager.generate_scenario_group(group, get_group_random(group))
 
 
 def unpickle_experiment_manager(path):
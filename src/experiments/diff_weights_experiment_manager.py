@@ -22,18 +22,17 @@
 
 __author__ = "Matthias Rost, Alexander Elvers (mrost / aelvers <AT> inet.tu-berlin.de)"
 
-import copy
 import gc
-import itertools
-import multiprocessing
-import random
 
 from algorithms import (
+    fractional_coverage_flow as flow_pkg,
     greedy_diff_weights as greedy_pkg,
+    greedy_diff_weights_parallel as greedy_parallel_pkg,
+    greedy_diff_weights_pricing as greedy_pricing_pkg,
+    mip_model_builder as builder_pkg,
     optimal_mip_diff_weights as mip_pkg,
 )
 from datamodel import (
-    scenario as scen_pkg,
     requests as req_pkg,
     sndlib_reader as sndlib_pkg,
 )
@@ -45,42 +44,27 @@ class AlgorithmManager(aem_pkg.AbstractAlgorithmManager):
         ("MIP",),
         ("GREEDY_SINGLE",),
     ]
-
-    def execute_algorithms_in_parallel(self, scenario, max_number_of_processes):
-        results = {}
-        result_queue = multiprocessing.Queue()
-
-        if self.algorithm_partition is None:
-            self.algorithm_partition = self.get_algorithm_partition(max_number_parallel_processes=max_number_of_processes)
-        requests_copy = copy.deepcopy(scenario.requests)
-
-        for alg_list in self.algorithm_partition:
-
-            processes = {}
-            for alg in alg_list:
-                process = multiprocessing.Process(target=self.execute_algorithm_multiprocess, args=(scenario, alg, result_queue))
-                print(f"starting {alg} .. ")
-                process.start()
-                processes[alg] = process
-            for i in range(len(alg_list)):
-                encapsulated_result = result_queue.get()
-                print(f"received result {encapsulated_result}")
-                encapsulated_result[1].scenario = scenario
-                simple_result = encapsulated_result[1]
-
-                results[encapsulated_result[0]] = simple_result
-                processes[encapsulated_result[0]].join()
-                print(f"process of algorithm {encapsulated_result[0]} is terminated / {len(alg_list)-(i+1)} of {len(alg_list)} outstanding to terminate")
-
-        return results
+    # the pricing variant of the greedy is not run by default; it is selected via
+    # add_algorithm("GREEDY_PRICING", {"candidates": ...})
 
     def create_algorithm(self, scenario, algorithm):
         if algorithm.key == aem_pkg.AlgorithmType.MIP:
-            return mip_pkg.ExactDeploymentMIP_diff_weights (scenario)
+            return mip_pkg.ExactDeploymentMIP_diff_weights(scenario,
+                                                           backend=self.get_solver_backend(algorithm),
+                                                           linking=algorithm.get_property("linking", builder_pkg.LINKING_DISAGGREGATED))
         elif algorithm.key == aem_pkg.AlgorithmType.GREEDY_SINGLE:
-            return greedy_pkg.Greedy_diff_weights(scenario)
+            return greedy_pkg.Greedy_diff_weights(scenario,
+                                                  backend=self.get_solver_backend(algorithm),
+                                                  evaluator=algorithm.get_property("evaluator", greedy_pkg.EVALUATOR_LP))
+        elif algorithm.key == aem_pkg.AlgorithmType.GREEDY_PRICING:
+            return greedy_pricing_pkg.Greedy_diff_weights_pricing(scenario,
+                                                                  number_of_candidates=algorithm.get_property("candidates", 3),
+                                                                  backend=self.get_solver_backend(algorithm))
         elif algorithm.key == aem_pkg.AlgorithmType.GREEDY_PARALLEL:
-            raise Exception("Cannot handle this!")
+            # the worker processes are accounted for by get_process_count via the property "processes"
+            return greedy_parallel_pkg.Greedy_diff_weights_parallel(scenario,
+                                                                    number_of_processes=algorithm.properties["processes"],
+                                                                    backend=self.get_solver_backend(algorithm))
         else:
             raise Exception("I don't know this type of algorithm.")
 
@@ -89,92 +73,78 @@ class DiffWeightsExperimentManager(aem_pkg.AbstractExperimentManager):
     algorithm_manager_class = AlgorithmManager
 
 
-    def construct_scenarios(self, test_scenarios_a_priori=True):
-        counter = 0
+    def construct_scenarios(self, test_scenarios_a_priori=True, number_of_cores=1):
         print(self.probability_for_pair)
         print(self.capacity_factor)
         print(self.number_of_repetitions)
         print(self.max_deviation)
 
-
-        prototypical_scenarios = {}
+        self.prototypical_scenarios = {}
         for substrate_name in self.substrate_filter:
             scenario = sndlib_pkg.create_scenario_from_sndlib_instance(substrate_name)
-            prototypical_scenarios[substrate_name] = scenario
+            self.prototypical_scenarios[substrate_name] = scenario
 
-        for prob, cap_factor, substrate_name, repetition in itertools.product(self.probability_for_pair,
-                                                                self.capacity_factor,
-                                                                self.substrate_filter,
-                                                                range(self.number_of_repetitions)):
+        self.generate_scenarios(number_of_cores)
 
-            prototypical_scenario = prototypical_scenarios[substrate_name]
-            substrate = prototypical_scenario.substrate
+    def get_substrate_names(self):
+        return self.substrate_filter
 
-            print(f"\n\n\n\n\nstarting to generate {prob} {cap_factor} {substrate_name} {repetition}\n\n\n\n\n")
+    def get_substrate(self, substrate_name):
+        return self.prototypical_scenarios[substrate_name].substrate
 
-            while True:
+    def generate_scenario_group(self, group, rng):
+        """ draws the demands anew until the scenario of the first deviation is coverable """
+        prob, cap_factor, substrate_name, repetition = group
+        prototypical_scenario = self.prototypical_scenarios[substrate_name]
+        substrate = prototypical_scenario.substrate
+        # the nodes are sorted, so that the scenarios do not depend on the hash seed of the generating process
+        nodes = sorted(substrate.nodes)
 
-                #print substrate_name
-                pairs = []
+        print(f"\n\n\n\n\nstarting to generate {prob} {cap_factor} {substrate_name} {repetition}\n\n\n\n\n")
 
-                handled_nodes = []
-                for req in prototypical_scenario.requests:
-                    if random.random() <= prob:
-                        pairs.append((req.tail, req.head, req.capacity))
+        while True:
 
+            pairs = []
 
-                print(pairs)
+            for req in prototypical_scenario.requests:
+                if rng.random() <= prob:
+                    pairs.append((req.tail, req.head, req.capacity))
 
-                successful_generation = False
+            print(pairs)
 
-                for deviation in self.max_deviation:
+            successful_generation = False
+            generated = []
 
-                    if counter > 0 and counter % 100 == 0:
-                        if self.substrate_filter is not None:
-                            print(f"Having created {counter} of {len(self.max_deviation) * len(self.capacity_factor) * len(self.probability_for_pair)*len(self.substrate_filter)*self.number_of_repetitions} many scenarios")
-                        else:
-                            print(f"Having created {counter} of {len(self.max_deviation) * len(self.capacity_factor) * len(self.probability_for_pair)*len(self.suitable_substrates.names)*self.number_of_repetitions} many scenarios")
+            for deviation in self.max_deviation:
 
+                number_of_nodes = substrate.get_number_of_nodes()
 
-                    number_of_nodes = substrate.get_number_of_nodes()
+                requests = []
 
-                    requests = []
+                cum_capacity = 0.0
+                md_lb, md_ub = deviation, deviation
+                for (u,v, cap) in pairs:
+                    req = req_pkg.Request(u, v, rng.uniform(md_lb, md_ub), capacity=cap)
+                    requests.append(req)
 
-                    cum_capacity = 0.0
-                    md_lb, md_ub = deviation, deviation
-                    for (u,v, cap) in pairs:
-                        req = req_pkg.Request(u, v, random.uniform(md_lb, md_ub), capacity=cap)
-                        requests.append(req)
+                    cum_capacity += cap
 
-                        cum_capacity += cap
+                capacity = 4 * cum_capacity / number_of_nodes
 
-                    capacity = 4 * cum_capacity / number_of_nodes
+                middleboxes = {}
+                for u in nodes:
+                    middleboxes[u] = capacity
 
+                if deviation == self.max_deviation[0]:
+                    if flow_pkg.is_coverable(self.create_scenario(None, substrate_name, requests, middleboxes)):
+                        successful_generation = True
+                    else:
+                        break
 
-                    middleboxes = {}
-                    for u in substrate.nodes:
-                        middleboxes[u] = capacity
+                generated.append((deviation, requests, middleboxes))
 
-                    scenario =  scen_pkg.Scenario(counter, substrate, requests, middleboxes)
-
-                    #util_pkg.prettyPrint(scenario)
-
-                    if deviation == self.max_deviation[0]:
-                        mip = mip_pkg.ExactDeploymentMIP_diff_weights(scenario, mip_gap=1.0)
-                        result = mip.run()
-                        if result is not None:
-                            successful_generation = True
-                        else:
-                            break
-
-
-                    self.scenario_keys.append((prob, deviation, cap_factor, substrate_name, repetition))
-                    self.scenarios[(prob,deviation,cap_factor,substrate_name,repetition)] = scenario
-
-                    counter += 1
-
-                if successful_generation:
-                    break
+            if successful_generation:
+                return generated
 
     def create_scenario_partition(self, number_of_servers):
         scenarios_of_server = {}
@@ -206,11 +176,9 @@ class DiffWeightsExperimentManager(aem_pkg.AbstractExperimentManager):
         else:
             scenario_keys = scenario_key_overwrite
         counter = 1
-        for scenario_key in scenario_keys:
-            print(f"\n\nEXPERIMENT_MANAGER: Starting experiments for scenario {counter} of {len(scenario_keys)}\n\n")
-            scen_results = self.algorithm_manager.execute_algorithms_in_parallel(self.scenarios[scenario_key],
-                                                                                 max_number_of_processes=number_of_cores)
-
+        scenarios = ((scenario_key, self.scenarios[scenario_key]) for scenario_key in scenario_keys)
+        for scenario_key, scen_results in self.algorithm_manager.execute_scenarios_in_pool(scenarios, number_of_cores):
+            print(f"\n\nEXPERIMENT_MANAGER: Finished experiments for scenario {counter} of {len(scenario_keys)}\n\n")
             self.scenario_solutions[scenario_key] = scen_results
 
             counter += 1
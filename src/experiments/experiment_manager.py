@@ -23,20 +23,21 @@
 __author__ = "Matthias Rost, Alexander Elvers (mrost / aelvers <AT> inet.tu-berlin.de)"
 
 import gc
-import itertools
 import math
-import multiprocessing
-import random
 import sys
 
 from algorithms import (
     greedy_matching as greedy_pkg,
     greedy_matching_parallel as greedy_pkg_parallel,
+    lagrangian_relaxation as lagrangian_pkg,
+    lp_rounding as rounding_pkg,
+    mip_model_builder as builder_pkg,
+    model_cache as cache_pkg,
     optimal_mip as mip_pkg,
+    solver_backends as backends_pkg,
 )
 from datamodel import (
     suitable_substrates as ss_pkg,
-    scenario as scen_pkg,
     requests as req_pkg,
 )
 from experiments import abstract_experiment_manager as aem_pkg
@@ -51,78 +52,35 @@ class AlgorithmManager(aem_pkg.AbstractAlgorithmManager):
         ("GREEDY_PARALLEL", {"processes": 8}),
     ]
 
-    def execute_algorithms_in_parallel(self, scenario, max_number_of_processes):
-        results = {}
-        result_queue = multiprocessing.Queue()
-
-        if self.algorithm_partition is None:
-            self.algorithm_partition = self.get_algorithm_partition(max_number_parallel_processes=max_number_of_processes)
-        for alg_list in self.algorithm_partition:
-            processes = {}
-            for alg in alg_list:
-                process = multiprocessing.Process(target=self.execute_algorithm_multiprocess, args=(scenario, alg, result_queue))
-                print(f"starting {alg} .. ")
-                process.start()
-                processes[alg] = process
-            for i in range(len(alg_list)):
-                encapsulated_result = result_queue.get()
-                print(f"received result {encapsulated_result}")
-                encapsulated_result[1].scenario = scenario
-                results[encapsulated_result[0]] = encapsulated_result[1]
-                processes[encapsulated_result[0]].join()
-                print(f"process of algorithm {encapsulated_result[0]} is terminated / {len(alg_list)-(i+1)} of {len(alg_list)} outstanding to terminate")
-
-        return results
-
     def create_algorithm(self, scenario, algorithm):
         if algorithm.key == aem_pkg.AlgorithmType.MIP:
-            return mip_pkg.ExactDeploymentMIP(scenario)
+            return mip_pkg.ExactDeploymentMIP(scenario,
+                                              backend=self.get_solver_backend(algorithm),
+                                              greedy_start=algorithm.get_property("greedy_start", False),
+                                              linking=algorithm.get_property("linking", builder_pkg.LINKING_DISAGGREGATED),
+                                              model_cache=cache_pkg.ModelCache(algorithm.get_property("model_cache"))
+                                              if algorithm.get_property("model_cache") is not None else None)
         elif algorithm.key == aem_pkg.AlgorithmType.GREEDY_SINGLE:
             return greedy_pkg.GreedyMatching(scenario)
         elif algorithm.key == aem_pkg.AlgorithmType.GREEDY_PARALLEL:
             return greedy_pkg_parallel.GreedyMatchingMaster(scenario, number_of_processes=algorithm.properties["processes"])
+        elif algorithm.key == aem_pkg.AlgorithmType.LP_ROUNDING:
+            return rounding_pkg.LPRoundingDeployment(scenario,
+                                                     backend=self.get_solver_backend(algorithm),
+                                                     number_of_roundings=algorithm.get_property("roundings", 256),
+                                                     rounding=algorithm.get_property("rounding", rounding_pkg.ROUNDING_DEPENDENT))
+        elif algorithm.key == aem_pkg.AlgorithmType.LAGRANGIAN:
+            return lagrangian_pkg.LagrangianDeployment(scenario,
+                                                       max_iterations=algorithm.get_property("iterations", 300),
+                                                       heuristic_interval=algorithm.get_property("heuristic_interval", 10))
         else:
             raise Exception("I don't know this type of algorithm.")
 
-    def get_algorithm_partition(self, max_number_parallel_processes):
-        result = []
-
-        process_count_to_alg = {}
-        for alg in self.algorithms:
-            process_count = 1
-            if alg.key == aem_pkg.AlgorithmType.MIP:
-                result.append([alg])
-            elif alg.key == aem_pkg.AlgorithmType.GREEDY_SINGLE or alg.key == aem_pkg.AlgorithmType.GREEDY_PARALLEL:
-                if alg.key == aem_pkg.AlgorithmType.GREEDY_PARALLEL:
-                    process_count = alg.properties["processes"]
-                if process_count not in process_count_to_alg:
-                    process_count_to_alg[process_count] = []
-                process_count_to_alg[process_count].append(alg)
-
-
-        process_counts = sorted(process_count_to_alg.keys(), reverse=True)
-
-        while len(process_counts) > 0:
-
-            available_count = max_number_parallel_processes
-            partition = []
-            print("starting a new partition")
-            print(f"remaining elements are {process_count_to_alg} ")
-
-            for i in process_counts:
-                while available_count >= i and i in process_count_to_alg and len(process_count_to_alg[i]) > 0:
-                    available_count -= i
-                    partition.append(process_count_to_alg[i][0])
-                    print(f"\tadding {process_count_to_alg[i][0]} to partition obtaining {partition}")
-                    process_count_to_alg[i] = process_count_to_alg[i][1:]
-                    if len(process_count_to_alg[i]) == 0:
-                        del process_count_to_alg[i]
-                    print(f"\tnew remaining algorithms {process_count_to_alg}")
-
-            result.append(partition)
-            process_counts = sorted(process_count_to_alg.keys(), reverse=True)
-
-        return result
+    def get_process_count(self, algorithm, number_of_cores):
+        if algorithm.key == aem_pkg.AlgorithmType.MIP and self.get_solver_backend(algorithm) != backends_pkg.HIGHS:
+            # gurobi uses all cores (and a license seat), so it runs on its own
+            return number_of_cores
+        return super().get_process_count(algorithm, number_of_cores)
 
 
 class ExperimentManager(aem_pkg.AbstractExperimentManager):
@@ -133,72 +91,60 @@ class ExperimentManager(aem_pkg.AbstractExperimentManager):
         self.suitable_substrates = ss_pkg.unpickle_pruned_suitable_substrates()
 
 
-    def construct_scenarios(self):
-        counter = 0
+    def construct_scenarios(self, number_of_cores=1):
         print(self.probability_for_pair)
         print(self.capacity_factor)
         print(self.suitable_substrates)
         print(self.number_of_repetitions)
         print(self.max_deviation)
 
-        for prob, cap_factor, substrate_name, repetition in itertools.product(self.probability_for_pair,
-                                                                self.capacity_factor,
-                                                                self.suitable_substrates.names,
-                                                                range(self.number_of_repetitions)):
-
-            #print self.substrate_filter
-            if self.substrate_filter is not None and substrate_name not in self.substrate_filter:
-                continue
-            substrate = self.suitable_substrates.substrates[substrate_name]
-            #print substrate_name
-            pairs = []
-
-            handled_nodes = []
-            for u in substrate.nodes:
-                handled_nodes.append(u)
-                for v in substrate.nodes:
-                    if v in handled_nodes:
-                        continue
-                    if random.random() <= prob:
-                        pairs.append((u,v))
-                        #req = req_pkg.Request(u, v, random.uniform(md_lb, md_ub), capacity=1)
-                        #requests.append(req)
-
-            for deviation in self.max_deviation:
-
-                self.scenario_keys.append((prob, deviation, cap_factor, substrate_name, repetition))
+        self.generate_scenarios(number_of_cores)
 
-                if counter > 0 and counter % 100 == 0:
-                    if self.substrate_filter is not None:
-                        print(f"Having created {counter} of {len(self.max_deviation) * len(self.capacity_factor) * len(self.probability_for_pair)*len(self.substrate_filter)*self.number_of_repetitions} many scenarios")
-                    else:
-                        print(f"Having created {counter} of {len(self.max_deviation) * len(self.capacity_factor) * len(self.probability_for_pair)*len(self.suitable_substrates.names)*self.number_of_repetitions} many scenarios")
+    def get_substrate_names(self):
+        return self.suitable_substrates.names
 
+    def get_substrate(self, substrate_name):
+        return self.suitable_substrates.substrates[substrate_name]
 
-                number_of_nodes = substrate.get_number_of_nodes()
+    def generate_scenario_group(self, group, rng):
+        prob, cap_factor, substrate_name, repetition = group
+        substrate = self.get_substrate(substrate_name)
+        # the nodes are sorted, so that the scenarios do not depend on the hash seed of the generating process
+        nodes = sorted(substrate.nodes)
 
-                capacity = math.ceil((number_of_nodes - 1) * 2 * prob
-                                     + (number_of_nodes * number_of_nodes - 2 * number_of_nodes - 1) / 2 * prob * cap_factor)
+        pairs = []
 
-                requests = []
+        handled_nodes = []
+        for u in nodes:
+            handled_nodes.append(u)
+            for v in nodes:
+                if v in handled_nodes:
+                    continue
+                if rng.random() <= prob:
+                    pairs.append((u,v))
 
+        generated = []
+        for deviation in self.max_deviation:
 
+            number_of_nodes = substrate.get_number_of_nodes()
 
-                md_lb, md_ub = deviation, deviation
-                for (u,v) in pairs:
-                    req = req_pkg.Request(u, v, random.uniform(md_lb, md_ub), capacity=1)
-                    requests.append(req)
+            capacity = math.ceil((number_of_nodes - 1) * 2 * prob
+                                 + (number_of_nodes * number_of_nodes - 2 * number_of_nodes - 1) / 2 * prob * cap_factor)
 
+            requests = []
 
-                middleboxes = {}
-                for u in substrate.nodes:
-                    middleboxes[u] = capacity
+            md_lb, md_ub = deviation, deviation
+            for (u,v) in pairs:
+                req = req_pkg.Request(u, v, rng.uniform(md_lb, md_ub), capacity=1)
+                requests.append(req)
 
-                scenario =  scen_pkg.Scenario(counter, substrate, requests, middleboxes)
+            middleboxes = {}
+            for u in nodes:
+                middleboxes[u] = capacity
 
-                self.scenarios[(prob,deviation,cap_factor,substrate_name,repetition)] = scenario
+            generated.append((deviation, requests, middleboxes))
 
-                counter += 1
+        return generated
 
     def create_scenario_partition(self, number_of_servers):
         scenarios_of_server = {}
@@ -218,9 +164,9 @@ class ExperimentManager(aem_pkg.AbstractExperimentManager):
             scenario_keys = self.create_scenario_partition(number_of_servers=number_of_servers)[server_number]
 
         counter = 1
-        for scenario_key in scenario_keys:
-            print(f"\n\nEXPERIMENT_MANAGER: Starting experiments for scenario {counter} of {len(scenario_keys)}\n\n")
-            scen_results = self.algorithm_manager.execute_algorithms_in_parallel(self.scenarios[scenario_key], max_number_of_processes=number_of_cores)
+        scenarios = ((scenario_key, self.scenarios[scenario_key]) for scenario_key in scenario_keys)
+        for scenario_key, scen_results in self.algorithm_manager.execute_scenarios_in_pool(scenarios, number_of_cores):
+            print(f"\n\nEXPERIMENT_MANAGER: Finished experiments for scenario {counter} of {len(scenario_keys)}\n\n")
             self.scenario_solutions[scenario_key] = scen_results
             counter += 1
             gc.collect()
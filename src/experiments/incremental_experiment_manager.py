@@ -22,18 +22,15 @@
 
 __author__ = "Matthias Rost, Alexander Elvers (mrost / aelvers <AT> inet.tu-berlin.de)"
 
-import copy
 import gc
-import itertools
 import math
-import multiprocessing
-import random
 import sys
+import time
 
 from algorithms import (
+    fractional_coverage_flow as flow_pkg,
     incremental_greedy_matching as greedy_pkg,
     incremental_optimal_mip as mip_pkg,
-    optimal_mip as std_mip_pkg,
     abstract_algorithm as aa_pkg,
 )
 from datamodel import (
@@ -44,68 +41,146 @@ from datamodel import (
 from experiments import abstract_experiment_manager as aem_pkg
 
 
-class AlgorithmManager(aem_pkg.AbstractAlgorithmManager):
-    default_algorithms = [
-        ("MIP",),
-        ("GREEDY_SINGLE",),
-    ]
-
-    def execute_algorithms_in_parallel(self, scenario, max_number_of_processes, probing_points):
-        results = {}
-        result_queue = multiprocessing.Queue()
+# key of the task computing the baselines of a scenario
+BASELINES = "BASELINES"
 
-        if self.algorithm_partition is None:
-            self.algorithm_partition = self.get_algorithm_partition(max_number_parallel_processes=max_number_of_processes)
-        requests_copy = copy.deepcopy(scenario.requests)
-        for probing_point in probing_points:
 
-            print(f"computing result for probing point {probing_point}..")
+class ScenarioExecution(aem_pkg.ScenarioExecution):
+    """ computes the baselines of the scenario (unless they are cached) in a first task and then executes the
+        algorithms at each probing point, starting from the respective baseline
+    """
 
-            results[probing_point] = {}
+    def __init__(self, algorithm_manager, scenario, number_of_cores, probing_points):
+        super().__init__(algorithm_manager, scenario, number_of_cores)
+        self.boundaries = {}
+        for probing_point in probing_points:
+            boundary = int(math.ceil(probing_point*len(scenario.requests)))
+            if boundary == len(scenario.requests):
+                boundary -= 1
+            self.boundaries[probing_point] = boundary
+        self.results = {probing_point: {} for probing_point in probing_points}
+        self.base_handle = None
+        self.baselines = None
+
+    def get_tasks(self):
+        # the matching graphs of the prefixes are derived from the one of the published scenario in the workers
+        self.base_handle = self.publish(self.scenario)
+        boundaries = sorted(set(self.boundaries.values()))
+        baselines = self.algorithm_manager.get_cached_baselines(self.scenario, boundaries)
+        if baselines is None:
+            return [(BASELINES, "execute_baselines", (self.base_handle, boundaries), 1)]
+        return self.get_algorithm_tasks(baselines)
+
+    def get_algorithm_tasks(self, baselines):
+        self.baselines = baselines
+        tasks = []
+        for probing_point, boundary in self.boundaries.items():
+            _, matching_edges = baselines[boundary]
+            for alg in self.algorithm_manager.algorithms:
+                tasks.append(((probing_point, alg), "execute_algorithm_on_prefix",
+                              (self.base_handle, boundary, alg, matching_edges),
+                              self.algorithm_manager.get_process_count(alg, self.number_of_cores)))
+        return tasks
+
+    def add_result(self, key, result):
+        if key == BASELINES:
+            self.algorithm_manager.store_baselines(self.scenario, result)
+            return self.get_algorithm_tasks(result)
+
+        print(f"received result {key} {result}")
+        probing_point, alg = key
+        active_mbs, matching_edges = self.baselines[self.boundaries[probing_point]]
+        self.results[probing_point][alg] = aa_pkg.IncrementalAlgorithmResult(alg_name=result.alg_name,
+                                                                            scenario=self.scenario,
+                                                                            probing_point=probing_point,
+                                                                            active_mbs_before=active_mbs,
+                                                                            active_mbs_after=result.active_mbs,
+                                                                            matching_edges_before=matching_edges,
+                                                                            matching_edges_after=result.matching_edges,
+                                                                            runtime_with_init=result.runtime_with_init,
+                                                                            runtime_without_init=result.runtime_without_init,
+                                                                            extra_information=result.extra_information)
+        return []
 
 
-            boundary = int(math.ceil(probing_point*len(requests_copy)))
-            if boundary == len(requests_copy):
-                boundary -= 1
-            scenario.requests = requests_copy[0:boundary]
-            new_cp = requests_copy[boundary]
-            mip_alg = std_mip_pkg.ExactDeploymentMIP(scenario)
-            matching_graph = mip_alg._run()
-            matching_edges = matching_graph.edge_in_matching
-
-            for alg_list in self.algorithm_partition:
-
-                processes = {}
-                for alg in alg_list:
-                    process = multiprocessing.Process(target=self.execute_algorithm_multiprocess, args=(scenario, alg, result_queue, new_cp, matching_edges))
-                    print(f"starting {alg} .. ")
-                    process.start()
-                    processes[alg] = process
-                for i in range(len(alg_list)):
-                    encapsulated_result = result_queue.get()
-                    print(f"received result {encapsulated_result}")
-                    encapsulated_result[1].scenario = scenario
-                    simple_result = encapsulated_result[1]
-
-                    incremental_result = aa_pkg.IncrementalAlgorithmResult(alg_name=simple_result.alg_name,
-                                                                           scenario=scenario,
-                                                                           probing_point=probing_point,
-                                                                           active_mbs_before=matching_graph.active_mbs,
-                                                                           active_mbs_after=simple_result.active_mbs,
-                                                                           matching_edges_before=matching_graph.edge_in_matching,
-                                                                           matching_edges_after=simple_result.matching_edges,
-                                                                           runtime_with_init=simple_result.runtime_with_init,
-                                                                           runtime_without_init=simple_result.runtime_without_init,
-                                                                           extra_information=simple_result.extra_information)
-
-                    results[probing_point][encapsulated_result[0]] = incremental_result
-                    processes[encapsulated_result[0]].join()
-                    print(f"process of algorithm {encapsulated_result[0]} is terminated / {len(alg_list)-(i+1)} of {len(alg_list)} outstanding to terminate")
-        return results
+class AlgorithmManager(aem_pkg.AbstractAlgorithmManager):
+    default_algorithms = [
+        ("MIP",),
+        ("GREEDY_SINGLE",),
+    ]
+    scenario_execution_class = ScenarioExecution
+    # optimal deployments of request prefixes keyed by scenario fingerprint, prefix length and solver backend; kept
+    # with the pickled experiment manager, so that reruns and additional algorithms reuse them
+    baseline_solutions = None
+
+    def get_baseline_keys(self, scenario, boundaries):
+        fingerprint = scenario.get_fingerprint()
+        return {boundary: (fingerprint, boundary, self.solver_backend) for boundary in boundaries}
+
+    def get_cached_baselines(self, scenario, boundaries):
+        """ returns the baselines of the given prefix lengths if all of them are cached and None otherwise """
+        if self.baseline_solutions is None:
+            return None
+        keys = self.get_baseline_keys(scenario, boundaries)
+        if any(key not in self.baseline_solutions for key in keys.values()):
+            return None
+        return {boundary: self.baseline_solutions[key] for boundary, key in keys.items()}
+
+    def store_baselines(self, scenario, baselines):
+        if self.baseline_solutions is None:
+            self.baseline_solutions = {}
+        for boundary, key in self.get_baseline_keys(scenario, baselines.keys()).items():
+            self.baseline_solutions[key] = baselines[boundary]
+
+    def compute_baselines(self, scenario, boundaries):
+        """ returns the optimal deployments (active middleboxes and matching edges) of the prefixes of the scenario's
+            requests of the given lengths. The missing ones are computed in one warm-started chain: the requests are
+            added to a PersistentDeploymentMIP in order and it is solved at every boundary, starting from the
+            previous prefix's optimum.
+        """
+        if self.baseline_solutions is None:
+            self.baseline_solutions = {}
+        keys = self.get_baseline_keys(scenario, boundaries)
+        missing = sorted(set(boundary for boundary in boundaries if keys[boundary] not in self.baseline_solutions))
+        print(f"computing {len(missing)} of {len(keys)} baselines..")
+
+        if len(missing) > 0:
+            start_time = time.perf_counter()
+            chain = mip_pkg.PersistentDeploymentMIP(scen_pkg.ScenarioView(scenario, missing[0]), backend=self.solver_backend)
+            for boundary in missing:
+                for request in scenario.requests[len(chain.scenario.requests):boundary]:
+                    chain.add_request(request)
+                if not chain.solve():
+                    raise Exception(f"Could not compute the baseline for the first {boundary} requests.")
+                self.baseline_solutions[keys[boundary]] = (set(chain.active_mbs), set(chain.matching_edges))
+            print(f"computed the baselines in {time.perf_counter() - start_time:.3f}s using {chain.number_of_solver_calls} solver calls")
+
+        return {boundary: self.baseline_solutions[keys[boundary]] for boundary in boundaries}
+
+    def execute_baselines(self, scenario_handle, boundaries):
+        scenario, _ = self.attach(scenario_handle)
+        return self.compute_baselines(scenario, boundaries)
+
+    def execute_algorithm_on_prefix(self, scenario_handle, boundary, algorithm, matching_edges):
+        """ executes the algorithm on the first boundary many requests of the attached scenario plus the next one """
+        scenario, attach_time = self.attach(scenario_handle)
+        print(f"{algorithm} attached to {scenario_handle} in {attach_time:.6f}s"
+              f" (saving the setup of {scenario_handle.setup_time:.4f}s)")
+
+        # the algorithms work on views of the prefix, neither the scenario nor its requests are copied or changed
+        prefix = scen_pkg.ScenarioView(scenario, boundary)
+        alg = self.create_algorithm(prefix, algorithm, scenario.requests[boundary], matching_edges)
+        result = alg.run()
+        if result is not None:
+            result.scenario = None
+        return result
 
     def create_algorithm(self, scenario, algorithm, new_cp, active_edges_of_previous_solution):
         if algorithm.key == aem_pkg.AlgorithmType.MIP:
-            return mip_pkg.IncrementalExactDeploymentMIP(scenario, active_edges_of_previous_solution, new_cp)
+            return mip_pkg.IncrementalExactDeploymentMIP(scenario, active_edges_of_previous_solution, new_cp,
+                                                         backend=self.get_solver_backend(algorithm),
+                                                         warm_start=algorithm.get_property("warm_start", False),
+                                                         reassignment_penalty=algorithm.get_property("reassignment_penalty", 0.0))
         elif algorithm.key == aem_pkg.AlgorithmType.GREEDY_SINGLE:
             return greedy_pkg.IncrementalGreedyMatching(scenario, active_edges_of_previous_solution, new_cp)
         elif algorithm.key == aem_pkg.AlgorithmType.GREEDY_PARALLEL:
@@ -123,91 +198,77 @@ class IncrementalExperimentManager(aem_pkg.AbstractExperimentManager):
         self.suitable_substrates = ss_pkg.unpickle_pruned_suitable_substrates()
 
 
-    def construct_scenarios(self, test_scenarios_a_priori=True):
-        counter = 0
+    def construct_scenarios(self, test_scenarios_a_priori=True, number_of_cores=1):
         print(self.probability_for_pair)
         print(self.capacity_factor)
         print(self.suitable_substrates)
         print(self.number_of_repetitions)
         print(self.max_deviation)
 
-        for prob, cap_factor, substrate_name, repetition in itertools.product(self.probability_for_pair,
-                                                                self.capacity_factor,
-                                                                self.suitable_substrates.names,
-                                                                range(self.number_of_repetitions)):
-
-            #print self.substrate_filter
-            if self.substrate_filter is not None and substrate_name not in self.substrate_filter:
-                continue
-            substrate = self.suitable_substrates.substrates[substrate_name]
-
-            while True:
-
-                #print substrate_name
-                pairs = []
-
-                handled_nodes = []
-                for u in substrate.nodes:
-                    handled_nodes.append(u)
-                    for v in substrate.nodes:
-                        if v in handled_nodes:
-                            continue
-                        if random.random() <= prob:
-                            pairs.append((u,v))
-                            #req = req_pkg.Request(u, v, random.uniform(md_lb, md_ub), capacity=1)
-                            #requests.append(req)
-
-                successful_generation = False
-
-                for deviation in self.max_deviation:
-
-
-
-                    if counter > 0 and counter % 100 == 0:
-                        if self.substrate_filter is not None:
-                            print(f"Having created {counter} of {len(self.max_deviation) * len(self.capacity_factor) * len(self.probability_for_pair)*len(self.substrate_filter)*self.number_of_repetitions} many scenarios")
-                        else:
-                            print(f"Having created {counter} of {len(self.max_deviation) * len(self.capacity_factor) * len(self.probability_for_pair)*len(self.suitable_substrates.names)*self.number_of_repetitions} many scenarios")
+        self.generate_scenarios(number_of_cores)
 
+    def get_substrate_names(self):
+        return self.suitable_substrates.names
 
-                    number_of_nodes = substrate.get_number_of_nodes()
+    def get_substrate(self, substrate_name):
+        return self.suitable_substrates.substrates[substrate_name]
 
-                    capacity = math.ceil((number_of_nodes - 1) * 2 * prob
-                                         + (number_of_nodes * number_of_nodes - 2 * number_of_nodes - 1) / 2 * prob * cap_factor)
+    def generate_scenario_group(self, group, rng):
+        """ draws the pairs anew until the scenario of the first deviation is coverable """
+        prob, cap_factor, substrate_name, repetition = group
+        substrate = self.get_substrate(substrate_name)
+        # the nodes are sorted, so that the scenarios do not depend on the hash seed of the generating process
+        nodes = sorted(substrate.nodes)
 
-                    requests = []
+        print(f"\n\n\n\n\nstarting to generate {prob} {cap_factor} {substrate_name} {repetition}\n\n\n\n\n")
 
+        while True:
 
+            pairs = []
 
-                    md_lb, md_ub = deviation, deviation
-                    for (u,v) in pairs:
-                        req = req_pkg.Request(u, v, random.uniform(md_lb, md_ub), capacity=1)
-                        requests.append(req)
+            handled_nodes = []
+            for u in nodes:
+                handled_nodes.append(u)
+                for v in nodes:
+                    if v in handled_nodes:
+                        continue
+                    if rng.random() <= prob:
+                        pairs.append((u,v))
 
+            successful_generation = False
+            generated = []
 
-                    middleboxes = {}
-                    for u in substrate.nodes:
-                        middleboxes[u] = capacity
+            for deviation in self.max_deviation:
 
-                    scenario =  scen_pkg.Scenario(counter, substrate, requests, middleboxes)
+                number_of_nodes = substrate.get_number_of_nodes()
 
-                    if deviation == self.max_deviation[0]:
-                        mip = std_mip_pkg.ExactDeploymentMIP(scenario)
-                        result = mip.run()
-                        if result is not None:
-                            successful_generation = True
+                capacity = math.ceil((number_of_nodes - 1) * 2 * prob
+                                     + (number_of_nodes * number_of_nodes - 2 * number_of_nodes - 1) / 2 * prob * cap_factor)
 
+                requests = []
 
+                md_lb, md_ub = deviation, deviation
+                for (u,v) in pairs:
+                    req = req_pkg.Request(u, v, rng.uniform(md_lb, md_ub), capacity=1)
+                    requests.append(req)
 
+                middleboxes = {}
+                for u in nodes:
+                    middleboxes[u] = capacity
 
+                if deviation == self.max_deviation[0]:
+                    if flow_pkg.is_coverable(self.create_scenario(None, substrate_name, requests, middleboxes)):
+                        successful_generation = True
+                    else:
+                        break
 
+                generated.append((deviation, requests, middleboxes))
 
-                    self.scenario_keys.append((prob, deviation, cap_factor, substrate_name, repetition))
-                    self.scenarios[(prob,deviation,cap_factor,substrate_name,repetition)] = scenario
+            if successful_generation:
+                return generated
 
-                    counter += 1
-                if successful_generation:
-                    break
+    def create_scenario(self, scenario_id, substrate_name, requests, middleboxes):
+        return super().create_scenario(scenario_id, substrate_name, requests, middleboxes).freeze()
 
     def create_scenario_partition(self, number_of_servers):
         scenarios_of_server = {}
@@ -232,11 +293,10 @@ class IncrementalExperimentManager(aem_pkg.AbstractExperimentManager):
         else:
             scenario_keys = scenario_key_overwrite
         counter = 1
-        for scenario_key in scenario_keys:
-            print(f"\n\nEXPERIMENT_MANAGER: Starting experiments for scenario {counter} of {len(scenario_keys)}\n\n")
-            scen_results = self.algorithm_manager.execute_algorithms_in_parallel(self.scenarios[scenario_key],
-                                                                                 max_number_of_processes=number_of_cores,
-                                                                                 probing_points=self.probing_points)
+        scenarios = ((scenario_key, self.scenarios[scenario_key]) for scenario_key in scenario_keys)
+        for scenario_key, scen_results in self.algorithm_manager.execute_scenarios_in_pool(scenarios, number_of_cores,
+                                                                                           self.probing_points):
+            print(f"\n\nEXPERIMENT_MANAGER: Finished experiments for scenario {counter} of {len(scenario_keys)}\n\n")
 
             for probing_point in scen_results.keys():
                 self.scenario_solutions[tuple(scenario_key) + (probing_point,)] = scen_results[probing_point]
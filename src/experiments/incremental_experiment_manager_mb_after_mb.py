@@ -22,69 +22,46 @@
 
 __author__ = "Matthias Rost, Alexander Elvers (mrost / aelvers <AT> inet.tu-berlin.de)"
 
-import copy
 import gc
-import itertools
 import math
-import multiprocessing
-import random
 import sys
 
 from algorithms import (
     greedy_matching_mb_after_mb as greedy_pkg,
     optimal_mip_mb_after_mb as mip_pkg,
-    optimal_mip as std_mip_pkg,
+    fractional_coverage_flow as flow_pkg,
     abstract_algorithm as aa_pkg,
 )
 from datamodel import (
     suitable_substrates as ss_pkg,
-    scenario as scen_pkg,
     requests as req_pkg,
 )
 from experiments import abstract_experiment_manager as aem_pkg
 
 
+class ScenarioExecution(aem_pkg.ScenarioExecution):
+
+    def add_result(self, key, result):
+        print(f"received result {key} {result}")
+        result.scenario = self.scenario
+        self.results[key] = aa_pkg.IncrementalAlgorithmResult_mb_by_mb(alg_name=result.alg_name,
+                                                                       scenario=self.scenario,
+                                                                       matching_history=result.extra_information)
+        return []
+
+
 class AlgorithmManager(aem_pkg.AbstractAlgorithmManager):
     default_algorithms = [
         ("MIP",),
         ("GREEDY_SINGLE",),
     ]
-
-    def execute_algorithms_in_parallel(self, scenario, max_number_of_processes):
-        results = {}
-        result_queue = multiprocessing.Queue()
-
-        if self.algorithm_partition is None:
-            self.algorithm_partition = self.get_algorithm_partition(max_number_parallel_processes=max_number_of_processes)
-        requests_copy = copy.deepcopy(scenario.requests)
-
-        for alg_list in self.algorithm_partition:
-
-            processes = {}
-            for alg in alg_list:
-                process = multiprocessing.Process(target=self.execute_algorithm_multiprocess, args=(scenario, alg, result_queue))
-                print(f"starting {alg} .. ")
-                process.start()
-                processes[alg] = process
-            for i in range(len(alg_list)):
-                encapsulated_result = result_queue.get()
-                print(f"received result {encapsulated_result}")
-                encapsulated_result[1].scenario = scenario
-                simple_result = encapsulated_result[1]
-
-                incremental_result = aa_pkg.IncrementalAlgorithmResult_mb_by_mb(alg_name=simple_result.alg_name,
-                                                                       scenario=scenario,
-                                                                       matching_history=simple_result.extra_information)
-
-                results[encapsulated_result[0]] = incremental_result
-                processes[encapsulated_result[0]].join()
-                print(f"process of algorithm {encapsulated_result[0]} is terminated / {len(alg_list)-(i+1)} of {len(alg_list)} outstanding to terminate")
-
-        return results
+    scenario_execution_class = ScenarioExecution
 
     def create_algorithm(self, scenario, algorithm):
         if algorithm.key == aem_pkg.AlgorithmType.MIP:
-            return mip_pkg.ExactDeploymentMIP_mb_after_mb (scenario)
+            return mip_pkg.ExactDeploymentMIP_mb_after_mb(scenario,
+                                                          backend=self.get_solver_backend(algorithm),
+                                                          search=algorithm.get_property("search", mip_pkg.SEARCH_LINEAR))
         elif algorithm.key == aem_pkg.AlgorithmType.GREEDY_SINGLE:
             return greedy_pkg.GreedyMatching_mb_after_mb(scenario)
         elif algorithm.key == aem_pkg.AlgorithmType.GREEDY_PARALLEL:
@@ -101,93 +78,74 @@ class IncrementalExperimentManager_mb_after_mb(aem_pkg.AbstractExperimentManager
         self.suitable_substrates = ss_pkg.unpickle_pruned_suitable_substrates()
 
 
-    def construct_scenarios(self, test_scenarios_a_priori=True):
-        counter = 0
+    def construct_scenarios(self, test_scenarios_a_priori=True, number_of_cores=1):
         print(self.probability_for_pair)
         print(self.capacity_factor)
         print(self.suitable_substrates)
         print(self.number_of_repetitions)
         print(self.max_deviation)
 
-        for prob, cap_factor, substrate_name, repetition in itertools.product(self.probability_for_pair,
-                                                                self.capacity_factor,
-                                                                self.suitable_substrates.names,
-                                                                range(self.number_of_repetitions)):
-
-            #print self.substrate_filter
-            if self.substrate_filter is not None and substrate_name not in self.substrate_filter:
-                continue
-            substrate = self.suitable_substrates.substrates[substrate_name]
+        self.generate_scenarios(number_of_cores)
 
-            print(f"\n\n\n\n\nstarting to generate {prob} {cap_factor} {substrate_name} {repetition}\n\n\n\n\n")
+    def get_substrate_names(self):
+        return self.suitable_substrates.names
 
-            while True:
+    def get_substrate(self, substrate_name):
+        return self.suitable_substrates.substrates[substrate_name]
 
-                #print substrate_name
-                pairs = []
+    def generate_scenario_group(self, group, rng):
+        """ draws the pairs anew until the scenario of the first deviation is coverable """
+        prob, cap_factor, substrate_name, repetition = group
+        substrate = self.get_substrate(substrate_name)
+        # the nodes are sorted, so that the scenarios do not depend on the hash seed of the generating process
+        nodes = sorted(substrate.nodes)
 
-                handled_nodes = []
-                for u in substrate.nodes:
-                    handled_nodes.append(u)
-                    for v in substrate.nodes:
-                        if v in handled_nodes:
-                            continue
-                        if random.random() <= prob:
-                            pairs.append((u,v))
-                            #req = req_pkg.Request(u, v, random.uniform(md_lb, md_ub), capacity=1)
-                            #requests.append(req)
+        print(f"\n\n\n\n\nstarting to generate {prob} {cap_factor} {substrate_name} {repetition}\n\n\n\n\n")
 
-                successful_generation = False
+        while True:
 
-                for deviation in self.max_deviation:
+            pairs = []
 
+            handled_nodes = []
+            for u in nodes:
+                handled_nodes.append(u)
+                for v in nodes:
+                    if v in handled_nodes:
+                        continue
+                    if rng.random() <= prob:
+                        pairs.append((u,v))
 
+            successful_generation = False
+            generated = []
 
-                    if counter > 0 and counter % 100 == 0:
-                        if self.substrate_filter is not None:
-                            print(f"Having created {counter} of {len(self.max_deviation) * len(self.capacity_factor) * len(self.probability_for_pair)*len(self.substrate_filter)*self.number_of_repetitions} many scenarios")
-                        else:
-                            print(f"Having created {counter} of {len(self.max_deviation) * len(self.capacity_factor) * len(self.probability_for_pair)*len(self.suitable_substrates.names)*self.number_of_repetitions} many scenarios")
+            for deviation in self.max_deviation:
 
+                number_of_nodes = substrate.get_number_of_nodes()
 
-                    number_of_nodes = substrate.get_number_of_nodes()
+                capacity = math.ceil((number_of_nodes - 1) * 2 * prob
+                                     + (number_of_nodes * number_of_nodes - 2 * number_of_nodes - 1) / 2 * prob * cap_factor)
 
-                    capacity = math.ceil((number_of_nodes - 1) * 2 * prob
-                                         + (number_of_nodes * number_of_nodes - 2 * number_of_nodes - 1) / 2 * prob * cap_factor)
+                requests = []
 
-                    requests = []
+                md_lb, md_ub = deviation, deviation
+                for (u,v) in pairs:
+                    req = req_pkg.Request(u, v, rng.uniform(md_lb, md_ub), capacity=1)
+                    requests.append(req)
 
+                middleboxes = {}
+                for u in nodes:
+                    middleboxes[u] = capacity
 
+                if deviation == self.max_deviation[0]:
+                    if flow_pkg.is_coverable(self.create_scenario(None, substrate_name, requests, middleboxes)):
+                        successful_generation = True
+                    else:
+                        break
 
-                    md_lb, md_ub = deviation, deviation
-                    for (u,v) in pairs:
-                        req = req_pkg.Request(u, v, random.uniform(md_lb, md_ub), capacity=1)
-                        requests.append(req)
+                generated.append((deviation, requests, middleboxes))
 
-
-                    middleboxes = {}
-                    for u in substrate.nodes:
-                        middleboxes[u] = capacity
-
-                    scenario =  scen_pkg.Scenario(counter, substrate, requests, middleboxes)
-
-                    if deviation == self.max_deviation[0]:
-                        mip = std_mip_pkg.ExactDeploymentMIP(scenario, mip_gap=1.0)
-                        result = mip.run()
-                        if result is not None:
-                            successful_generation = True
-
-
-
-
-
-
-                    self.scenario_keys.append((prob, deviation, cap_factor, substrate_name, repetition))
-                    self.scenarios[(prob,deviation,cap_factor,substrate_name,repetition)] = scenario
-
-                    counter += 1
-                if successful_generation:
-                    break
+            if successful_generation:
+                return generated
 
     def create_scenario_partition(self, number_of_servers):
         scenarios_of_server = {}
@@ -212,11 +170,9 @@ class IncrementalExperimentManager_mb_after_mb(aem_pkg.AbstractExperimentManager
         else:
             scenario_keys = scenario_key_overwrite
         counter = 1
-        for scenario_key in scenario_keys:
-            print(f"\n\nEXPERIMENT_MANAGER: Starting experiments for scenario {counter} of {len(scenario_keys)}\n\n")
-            scen_results = self.algorithm_manager.execute_algorithms_in_parallel(self.scenarios[scenario_key],
-                                                                                 max_number_of_processes=number_of_cores)
-
+        scenarios = ((scenario_key, self.scenarios[scenario_key]) for scenario_key in scenario_keys)
+        for scenario_key, scen_results in self.algorithm_manager.execute_scenarios_in_pool(scenarios, number_of_cores):
+            print(f"\n\nEXPERIMENT_MANAGER: Finished experiments for scenario {counter} of {len(scenario_keys)}\n\n")
             self.scenario_solutions[scenario_key] = scen_results
 
             counter += 1
@@ -0,0 +1,170 @@
+# MIT License
+#
+# Copyright (c) 2017 Matthias Rost, Alexander Elvers
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+__author__ = "Matthias Rost, Alexander Elvers (mrost / aelvers <AT> inet.tu-berlin.de)"
+
+import multiprocessing
+import time
+import traceback
+from multiprocessing import resource_tracker
+
+
+# The workers are ordinary (non-daemonic) processes, so that tasks like GREEDY_PARALLEL can start processes of their
+# own. Each worker has its own task queue, such that the scheduler decides which tasks run at the same time.
+
+
+def _work(target, task_queue, result_queue, worker):
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        key, method_name, arguments = task
+        try:
+            result = getattr(target, method_name)(*arguments)
+        except Exception:
+            result_queue.put((worker, key, None, traceback.format_exc()))
+        else:
+            result_queue.put((worker, key, result, None))
+
+
+class PendingTask:
+
+    def __init__(self, key, method_name, arguments, process_count):
+        self.key = key
+        self.method_name = method_name
+        self.arguments = arguments
+        self.process_count = process_count
+        # number of times tasks submitted later were started instead of this one
+        self.skips = 0
+
+
+class ProcessPoolScheduler:
+    """ executes tasks, i.e. calls of methods of target, in number_of_cores persistent worker processes.
+
+        A task occupies process_count many cores and a task is started as soon as enough cores are free, so the
+        cores stay busy across scenarios. Tasks are started in the order of submission, but smaller tasks may start
+        before a larger one that does not fit yet. Once a task was overtaken more than max_skips times (number_of_cores
+        by default), no further tasks start before it, so that it cannot starve.
+
+        Results are obtained from get_results, which also dispatches the tasks; further tasks may be submitted while
+        iterating over the results.
+    """
+
+    def __init__(self, target, number_of_cores, max_skips=None):
+        self.target = target
+        self.number_of_cores = number_of_cores
+        self.max_skips = number_of_cores if max_skips is None else max_skips
+
+        self.pending = []
+        self.running = {}
+        self.free_cores = number_of_cores
+
+        self.workers = []
+        self.task_queues = []
+        self.idle_workers = []
+        self.result_queue = None
+
+        self.start_time = None
+        self.core_time = 0.0
+        self.number_of_tasks = 0
+
+    def start(self):
+        # the workers attach shared memory that is published later on; they must use the resource tracker of this
+        # process, as otherwise each worker starts its own one, which warns about the attached segments and unlinks
+        # them when the worker exits
+        resource_tracker.ensure_running()
+        self.result_queue = multiprocessing.Queue()
+        for worker in range(self.number_of_cores):
+            task_queue = multiprocessing.Queue()
+            process = multiprocessing.Process(target=_work, args=(self.target, task_queue, self.result_queue, worker))
+            process.start()
+            self.workers.append(process)
+            self.task_queues.append(task_queue)
+            self.idle_workers.append(worker)
+        self.start_time = time.perf_counter()
+        print(f"started {self.number_of_cores} worker processes")
+
+    def close(self):
+        for task_queue in self.task_queues:
+            task_queue.put(None)
+        for process in self.workers:
+            process.join()
+        self.workers = []
+        self.task_queues = []
+        self.idle_workers = []
+        print(f"executed {self.number_of_tasks} tasks at a core utilization of {self.get_utilization():.3f}")
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        if exc_type is not None:
+            # running tasks would block the workers from stopping
+            for process in self.workers:
+                process.terminate()
+        self.close()
+        return False
+
+    def submit(self, key, method_name, arguments=(), process_count=1):
+        process_count = max(1, min(process_count, self.number_of_cores))
+        self.pending.append(PendingTask(key, method_name, arguments, process_count))
+
+    def get_results(self):
+        """ yields (key, result) for the tasks in the order of their completion until no task is left """
+        while len(self.pending) > 0 or len(self.running) > 0:
+            self._dispatch()
+            worker, key, result, error = self.result_queue.get()
+            process_count, start_time = self.running.pop(worker)
+            self.free_cores += process_count
+            self.idle_workers.append(worker)
+            self.core_time += process_count * (time.perf_counter() - start_time)
+            self.number_of_tasks += 1
+            if error is not None:
+                raise Exception(f"Task {key} failed:\n{error}")
+            yield key, result
+
+    def get_utilization(self):
+        """ returns the fraction of the core time since the start that was occupied by tasks """
+        if self.start_time is None:
+            return 0.0
+        elapsed = time.perf_counter() - self.start_time
+        return self.core_time / (self.number_of_cores * elapsed) if elapsed > 0 else 0.0
+
+    def _dispatch(self):
+        started = []
+        waiting = []
+        for task in self.pending:
+            if any(other.skips >= self.max_skips for other in waiting):
+                break
+            if task.process_count <= self.free_cores and len(self.idle_workers) > 0:
+                worker = self.idle_workers.pop()
+                self.free_cores -= task.process_count
+                self.running[worker] = (task.process_count, time.perf_counter())
+                self.task_queues[worker].put((task.key, task.method_name, task.arguments))
+                started.append(task)
+                for other in waiting:
+                    other.skips += 1
+            else:
+                waiting.append(task)
+        for task in started:
+            self.pending.remove(task)